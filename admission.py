@@ -0,0 +1,94 @@
+"""라우트 종류별 동시 처리 한도 (admission control)
+
+업로드, ZIP/원본 다운로드, 일반 페이지를 종류별 세마포어로 나눠, 오래 걸리는 I/O 요청이
+스레드를 모두 차지해 페이지 요청이 끝없이 줄 서는 일을 막는다. 한도를 넘으면 기다리지
+않고 503 + Retry-After로 돌려보낸다. 스트리밍 응답은 본문 전송이 끝날 때 자리를 반납한다.
+
+한도는 워커 프로세스별이다 (gunicorn gthread 워커 2개 × 한도).
+"""
+import threading
+
+from flask import g, jsonify, request
+
+# endpoint → 종류. 업로드는 POST일 때만 해당. 나머지는 page
+# (local_storage_file은 그리드 썸네일도 내려주므로 archive 자리를 쓰지 않게 page로 둔다)
+ROUTE_CLASSES = {
+    'upload': 'upload',
+    'upload_text': 'upload',
+    'upload_presign_complete': 'upload',
+    'admin_project_download_all': 'archive',
+    'admin_uploader_download': 'archive',
+    'admin_photos_download_selected': 'archive',
+    'admin_photo_download': 'archive',
+}
+EXEMPT_ENDPOINTS = {'static', 'metrics_endpoint'}
+
+
+def route_class(endpoint, method):
+    kind = ROUTE_CLASSES.get(endpoint, 'page')
+    if kind == 'upload' and method != 'POST':
+        return 'page'
+    return kind
+
+
+class _Slot:
+    """한 번만 반납되는 세마포어 자리"""
+
+    def __init__(self, semaphore):
+        self._semaphore = semaphore
+        self._lock = threading.Lock()
+        self._held = True
+
+    def release(self):
+        with self._lock:
+            if self._held:
+                self._held = False
+                self._semaphore.release()
+
+
+class AdmissionControl:
+    def __init__(self, limits, retry_after=5):
+        self.limits = dict(limits)
+        self.retry_after = retry_after
+        self._semaphores = {kind: threading.BoundedSemaphore(limit) for kind, limit in self.limits.items() if limit}
+        self.rejected = {kind: 0 for kind in self.limits}
+
+    def try_acquire(self, kind):
+        semaphore = self._semaphores.get(kind)
+        if semaphore is None:  # 한도 0/미설정이면 제한 없음
+            return None, True
+        if not semaphore.acquire(blocking=False):
+            self.rejected[kind] += 1
+            return None, False
+        return _Slot(semaphore), True
+
+    def init_app(self, app):
+        @app.before_request
+        def admit():
+            if request.endpoint in EXEMPT_ENDPOINTS:
+                return None
+            kind = route_class(request.endpoint, request.method)
+            slot, admitted = self.try_acquire(kind)
+            if not admitted:
+                print(f"과부하로 거절 ({kind}): {request.method} {request.path}")
+                response = jsonify({'error': '요청이 많아 잠시 후 다시 시도해주세요.', 'class': kind})
+                response.status_code = 503
+                response.headers['Retry-After'] = str(self.retry_after)
+                return response
+            g.admission_slot = slot
+            return None
+
+        @app.after_request
+        def hand_off_streaming(response):
+            slot = g.get('admission_slot')
+            if slot is not None and response.is_streamed:
+                # 스트리밍 본문은 요청 처리 이후에 전송되므로 응답이 닫힐 때 반납한다
+                response.call_on_close(slot.release)
+                g.admission_slot = None
+            return response
+
+        @app.teardown_request
+        def release_slot(exc):
+            slot = g.pop('admission_slot', None)
+            if slot is not None:
+                slot.release()
@@ -1,92 +1,158 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, session, jsonify, send_file
+from flask import Flask, current_app, render_template, request, redirect, url_for, flash, session, jsonify, Response, stream_with_context
+from flask.cli import with_appcontext
+from werkzeug.local import LocalProxy
 from config import Config
-from models import db, Project, Photo
-import boto3
-from botocore.exceptions import ClientError
-from werkzeug.utils import secure_filename
-from datetime import datetime
-import uuid
+from database import configure_database, init_database, read_replica, replica_reads
+from models import db, Project, Photo, PurgeJob, ReviewOutbox, ArchiveJob, format_bytes
+from zipstream import ZipEntry, stream_zip
+from archive import drop_archives, find_archive, fingerprint, scope_photos, start_archive, zip_entries
+from normalize import normalize_in_pool
+from derivatives import DERIVATIVE_SPECS, derivative_key, generate_derivatives, signature_from_bytes
+from purge import delete_keys, photo_keys, start_purge, unreferenced_keys
+from dedupe import backfill_hashes, collapse_duplicates, existing_by_hash, hash_fileobj
+from listing import filter_conditions, incremental_photos, list_photos, parse_filters, parse_since, uploader_summary
+from review_outbox import ReviewFlusher, enqueue_reviews
+from admission import AdmissionControl
+from render_cache import RenderCache, cached, init_render_cache
+from metrics import current_breakdown, in_request_breakdown, init_metrics, instrument_storage
+from storage import LocalStorage, ObjectNotFound, SignedUrlCache, StorageError, create_storage
+from keys import new_photo_key, source_metadata, upload_token
+from manifest import (MANIFEST_FORMATS, MARK_MODES, ManifestScope, manifest_entries, manifest_meta,
+                      mark_downloaded, render_manifest)
+import migrations
+import reconcile
+import rekey
+import click
+from datetime import datetime, timedelta
+import hmac
 import io
-import zipfile
+import json
+import uuid
 import re
 import os
-import gspread
-from google.oauth2.service_account import Credentials
-import json
+import time
+import unicodedata
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote
 
-app = Flask(__name__)
-app.config.from_object(Config)
-db.init_app(app)
+# 앱마다 하나씩 create_app이 만들어 app.extensions에 등록한다. 뷰/CLI는 현재 앱의 것을 쓴다
+signed_urls = LocalProxy(lambda: current_app.extensions['signed_urls'])
+review_flusher = LocalProxy(lambda: current_app.extensions['review_flusher'])
+post_upload_pool = LocalProxy(lambda: current_app.extensions['post_upload_pool'])
 
-s3_client = boto3.client(
-    's3',
-    aws_access_key_id=os.environ.get('AWS_ACCESS_KEY_ID'),
-    aws_secret_access_key=os.environ.get('AWS_SECRET_ACCESS_KEY'),
-    region_name=os.environ.get('AWS_REGION')
-)
+# create_app이 앱마다 붙이는 라우트와 CLI 명령 (endpoint 이름은 함수 이름 그대로)
+_routes = []
+_commands = []
 
-S3_BUCKET = os.environ.get('S3_BUCKET_NAME')
 
-GOOGLE_SHEETS_ID = '1eAuotbbl7bbj8N8rCr4lbgE-g9Ja_l66ZUk_N9UVtEI'
+def photo_storage():
+    """현재 앱의 사진 저장소 (S3 또는 로컬 디렉터리). 다른 스레드로 넘겨도 되는 실제 객체"""
+    return current_app.extensions['photo_storage']
 
 
-def get_sheets_client():
-    """Google Sheets 클라이언트 생성"""
-    try:
-        creds_json = os.environ.get('GOOGLE_CREDENTIALS')
-        if not creds_json:
-            print("GOOGLE_CREDENTIALS 환경변수가 없습니다")
-            return None
-        
-        creds_dict = json.loads(creds_json)
-        scopes = [
-            'https://www.googleapis.com/auth/spreadsheets',
-            'https://www.googleapis.com/auth/drive'
-        ]
-        credentials = Credentials.from_service_account_info(creds_dict, scopes=scopes)
-        client = gspread.authorize(credentials)
-        return client
-    except Exception as e:
-        print(f"Google Sheets 연결 오류: {e}")
-        return None
+def in_app_context(fn):
+    """워커 스레드에서 현재 앱의 컨텍스트를 열고 fn을 실행하는 래퍼 (설정/저장소 조회용)"""
+    app = current_app._get_current_object()
 
+    def wrapper(*args, **kwargs):
+        with app.app_context():
+            return fn(*args, **kwargs)
+    return wrapper
 
-def save_reviews_to_sheets(uploader_name, project_name, reviews):
-    """리뷰 텍스트를 Google Sheets에 저장"""
-    try:
-        client = get_sheets_client()
-        if not client:
-            return False, "Google Sheets 연결 실패"
-        
-        spreadsheet = client.open_by_key(GOOGLE_SHEETS_ID)
-        worksheet = spreadsheet.sheet1
-        
-        rows_to_add = []
-        for review in reviews:
-            if review.strip():
-                rows_to_add.append([uploader_name, project_name, review.strip()])
-        
-        if rows_to_add:
-            worksheet.append_rows(rows_to_add)
-        
-        return True, f"{len(rows_to_add)}건 저장 완료"
-    except Exception as e:
-        print(f"Sheets 저장 오류: {e}")
-        return False, str(e)
 
+def route(rule, **options):
+    """뷰 등록 데코레이터 (``app.route``와 같은 인자)"""
+    def decorator(view):
+        _routes.append((rule, view, options))
+        return view
+    return decorator
 
-def get_s3_client():
-    return boto3.client(
-        's3',
-        aws_access_key_id=os.environ.get('AWS_ACCESS_KEY_ID'),
-        aws_secret_access_key=os.environ.get('AWS_SECRET_ACCESS_KEY'),
-        region_name=os.environ.get('AWS_REGION')
-    )
+
+def command(name):
+    """CLI 명령 등록 데코레이터. 명령은 앱 컨텍스트 안에서 실행된다"""
+    def decorator(f):
+        cmd = click.command(name)(with_appcontext(f))
+        _commands.append(cmd)
+        return cmd
+    return decorator
+
+
+def start_background_workers():
+    if current_app.config['REVIEW_FLUSHER_ENABLED']:
+        review_flusher.start(interval=current_app.config['REVIEW_FLUSH_INTERVAL'])
 
 
 def allowed_file(filename):
     return '.' in filename and \
-           filename.rsplit('.', 1)[1].lower() in app.config['ALLOWED_EXTENSIONS']
+           filename.rsplit('.', 1)[1].lower() in current_app.config['ALLOWED_EXTENSIONS']
+
+
+def ingest_file(project, uploader_name, file, with_derivatives=True, content_hash=None):
+    """업로드된 파일 하나를 저장소에 올린다 (워커 스레드의 앱 컨텍스트에서 실행, DB 세션은 건드리지 않음).
+    
+    프로젝트에 정규화 정책(normalize_max_edge)이 있으면 프로세스 풀에서 정규화한 결과를 올린다.
+    content_hash는 정규화 전 업로드 원본의 해시다.
+    
+    결과 dict: filename, size, original_size, seconds, photo(실패 시 None), error
+    """
+    started = time.perf_counter()
+    result = {'filename': file.filename, 'size': 0, 'original_size': 0, 'photo': None, 'error': None}
+    s3_key = new_photo_key(current_app.config['KEY_SCHEME'], project, uploader_name, file.filename)
+    metadata = source_metadata(project.folder_name, uploader_name, file.filename)
+    data = None
+    try:
+        file.seek(0, os.SEEK_END)
+        result['size'] = result['original_size'] = file.tell()
+        file.seek(0)
+        if project.normalize_max_edge:
+            data = file.read()
+            try:
+                normalized = normalize_in_pool(data, project.normalize_max_edge, project.normalize_quality or 85,
+                                               current_app.config['NORMALIZE_WORKERS'])
+            except Exception as e:
+                # 디코딩할 수 없는 파일 등은 원본 그대로 저장
+                print(f"이미지 정규화 실패 ({file.filename}): {e}")
+                normalized = None
+            if normalized is not None:
+                data = normalized
+                result['size'] = len(data)
+            photo_storage().upload_fileobj(io.BytesIO(data), s3_key, content_type=file.content_type,
+                                           metadata=metadata)
+        else:
+            photo_storage().upload_fileobj(file, s3_key, content_type=file.content_type, metadata=metadata)
+        
+        photo = Photo(
+            filename=s3_key,
+            original_filename=file.filename,
+            file_size=result['size'],
+            original_size=result['original_size'],
+            uploader_name=uploader_name,
+            project_id=project.id,
+            content_hash=content_hash
+        )
+        result['photo'] = photo
+    except Exception as e:
+        print(f"Upload error: {e}")
+        result['error'] = str(e)
+    
+    if result['photo'] is not None and with_derivatives:
+        try:
+            if data is None:
+                file.seek(0)
+                data = file.read()
+            generate_derivatives(photo_storage(), result['photo'], data)
+        except Exception as e:
+            # 썸네일은 backfill로 다시 만들 수 있으므로 업로드는 성공 처리
+            print(f"썸네일 생성 오류: {e}")
+    
+    result['seconds'] = time.perf_counter() - started
+    return result
+
+
+def direct_upload_available(project):
+    """브라우저 → S3 직접 업로드를 쓸지. 정규화 정책이 있는 프로젝트는 서버를 거쳐야 정규화된다"""
+    return (current_app.config['DIRECT_UPLOAD_ENABLED'] and photo_storage().supports_direct_upload
+            and not project.normalize_max_edge)
 
 
 def sanitize_folder_name(name):
@@ -94,6 +160,61 @@ def sanitize_folder_name(name):
     return name.lower()
 
 
+def parse_normalize_policy(form):
+    """프로젝트 폼의 정규화 정책 → (긴 변 상한 또는 None, 품질)"""
+    try:
+        max_edge = int(form.get('normalize_max_edge') or 0)
+        quality = int(form.get('normalize_quality') or 85)
+    except ValueError:
+        return None, 85
+    return (max(max_edge, 320) if max_edge else None), min(max(quality, 30), 100)
+
+
+def attachment_disposition(download_name):
+    """한글 파일명을 지원하는 Content-Disposition 헤더 값"""
+    try:
+        download_name.encode('ascii')
+        return f'attachment; filename="{download_name}"'
+    except UnicodeEncodeError:
+        simple = unicodedata.normalize('NFKD', download_name).encode('ascii', 'ignore').decode('ascii')
+        quoted = quote(download_name, safe="!#$&+^`|~")
+        return f'attachment; filename="{simple}"; filename*=UTF-8\'\'{quoted}'
+
+
+def zip_response(entries, download_name):
+    """ZipEntry 목록을 스트리밍 ZIP 응답으로 내보내고, 끝까지 전송된 사진을 다운로드 처리"""
+    done = []
+    
+    def generate():
+        yield from stream_zip(
+            photo_storage(), entries,
+            prefetch=current_app.config['ZIP_PREFETCH_WINDOW'],
+            max_buffer=current_app.config['ZIP_PREFETCH_MAX_BYTES'],
+            on_entry=lambda entry: done.append(entry.ref.id)
+        )
+        Photo.mark_downloaded(done)
+        db.session.commit()
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype='application/zip',
+        headers={'Content-Disposition': attachment_disposition(download_name)}
+    )
+
+
+def photo_url(photo, derivative=None):
+    """사진(또는 파생 이미지)의 URL. 파생 이미지가 없으면 원본.
+    
+    버킷이 비공개(기본)면 캐시된 presigned URL, SIGNED_URLS=false면 공개 URL
+    """
+    key = photo.filename
+    if derivative and photo.has_derivative(derivative):
+        key = derivative_key(photo.filename, derivative)
+    if current_app.config['SIGNED_URLS']:
+        return signed_urls.url(key)
+    return photo_storage().public_url(key)
+
+
 def admin_required(f):
     """관리자 인증 데코레이터"""
     from functools import wraps
@@ -108,14 +229,16 @@ def admin_required(f):
 
 # ==================== 일반 사용자 페이지 ====================
 
-@app.route('/')
+@route('/')
+@cached('index')
 def index():
     """메인 페이지 - 활성화된 프로젝트 목록"""
     projects = Project.query.filter_by(is_active=True).order_by(Project.created_at.desc()).all()
+    Project.load_stats(projects)
     return render_template('index.html', projects=projects)
 
 
-@app.route('/upload/<int:project_id>', methods=['GET', 'POST'])
+@route('/upload/<int:project_id>', methods=['GET', 'POST'])
 def upload(project_id):
     project = Project.query.get_or_404(project_id)
     
@@ -129,36 +252,74 @@ def upload(project_id):
         uploaded_count = 0
         review_count = 0
         
-        # 1. 사진 업로드 처리
-        files = request.files.getlist('photos')
-        for file in files:
-            if file and file.filename:
-                if allowed_file(file.filename):
-                    filename = secure_filename(file.filename)
-                    unique_filename = f"{uuid.uuid4().hex}_{filename}"
-                    s3_key = f"{project.name}/{uploader_name}/{unique_filename}"
-                    
-                    try:
-                        file.seek(0)
-                        s3_client.upload_fileobj(
-                            file,
-                            S3_BUCKET,
-                            s3_key,
-                            ExtraArgs={'ContentType': file.content_type}
-                        )
-                        
-                        photo = Photo(
-                            filename=s3_key,
-                            original_filename=file.filename,
-                            file_size=file.content_length or 0,
-                            uploader_name=uploader_name,
-                            project_id=project.id
-                        )
-                        db.session.add(photo)
-                        uploaded_count += 1
-                    except Exception as e:
-                        print(f"Upload error: {e}")
-                        continue
+        # 1. 사진 업로드 처리 (파일별 S3 전송은 스레드 풀에서 병렬로)
+        files = [file for file in request.files.getlist('photos')
+                 if file and file.filename and allowed_file(file.filename)]
+        if files:
+            started = time.perf_counter()
+            workers = min(current_app.config['UPLOAD_WORKERS'], len(files))
+            breakdown = current_breakdown()
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                hashes = list(pool.map(hash_fileobj, (file.stream for file in files)))
+            
+            # 같은 프로젝트에 이미 있는 내용이면 저장소에 다시 올리지 않는다
+            existing = existing_by_hash(project.id, hashes)
+            # 저장소 전송 동안 DB 커넥션을 잡고 있지 않도록 세션을 닫아 풀에 돌려준다 (project는 읽어 둔
+            # 속성만 쓴다). 행은 전송이 끝난 뒤 한 트랜잭션으로 추가
+            db.session.close()
+            duplicates = []
+            to_upload = []
+            skipped = 0
+            seen = set()
+            for file, content_hash in zip(files, hashes):
+                rows = existing.get(content_hash, [])
+                if content_hash in seen or any(row[2] == uploader_name for row in rows):
+                    skipped += 1
+                    continue
+                seen.add(content_hash)
+                if rows:
+                    filename, derivatives, _, stored_size, perceptual_hash, sharpness = rows[0]
+                    file.stream.seek(0, os.SEEK_END)
+                    duplicates.append(Photo(
+                        filename=filename,
+                        original_filename=file.filename,
+                        file_size=stored_size,
+                        original_size=file.stream.tell(),
+                        uploader_name=uploader_name,
+                        project_id=project.id,
+                        derivatives=derivatives,
+                        content_hash=content_hash,
+                        perceptual_hash=perceptual_hash,
+                        sharpness=sharpness
+                    ))
+                    uploaded_count += 1
+                    print(f"  DUP {file.filename} -> {filename}")
+                else:
+                    to_upload.append((file, content_hash))
+            
+            with_derivatives = current_app.config['DERIVATIVES_ON_UPLOAD']
+            ingest = in_app_context(lambda item: ingest_file(project, uploader_name, item[0], with_derivatives, item[1]))
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                results = list(pool.map(in_request_breakdown(ingest, breakdown), to_upload))
+            elapsed = time.perf_counter() - started
+            
+            db.session.add_all(duplicates)
+            failed = []
+            for result in results:
+                if result['photo'] is not None:
+                    db.session.add(result['photo'])
+                    uploaded_count += 1
+                else:
+                    failed.append(result['filename'])
+                print(f"  {'OK ' if result['photo'] is not None else 'ERR'} {result['filename']} "
+                      f"{result['original_size']}B -> {result['size']}B {result['seconds']:.2f}s")
+            print(f"업로드 {len(files)}개 (workers={workers}, 전송 {len(results)}개): {elapsed:.2f}s, "
+                  f"순차 합계 {sum(r['seconds'] for r in results):.2f}s")
+            
+            if skipped:
+                flash(f'{skipped}개 파일은 이미 업로드된 사진이라 건너뛰었습니다.', 'info')
+            if failed:
+                flash(f"{len(failed)}개 파일 업로드 실패: {', '.join(failed)}", 'error')
         
         # 2. 리뷰 텍스트 처리
         reviews = []
@@ -168,13 +329,11 @@ def upload(project_id):
                 reviews.append(review)
         
         if reviews:
-            success, message = save_reviews_to_sheets(uploader_name, project.name, reviews)
-            if success:
-                review_count = len(reviews)
-            else:
-                print(f"리뷰 저장 실패: {message}")
+            review_count = enqueue_reviews(uploader_name, project.name, reviews)
         
         db.session.commit()
+        if review_count:
+            review_flusher.wake()
         
         if uploaded_count > 0 or review_count > 0:
             return redirect(url_for('upload_complete', project_id=project_id, 
@@ -183,10 +342,10 @@ def upload(project_id):
             flash('업로드할 사진을 선택하거나 리뷰를 작성해주세요.')
             return redirect(url_for('upload', project_id=project_id))
     
-    return render_template('upload.html', project=project)
+    return render_template('upload.html', project=project, direct_upload=direct_upload_available(project))
 
 
-@app.route('/upload/<int:project_id>/complete')
+@route('/upload/<int:project_id>/complete')
 def upload_complete(project_id):
     project = Project.query.get_or_404(project_id)
     photo_count = request.args.get('photo_count', 0, type=int)
@@ -197,7 +356,7 @@ def upload_complete(project_id):
                            photo_count=photo_count, review_count=review_count)
 
 
-@app.route('/upload/<int:project_id>/text', methods=['GET', 'POST'])
+@route('/upload/<int:project_id>/text', methods=['GET', 'POST'])
 def upload_text(project_id):
     """텍스트(리뷰) 제출 페이지"""
     project = Project.query.get_or_404(project_id)
@@ -219,19 +378,17 @@ def upload_text(project_id):
             flash('최소 1개 이상의 리뷰를 입력해주세요.')
             return redirect(url_for('upload_text', project_id=project_id))
         
-        success, message = save_reviews_to_sheets(uploader_name, project.name, reviews)
+        count = enqueue_reviews(uploader_name, project.name, reviews)
+        db.session.commit()
+        review_flusher.wake()
         
-        if success:
-            flash(f'리뷰 {message}')
-            return redirect(url_for('upload_text_complete', project_id=project_id, count=len(reviews)))
-        else:
-            flash(f'저장 실패: {message}')
-            return redirect(url_for('upload_text', project_id=project_id))
+        flash(f'리뷰 {count}건 저장 완료')
+        return redirect(url_for('upload_text_complete', project_id=project_id, count=count))
     
     return render_template('upload_text.html', project=project)
 
 
-@app.route('/upload/<int:project_id>/text/complete')
+@route('/upload/<int:project_id>/text/complete')
 def upload_text_complete(project_id):
     """텍스트 제출 완료 페이지"""
     project = Project.query.get_or_404(project_id)
@@ -239,14 +396,222 @@ def upload_text_complete(project_id):
     return render_template('upload_text_complete.html', project=project, count=count)
 
 
+# ==================== 브라우저 → S3 직접 업로드 ====================
+
+@route('/upload/<int:project_id>/presign', methods=['POST'])
+def upload_presign(project_id):
+    """여러 파일에 대한 presigned POST(작은 파일) / multipart(큰 파일) 업로드 정보 발급"""
+    project = Project.query.get_or_404(project_id)
+    data = request.get_json(silent=True) or {}
+    uploader_name = (data.get('uploader_name') or '').strip()
+    files = data.get('files') or []
+    
+    if not photo_storage().supports_direct_upload:
+        return jsonify({'error': '직접 업로드를 지원하지 않는 저장소입니다.'}), 400
+    if project.normalize_max_edge:
+        return jsonify({'error': '이 프로젝트는 사진을 서버에서 정규화하므로 직접 업로드를 쓸 수 없습니다.'}), 400
+    if not uploader_name:
+        return jsonify({'error': '업로더 이름을 입력해주세요.'}), 400
+    if not files or len(files) > current_app.config['DIRECT_UPLOAD_MAX_FILES']:
+        return jsonify({'error': '업로드할 파일 수가 올바르지 않습니다.'}), 400
+    
+    max_bytes = current_app.config['DIRECT_UPLOAD_MAX_BYTES']
+    part_size = current_app.config['DIRECT_UPLOAD_PART_SIZE']
+    expires = current_app.config['DIRECT_UPLOAD_EXPIRES']
+    
+    uploads = []
+    rejected = []
+    for index, info in enumerate(files):
+        if not isinstance(info, dict):
+            rejected.append({'index': index, 'name': ''})
+            continue
+        name = info.get('name') if isinstance(info.get('name'), str) else ''
+        try:
+            size = int(info.get('size') or 0)
+        except (TypeError, ValueError):
+            size = 0
+        content_type = info.get('type') if isinstance(info.get('type'), str) else 'application/octet-stream'
+        if not allowed_file(name) or size <= 0 or size > max_bytes:
+            rejected.append({'index': index, 'name': name})
+            continue
+        
+        key = new_photo_key(current_app.config['KEY_SCHEME'], project, uploader_name, name)
+        metadata = source_metadata(project.folder_name, uploader_name, name)
+        token = upload_token(current_app.config['SECRET_KEY'], project.id, uploader_name, key, size)
+        try:
+            if size <= current_app.config['DIRECT_UPLOAD_MULTIPART_THRESHOLD']:
+                post = photo_storage().presigned_post(key, content_type, max_bytes, expires, metadata=metadata)
+                uploads.append({'index': index, 'key': key, 'size': size, 'token': token, 'method': 'post',
+                                'url': post['url'], 'fields': post['fields']})
+            else:
+                upload_id = photo_storage().create_multipart(key, content_type, metadata=metadata)
+                part_count = (size + part_size - 1) // part_size
+                parts = [{
+                    'part_number': number,
+                    'url': photo_storage().presigned_part_url(key, upload_id, number, expires)
+                } for number in range(1, part_count + 1)]
+                uploads.append({'index': index, 'key': key, 'size': size, 'token': token, 'method': 'multipart',
+                                'upload_id': upload_id, 'part_size': part_size, 'parts': parts})
+        except StorageError as e:
+            print(f"Presign error: {e}")
+            rejected.append({'index': index, 'name': name})
+    
+    return jsonify({'uploads': uploads, 'rejected': rejected})
+
+
+def finish_direct_upload(key, item):
+    """multipart 업로드를 완료하고 HEAD로 객체를 확인해 크기를 반환한다. 실패 시 None.
+    
+    multipart는 part 수만 정해질 뿐 크기 제한이 없으므로, 상한을 넘거나 신고한 크기와 다른 객체는 지운다.
+    """
+    try:
+        if item.get('upload_id'):
+            parts = sorted(
+                ({'PartNumber': int(p['part_number']), 'ETag': p['etag']} for p in item.get('parts') or []),
+                key=lambda p: p['PartNumber']
+            )
+            photo_storage().complete_multipart(key, item['upload_id'], parts)
+        size = photo_storage().head(key)
+    except (StorageError, KeyError, TypeError, ValueError) as e:
+        print(f"Direct upload verify error ({key}): {e}")
+        return None
+    
+    if size > current_app.config['DIRECT_UPLOAD_MAX_BYTES'] or size != item['size']:
+        print(f"Direct upload size mismatch ({key}): {size}B, declared {item['size']}B")
+        delete_keys(photo_storage(), [key])
+        return None
+    return size
+
+
+def process_direct_uploads(app, photo_ids):
+    """직접 업로드로 등록된 사진에 content_hash, 파생 이미지, 유사 사진 서명을 채운다 (post_upload_pool에서 실행).
+    
+    같은 프로젝트에 같은 내용이 이미 있으면 서버 업로드와 같은 규칙으로 중복을 없앤다: 같은 업로더면 새 행을
+    지우고, 다른 업로더면 기존 객체를 가리키게 바꾼 뒤, 새로 올라온 객체를 저장소에서 지운다.
+    """
+    with app.app_context():
+        photos = Photo.query.filter(Photo.id.in_(photo_ids)).order_by(Photo.id).all()
+        for photo in photos:
+            try:
+                data = photo_storage().read(photo.filename)
+                content_hash = hash_fileobj(io.BytesIO(data))
+                rows = [row for row in existing_by_hash(photo.project_id, [content_hash]).get(content_hash, [])
+                        if row[0] != photo.filename]
+                if rows:
+                    redundant = photo.filename
+                    filename, derivatives, _, stored_size, perceptual_hash, sharpness = rows[0]
+                    if any(row[2] == photo.uploader_name for row in rows):
+                        db.session.delete(photo)
+                        print(f"  DUP {redundant} (같은 업로더, 행 삭제)")
+                    else:
+                        photo.original_size = photo.file_size
+                        photo.filename, photo.derivatives, photo.file_size = filename, derivatives, stored_size
+                        photo.content_hash, photo.perceptual_hash, photo.sharpness = \
+                            content_hash, perceptual_hash, sharpness
+                        print(f"  DUP {redundant} -> {filename}")
+                    db.session.commit()
+                    delete_keys(photo_storage(), [redundant])
+                    continue
+                photo.content_hash = content_hash
+                if current_app.config['DERIVATIVES_ON_UPLOAD']:
+                    generate_derivatives(photo_storage(), photo, data)
+                else:
+                    photo.perceptual_hash, photo.sharpness = signature_from_bytes(data)
+                db.session.commit()
+            except Exception as e:
+                # 실패한 사진은 derivatives/dedupe/similar backfill 명령으로 다시 채울 수 있다
+                db.session.rollback()
+                print(f"직접 업로드 후처리 실패 ({photo.filename}): {e}")
+
+
+@route('/upload/<int:project_id>/presign/complete', methods=['POST'])
+def upload_presign_complete(project_id):
+    """직접 업로드된 객체를 HEAD로 검증하고 Photo 행을 한 트랜잭션으로 등록"""
+    project = Project.query.get_or_404(project_id)
+    data = request.get_json(silent=True) or {}
+    uploader_name = (data.get('uploader_name') or '').strip()
+    items = data.get('uploads') or []
+    reviews = [r.strip() for r in (data.get('reviews') or [])[:5] if isinstance(r, str) and r.strip()]
+    
+    if not uploader_name:
+        return jsonify({'error': '업로더 이름을 입력해주세요.'}), 400
+    
+    # 이 프로젝트/업로더에 발급한 키(서명 확인)만, 아직 등록되지 않은 것만 받는다
+    def issued(item):
+        expected = upload_token(current_app.config['SECRET_KEY'], project.id, uploader_name,
+                                item['key'], item['size'])
+        return hmac.compare_digest(str(item.get('token', '')), expected)
+    
+    items = {item['key']: item for item in items
+             if isinstance(item, dict) and isinstance(item.get('key'), str)
+             and type(item.get('size')) is int and issued(item)}
+    if items:
+        existing = {row.filename for row in
+                    Photo.query.with_entities(Photo.filename).filter(Photo.filename.in_(list(items)))}
+        for key in existing:
+            items.pop(key)
+    db.session.close()  # HEAD 확인 동안 커넥션을 풀에 돌려준다
+    
+    photos = []
+    if items:
+        with ThreadPoolExecutor(max_workers=min(8, len(items))) as pool:
+            heads = dict(zip(items, pool.map(in_app_context(lambda key: finish_direct_upload(key, items[key])), items)))
+        
+        for key, size in heads.items():
+            if size is None:
+                continue
+            photos.append(Photo(
+                filename=key,
+                original_filename=items[key].get('original_filename') or key.rsplit('/', 1)[-1],
+                file_size=size,
+                uploader_name=uploader_name,
+                project_id=project.id
+            ))
+        db.session.add_all(photos)
+    uploaded_count = len(photos)
+    
+    review_count = enqueue_reviews(uploader_name, project.name, reviews) if reviews else 0
+    
+    db.session.commit()
+    if photos:
+        post_upload_pool.submit(process_direct_uploads, current_app._get_current_object(), [photo.id for photo in photos])
+    if review_count:
+        review_flusher.wake()
+    
+    if uploaded_count == 0 and review_count == 0:
+        return jsonify({'error': '업로드된 사진을 확인할 수 없습니다.'}), 400
+    return jsonify({
+        'photo_count': uploaded_count,
+        'review_count': review_count,
+        'redirect': url_for('upload_complete', project_id=project_id,
+                            photo_count=uploaded_count, review_count=review_count)
+    })
+
+
+@route('/storage/<path:key>')
+def local_storage_file(key):
+    """LocalStorage 객체 제공 (서명된 URL만 허용, sendfile로 전송)"""
+    if not isinstance(photo_storage(), LocalStorage):
+        return ('', 404)
+    download_name = request.args.get('name')
+    if not photo_storage().verify(key, request.args.get('expires'), request.args.get('sig'), download_name):
+        return ('', 403)
+    try:
+        response = photo_storage().send(key, download_name)
+    except ObjectNotFound:
+        return ('', 404)
+    response.headers['Cache-Control'] = 'private, max-age=3600'
+    return response
+
+
 # ==================== 관리자 페이지 ====================
 
-@app.route('/admin/login', methods=['GET', 'POST'])
+@route('/admin/login', methods=['GET', 'POST'])
 def admin_login():
     """관리자 로그인"""
     if request.method == 'POST':
         password = request.form.get('password', '')
-        if password == app.config['ADMIN_PASSWORD']:
+        if password == current_app.config['ADMIN_PASSWORD']:
             session['is_admin'] = True
             flash('로그인 성공!', 'success')
             return redirect(url_for('admin_dashboard'))
@@ -256,7 +621,7 @@ def admin_login():
     return render_template('admin_login.html')
 
 
-@app.route('/admin/logout')
+@route('/admin/logout')
 def admin_logout():
     """관리자 로그아웃"""
     session.pop('is_admin', None)
@@ -264,15 +629,19 @@ def admin_logout():
     return redirect(url_for('index'))
 
 
-@app.route('/admin')
+@route('/admin')
 @admin_required
+@cached('admin_dashboard', private=True)
 def admin_dashboard():
     """관리자 대시보드"""
-    projects = Project.query.order_by(Project.created_at.desc()).all()
-    return render_template('admin_dashboard.html', projects=projects)
+    purge_jobs = PurgeJob.query.filter(PurgeJob.status != 'done').order_by(PurgeJob.created_at.desc()).all()
+    purging_ids = [job.project_id for job in purge_jobs]
+    projects = Project.query.filter(~Project.id.in_(purging_ids)).order_by(Project.created_at.desc()).all()
+    Project.load_stats(projects)
+    return render_template('admin_dashboard.html', projects=projects, purge_jobs=purge_jobs)
 
 
-@app.route('/admin/project/new', methods=['GET', 'POST'])
+@route('/admin/project/new', methods=['GET', 'POST'])
 @admin_required
 def admin_project_new():
     """새 프로젝트 생성"""
@@ -291,6 +660,7 @@ def admin_project_new():
             description=description,
             folder_name=folder_name
         )
+        project.normalize_max_edge, project.normalize_quality = parse_normalize_policy(request.form)
         db.session.add(project)
         db.session.commit()
         
@@ -300,7 +670,7 @@ def admin_project_new():
     return render_template('admin_project_form.html', project=None)
 
 
-@app.route('/admin/project/<int:project_id>/edit', methods=['GET', 'POST'])
+@route('/admin/project/<int:project_id>/edit', methods=['GET', 'POST'])
 @admin_required
 def admin_project_edit(project_id):
     """프로젝트 수정"""
@@ -310,6 +680,7 @@ def admin_project_edit(project_id):
         project.name = request.form.get('name', '').strip()
         project.description = request.form.get('description', '').strip()
         project.is_active = request.form.get('is_active') == 'on'
+        project.normalize_max_edge, project.normalize_quality = parse_normalize_policy(request.form)
         db.session.commit()
         
         flash('프로젝트가 수정되었습니다.', 'success')
@@ -318,176 +689,327 @@ def admin_project_edit(project_id):
     return render_template('admin_project_form.html', project=project)
 
 
-@app.route('/admin/project/<int:project_id>/delete', methods=['POST'])
+@route('/admin/project/<int:project_id>/delete', methods=['POST'])
 @admin_required
 def admin_project_delete(project_id):
-    """프로젝트 삭제"""
+    """프로젝트 삭제 (사진이 많으면 백그라운드 작업으로 넘김)"""
     project = Project.query.get_or_404(project_id)
+    photo_query = Photo.query.filter_by(project_id=project_id)
+    total = photo_query.count()
     
-    s3 = get_s3_client()
-    for photo in project.photos:
-        try:
-            s3.delete_object(Bucket=S3_BUCKET, Key=photo.filename)
-        except:
-            pass
+    if total > current_app.config['PURGE_SYNC_LIMIT']:
+        project.is_active = False
+        job = PurgeJob(project_id=project.id, project_name=project.name, total=total)
+        db.session.add(job)
+        db.session.commit()
+        start_purge(current_app._get_current_object(), job.id, photo_storage(),
+                    current_app.config['S3_DELETE_WORKERS'])
+        
+        flash(f'프로젝트 "{project.name}" 삭제를 시작했습니다. ({total}장, 백그라운드 진행)', 'info')
+        return redirect(url_for('admin_dashboard'))
+    
+    keys = [key for photo in photo_query.all() for key in photo_keys(photo)]
+    failed = delete_keys(photo_storage(), keys, current_app.config['S3_DELETE_WORKERS'])
+    if failed:
+        print(f"S3 삭제 실패 {len(failed)}개 (프로젝트 {project.id})")
     
+    photo_query.delete(synchronize_session=False)
     db.session.delete(project)
     db.session.commit()
+    drop_archives(photo_storage(), project_id)
     
     flash(f'프로젝트 "{project.name}"이 삭제되었습니다.', 'success')
     return redirect(url_for('admin_dashboard'))
 
 
-@app.route('/admin/project/<int:project_id>')
+@route('/admin/purge/<int:job_id>')
 @admin_required
+def admin_purge_status(job_id):
+    """백그라운드 프로젝트 삭제 진행 상황"""
+    job = db.get_or_404(PurgeJob, job_id)
+    return jsonify(job.to_dict())
+
+
+@route('/admin/purge/<int:job_id>/retry', methods=['POST'])
+@admin_required
+def admin_purge_retry(job_id):
+    """실패한 프로젝트 삭제 작업 재시도 (남은 사진만 다시 처리)"""
+    job = db.get_or_404(PurgeJob, job_id)
+    stale = job.updated_at and job.updated_at < datetime.utcnow() - timedelta(minutes=10)
+    if job.status == 'done':
+        flash('이미 완료된 작업입니다.', 'info')
+    elif job.status != 'failed' and not stale:
+        flash('삭제 작업이 아직 진행 중입니다.', 'info')
+    else:
+        start_purge(current_app._get_current_object(), job.id, photo_storage(),
+                    current_app.config['S3_DELETE_WORKERS'])
+        flash(f'프로젝트 "{job.project_name}" 삭제를 다시 시작했습니다.', 'info')
+    return redirect(url_for('admin_dashboard'))
+
+
+@route('/admin/project/<int:project_id>')
+@admin_required
+@read_replica
 def admin_project_detail(project_id):
-    """프로젝트 상세 - 사진 목록"""
+    """프로젝트 상세 - 업로더별 요약 + 첫 페이지 사진 (나머지는 fragment로 이어 받음)"""
     project = Project.query.get_or_404(project_id)
-    
-    uploaders = {}
-    for photo in project.photos:
-        if photo.uploader_name not in uploaders:
-            uploaders[photo.uploader_name] = []
-        uploaders[photo.uploader_name].append(photo)
+    filters = parse_filters(request.args)
+    summary = uploader_summary(project_id, filters)
+    photos, next_cursor = list_photos(project_id, filters, limit=request.args.get('limit', type=int))
     
     return render_template('admin_project_detail.html', 
                            project=project, 
-                           uploaders=uploaders,
-                           s3_bucket=S3_BUCKET,
-                           s3_region=os.environ.get('AWS_REGION', 'ap-northeast-2'))
+                           summary=summary,
+                           all_uploaders=[row['uploader_name'] for row in uploader_summary(project_id)] if filters else
+                                         [row['uploader_name'] for row in summary],
+                           photos=photos,
+                           similar=similar_sizes(project_id, filters),
+                           next_cursor=next_cursor,
+                           filters=request.args)
+
+
+def similar_clusters(project_id, uploader_name):
+    """유사 사진 묶음 (similar는 NumPy를 불러오므로 처음 쓸 때 import)"""
+    from similar import project_clusters
+    return project_clusters(project_id, uploader_name, current_app.config['SIMILAR_MAX_DISTANCE'])
+
+
+def similar_sizes(project_id, filters):
+    """대표만 보기일 때 대표 사진 id → 묶음 크기 (카드에 "+N" 표시용)"""
+    if not filters.get('best'):
+        return {}
+    return similar_clusters(project_id, filters.get('uploader')).sizes
+
+
+@route('/admin/project/<int:project_id>/photos')
+@admin_required
+@read_replica
+def admin_project_photos_fragment(project_id):
+    """사진 카드 HTML 조각 (더 보기). 다음 커서는 X-Next-Cursor 헤더로 전달"""
+    Project.query.get_or_404(project_id)
+    filters = parse_filters(request.args)
+    photos, next_cursor = list_photos(project_id, filters,
+                                      after=request.args.get('after'), limit=request.args.get('limit', type=int))
+    response = current_app.make_response(render_template('_photo_cards.html', photos=photos,
+                                                 similar=similar_sizes(project_id, filters)))
+    response.headers['X-Next-Cursor'] = next_cursor or ''
+    return response
 
 
-@app.route('/admin/photo/<int:photo_id>/download')
+@route('/admin/api/project/<int:project_id>/photos')
+@admin_required
+@read_replica
+def admin_api_project_photos(project_id):
+    """사진 목록 JSON (keyset 페이지네이션, uploader/downloaded/from/to 필터)"""
+    Project.query.get_or_404(project_id)
+    filters = parse_filters(request.args)
+    photos, next_cursor = list_photos(project_id, filters,
+                                      after=request.args.get('after'), limit=request.args.get('limit', type=int))
+    return jsonify({
+        'photos': [dict(photo.to_dict(), thumb_url=photo_url(photo, 'thumb'), preview_url=photo_url(photo, 'preview'))
+                   for photo in photos],
+        'next': next_cursor,
+    })
+
+
+@route('/admin/api/project/<int:project_id>/uploaders')
+@admin_required
+@read_replica
+def admin_api_project_uploaders(project_id):
+    """업로더별 사진 수/다운로드 수/용량 요약 JSON"""
+    Project.query.get_or_404(project_id)
+    return jsonify({'uploaders': uploader_summary(project_id, parse_filters(request.args))})
+
+
+@route('/admin/photo/<int:photo_id>/download')
 @admin_required
 def admin_photo_download(photo_id):
     """개별 사진 다운로드"""
     photo = Photo.query.get_or_404(photo_id)
     
-    s3 = get_s3_client()
+    download_name = f"{photo.uploader_name}_{photo.original_filename}"
+    
     try:
-        response = s3.get_object(Bucket=S3_BUCKET, Key=photo.filename)
+        if current_app.config['PHOTO_DOWNLOAD_MODE'] == 'redirect':
+            # 본문은 저장소에서 브라우저로 바로 전달되고, 이어받기(Range)도 저장소가 처리한다
+            response = redirect(signed_urls.url(photo.filename, download_name))
+        else:
+            response = photo_storage().send(photo.filename, download_name)
         
         photo.is_downloaded = True
         photo.downloaded_at = datetime.utcnow()
         db.session.commit()
         
-        return send_file(
-            io.BytesIO(response['Body'].read()),
-            download_name=f"{photo.uploader_name}_{photo.original_filename}",
-            as_attachment=True
-        )
-    except ClientError as e:
+        return response
+    except StorageError as e:
         flash(f'다운로드 오류: {str(e)}', 'error')
         return redirect(url_for('admin_project_detail', project_id=photo.project_id))
 
 
-@app.route('/admin/photo/<int:photo_id>/preview')
+@route('/admin/photo/<int:photo_id>/preview')
 @admin_required
 def admin_photo_preview(photo_id):
     """사진 미리보기 URL (presigned)"""
     photo = Photo.query.get_or_404(photo_id)
     
-    s3 = get_s3_client()
     try:
-        url = s3.generate_presigned_url(
-            'get_object',
-            Params={'Bucket': S3_BUCKET, 'Key': photo.filename},
-            ExpiresIn=3600
-        )
+        url = signed_urls.url(photo.filename)
         return jsonify({'url': url})
-    except ClientError:
+    except StorageError:
         return jsonify({'error': 'URL 생성 실패'}), 500
 
 
-@app.route('/admin/project/<int:project_id>/download-all')
+@route('/admin/api/photos/urls', methods=['POST'])
 @admin_required
-def admin_project_download_all(project_id):
-    """프로젝트 전체 ZIP 다운로드"""
-    project = Project.query.get_or_404(project_id)
+def admin_api_photo_urls():
+    """여러 사진의 서명된 URL을 한 번에 발급 (variant: thumb / preview / original)"""
+    data = request.get_json(silent=True) or {}
+    variant = data.get('variant', 'thumb')
+    try:
+        photo_ids = [int(photo_id) for photo_id in (data.get('ids') or [])][:current_app.config['SIGNED_URL_BATCH_MAX']]
+    except (TypeError, ValueError):
+        return jsonify({'error': '잘못된 사진 ID'}), 400
     
-    if not project.photos:
-        flash('다운로드할 사진이 없습니다.', 'error')
-        return redirect(url_for('admin_project_detail', project_id=project_id))
+    photos = Photo.query.filter(Photo.id.in_(photo_ids)).all() if photo_ids else []
+    try:
+        urls = {photo.id: photo_url(photo, None if variant == 'original' else variant) for photo in photos}
+    except StorageError:
+        return jsonify({'error': 'URL 생성 실패'}), 500
+    return jsonify({'urls': urls, 'expires_in': signed_urls.ttl})
+
+
+def archive_or_stream(project, uploader_name, download_name):
+    """이미 만들어 둔 같은 구성의 아카이브가 있으면 그것으로, 없으면 스트리밍 ZIP으로 응답.
     
-    s3 = get_s3_client()
+    ?only=new 이면 아직 받지 않은 사진만, ?since=<일시> 이면 그 이후 업로드된 사진만 담는다.
+    ?best=1 이면 유사 사진 묶음마다 대표 한 장만 담는다 (다른 조건과 함께 쓸 수 있음).
+    """
+    hidden = frozenset()
+    if request.args.get('best') == '1':
+        hidden = similar_clusters(project.id, uploader_name).hidden
+        download_name = download_name.replace('.zip', '_대표.zip')
     
-    zip_buffer = io.BytesIO()
-    with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zip_file:
-        for photo in project.photos:
-            try:
-                response = s3.get_object(Bucket=S3_BUCKET, Key=photo.filename)
-                file_data = response['Body'].read()
-                
-                zip_path = f"{photo.uploader_name}/{photo.original_filename}"
-                zip_file.writestr(zip_path, file_data)
-                
-                photo.is_downloaded = True
-                photo.downloaded_at = datetime.utcnow()
-                
-            except ClientError:
-                continue
+    since = parse_since(request.args.get('since'))
+    if since or request.args.get('only') == 'new':
+        photos = [photo for photo in incremental_photos(project.id, uploader_name, since) if photo.id not in hidden]
+        if not photos:
+            flash('새로 받을 사진이 없습니다.', 'info')
+            return redirect(url_for('admin_project_detail', project_id=project.id))
+        suffix = since.strftime('%Y%m%d%H%M') + '이후' if since else '새사진'
+        return zip_response(zip_entries(photos, uploader_name),
+                            download_name.replace('.zip', f'_{suffix}.zip'))
     
-    db.session.commit()
-    zip_buffer.seek(0)
+    photos = [photo for photo in scope_photos(project.id, uploader_name) if photo.id not in hidden]
+    if not photos:
+        flash('다운로드할 사진이 없습니다.', 'error')
+        return redirect(url_for('admin_project_detail', project_id=project.id))
+    if hidden:
+        return zip_response(zip_entries(photos, uploader_name), download_name)
     
-    return send_file(
-        zip_buffer,
-        download_name=f"{project.name}_전체사진.zip",
-        as_attachment=True,
-        mimetype='application/zip'
-    )
+    job = find_archive(project.id, uploader_name, fingerprint(photos, uploader_name), include_active=False)
+    if job is not None:
+        return redirect(url_for('admin_archive_download', job_id=job.id))
+    return zip_response(zip_entries(photos, uploader_name), download_name)
+
+
+@route('/admin/project/<int:project_id>/download-all')
+@admin_required
+def admin_project_download_all(project_id):
+    """프로젝트 전체 ZIP 다운로드"""
+    project = Project.query.get_or_404(project_id)
+    return archive_or_stream(project, None, f"{project.name}_전체사진.zip")
 
 
-@app.route('/admin/uploader/<int:project_id>/<uploader_name>/download')
+@route('/admin/uploader/<int:project_id>/<uploader_name>/download')
 @admin_required
 def admin_uploader_download(project_id, uploader_name):
     """특정 업로더의 사진만 ZIP 다운로드"""
     project = Project.query.get_or_404(project_id)
-    photos = Photo.query.filter_by(project_id=project_id, uploader_name=uploader_name).all()
+    return archive_or_stream(project, uploader_name, f"{project.name}_{uploader_name}.zip")
+
+
+@route('/admin/project/<int:project_id>/archive', methods=['POST'])
+@admin_required
+def admin_project_archive(project_id):
+    """ZIP을 백그라운드로 만들어 저장소에 올리는 작업 시작 (같은 구성의 아카이브가 있으면 재사용)"""
+    project = Project.query.get_or_404(project_id)
+    payload = request.get_json(silent=True) or request.form
+    uploader_name = payload.get('uploader') or None
     
+    photos = scope_photos(project.id, uploader_name)
     if not photos:
-        flash('다운로드할 사진이 없습니다.', 'error')
-        return redirect(url_for('admin_project_detail', project_id=project_id))
-    
-    s3 = get_s3_client()
+        return jsonify({'error': '다운로드할 사진이 없습니다.'}), 400
     
-    zip_buffer = io.BytesIO()
-    with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zip_file:
-        for photo in photos:
-            try:
-                response = s3.get_object(Bucket=S3_BUCKET, Key=photo.filename)
-                file_data = response['Body'].read()
-                zip_file.writestr(photo.original_filename, file_data)
-                
-                photo.is_downloaded = True
-                photo.downloaded_at = datetime.utcnow()
-                
-            except ClientError:
-                continue
+    job = find_archive(project.id, uploader_name, fingerprint(photos, uploader_name))
+    if job is None:
+        download_name = f"{project.name}_{uploader_name}.zip" if uploader_name else f"{project.name}_전체사진.zip"
+        job = ArchiveJob(project_id=project.id, uploader_name=uploader_name,
+                         download_name=download_name, total=len(photos))
+        db.session.add(job)
+        db.session.commit()
+        start_archive(current_app._get_current_object(), job.id, photo_storage(),
+                      prefetch=current_app.config['ZIP_PREFETCH_WINDOW'],
+                      max_buffer=current_app.config['ZIP_PREFETCH_MAX_BYTES'],
+                      part_size=current_app.config['ARCHIVE_PART_SIZE'])
+    return jsonify(archive_status(job)), 202
+
+
+def archive_status(job):
+    data = job.to_dict()
+    data['status_url'] = url_for('admin_archive_status', job_id=job.id)
+    if job.status == 'done':
+        data['download_url'] = url_for('admin_archive_download', job_id=job.id)
+    return data
+
+
+@route('/admin/archive/<int:job_id>')
+@admin_required
+def admin_archive_status(job_id):
+    """백그라운드 아카이브 진행 상황"""
+    return jsonify(archive_status(db.get_or_404(ArchiveJob, job_id)))
+
+
+@route('/admin/archive/<int:job_id>/download')
+@admin_required
+def admin_archive_download(job_id):
+    """완료된 아카이브를 서명된 URL로 내려받고, 담긴 사진을 다운로드 처리"""
+    job = db.get_or_404(ArchiveJob, job_id)
+    if job.status != 'done':
+        flash('아직 준비되지 않은 아카이브입니다.', 'error')
+        return redirect(url_for('admin_project_detail', project_id=job.project_id))
     
-    db.session.commit()
-    zip_buffer.seek(0)
+    try:
+        url = signed_urls.url(job.key, job.download_name)
+    except StorageError as e:
+        flash(f'다운로드 오류: {str(e)}', 'error')
+        return redirect(url_for('admin_project_detail', project_id=job.project_id))
     
-    return send_file(
-        zip_buffer,
-        download_name=f"{project.name}_{uploader_name}.zip",
-        as_attachment=True,
-        mimetype='application/zip'
-    )
+    # 아카이브를 만든 뒤에 올라온 사진은 담기지 않았으므로 담긴 가장 큰 id까지만 다운로드 처리한다.
+    # max_photo_id가 없는 예전 작업은 사진 구성이 그대로일 때만 범위 전체를 처리
+    filters = {'downloaded': False}
+    if job.uploader_name is not None:
+        filters['uploader'] = job.uploader_name
+    conditions = filter_conditions(job.project_id, filters)
+    if job.max_photo_id is not None:
+        conditions.append(Photo.id <= job.max_photo_id)
+    elif fingerprint(scope_photos(job.project_id, job.uploader_name), job.uploader_name) != job.fingerprint:
+        conditions = None
+    if conditions is not None:
+        Photo.query.filter(*conditions).update(
+            {'is_downloaded': True, 'downloaded_at': datetime.utcnow()}, synchronize_session=False
+        )
+        db.session.commit()
+    return redirect(url)
 
 
-@app.route('/admin/photo/<int:photo_id>/delete', methods=['POST'])
+@route('/admin/photo/<int:photo_id>/delete', methods=['POST'])
 @admin_required
 def admin_photo_delete(photo_id):
     """개별 사진 삭제"""
     photo = Photo.query.get_or_404(photo_id)
     project_id = photo.project_id
     
-    s3 = get_s3_client()
-    try:
-        s3.delete_object(Bucket=S3_BUCKET, Key=photo.filename)
-    except:
-        pass
+    delete_keys(photo_storage(), unreferenced_keys([photo]))
     
     db.session.delete(photo)
     db.session.commit()
@@ -496,7 +1018,7 @@ def admin_photo_delete(photo_id):
     return redirect(url_for('admin_project_detail', project_id=project_id))
 
 
-@app.route('/admin/photos/delete-selected', methods=['POST'])
+@route('/admin/photos/delete-selected', methods=['POST'])
 @admin_required
 def admin_photos_delete_selected():
     """선택한 사진들 일괄 삭제"""
@@ -506,28 +1028,24 @@ def admin_photos_delete_selected():
         return redirect(request.referrer or url_for('admin_dashboard'))
     
     photo_ids = [int(id) for id in ids.split(',') if id.strip()]
-    project_id = None
+    photos = Photo.query.filter(Photo.id.in_(photo_ids)).all()
+    project_id = photos[0].project_id if photos else None
     
-    s3 = get_s3_client()
-    for photo_id in photo_ids:
-        photo = Photo.query.get(photo_id)
-        if photo:
-            project_id = photo.project_id
-            try:
-                s3.delete_object(Bucket=S3_BUCKET, Key=photo.filename)
-            except Exception as e:
-                print(f"S3 삭제 오류: {e}")
-            db.session.delete(photo)
+    keys = unreferenced_keys(photos)
+    failed = delete_keys(photo_storage(), keys, current_app.config['S3_DELETE_WORKERS'])
+    if failed:
+        print(f"S3 삭제 실패 {len(failed)}개")
     
+    Photo.query.filter(Photo.id.in_([photo.id for photo in photos])).delete(synchronize_session=False)
     db.session.commit()
-    flash(f'{len(photo_ids)}개의 사진이 삭제되었습니다.')
+    flash(f'{len(photos)}개의 사진이 삭제되었습니다.')
     
     if project_id:
         return redirect(url_for('admin_project_detail', project_id=project_id))
     return redirect(url_for('admin_dashboard'))
 
 
-@app.route('/admin/photos/download-selected')
+@route('/admin/photos/download-selected')
 @admin_required
 def admin_photos_download_selected():
     """선택한 사진들 일괄 다운로드 (ZIP)"""
@@ -543,37 +1061,283 @@ def admin_photos_download_selected():
         flash('사진을 찾을 수 없습니다.')
         return redirect(request.referrer or url_for('admin_dashboard'))
     
-    s3 = get_s3_client()
+    entries = [ZipEntry(f"{photo.uploader_name}_{photo.original_filename}", photo.filename, photo.uploaded_at, photo)
+               for photo in photos]
+    return zip_response(entries, f'selected_photos_{datetime.now().strftime("%Y%m%d_%H%M%S")}.zip')
+
+
+def manifest_response(scope, project, name):
+    """병렬 다운로드용 매니페스트를 스트리밍으로 응답.
     
-    zip_buffer = io.BytesIO()
-    with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zip_file:
-        for photo in photos:
-            try:
-                response = s3.get_object(Bucket=S3_BUCKET, Key=photo.filename)
-                file_data = response['Body'].read()
-                zip_file.writestr(f"{photo.uploader_name}_{photo.original_filename}", file_data)
-                
-                photo.is_downloaded = True
-                photo.downloaded_at = datetime.utcnow()
-            except Exception as e:
-                print(f"다운로드 오류: {e}")
-                continue
+    ?format=csv|json|aria2 (기본 csv), ?mark=issue(끝까지 보내면 다운로드 처리, 기본)|confirm(확인 URL로
+    POST할 때)|none. confirm이면 확인 URL을 X-Manifest-Confirm 헤더와 매니페스트(JSON/aria2 주석)에 담는다.
+    """
+    fmt = request.args.get('format', 'csv')
+    mark = request.args.get('mark', 'issue')
+    if fmt not in MANIFEST_FORMATS or mark not in MARK_MODES:
+        return jsonify({'error': '잘못된 format 또는 mark'}), 400
+    
+    count, size = scope.summarize()
+    if not count:
+        flash('매니페스트에 담을 사진이 없습니다.', 'info')
+        return redirect(request.referrer or url_for('admin_dashboard'))
+    expires = current_app.config['MANIFEST_URL_TTL']
+    confirm_url = url_for('admin_manifest_confirm', token=scope.to_token(current_app.config['SECRET_KEY']),
+                          _external=True) if mark == 'confirm' else None
+    meta = manifest_meta(count, size, expires, project, confirm_url)
+    url_root = request.host_url.rstrip('/')
+    
+    def generate():
+        # 본문은 뷰가 반환된 뒤 만들어지므로 리플리카 읽기를 여기서 다시 켠다
+        with replica_reads():
+            entries = manifest_entries(photo_storage(), scope, expires, current_app.config['MANIFEST_BATCH_SIZE'],
+                                       url_root)
+            yield from render_manifest(entries, fmt, meta)
+        if mark == 'issue':
+            mark_downloaded(scope)
+            db.session.commit()
     
+    mimetype, extension = MANIFEST_FORMATS[fmt]
+    headers = {'Content-Disposition': attachment_disposition(f"{name}_manifest.{extension}")}
+    if confirm_url:
+        headers['X-Manifest-Confirm'] = confirm_url
+    return Response(stream_with_context(generate()), mimetype=mimetype, headers=headers)
+
+
+@route('/admin/project/<int:project_id>/manifest')
+@admin_required
+@read_replica
+def admin_project_manifest(project_id):
+    """프로젝트(또는 ?uploader=) 사진의 매니페스트. 목록 필터(downloaded, from, to, best)도 적용"""
+    project = Project.query.get_or_404(project_id)
+    scope = ManifestScope(project.id, request.args)
+    uploader_name = scope.filter_args.get('uploader')
+    return manifest_response(scope, project, f"{project.name}_{uploader_name}" if uploader_name else project.name)
+
+
+@route('/admin/photos/manifest')
+@admin_required
+@read_replica
+def admin_photos_manifest():
+    """선택한 사진들의 매니페스트 (?ids=1,2,3)"""
+    try:
+        photo_ids = [int(id) for id in request.args.get('ids', '').split(',') if id.strip()]
+    except ValueError:
+        photo_ids = []
+    if not photo_ids:
+        flash('매니페스트로 받을 사진을 선택해주세요.')
+        return redirect(request.referrer or url_for('admin_dashboard'))
+    return manifest_response(ManifestScope(photo_ids=photo_ids), None,
+                             f'selected_photos_{datetime.now().strftime("%Y%m%d_%H%M%S")}')
+
+
+@route('/admin/manifest/confirm', methods=['POST'])
+def admin_manifest_confirm():
+    """매니페스트의 사진을 다 받았다고 확인 → 범위 전체를 한 번에 다운로드 처리.
+    
+    서명된 토큰이 곧 권한이므로 다운로드를 마친 스크립트가 관리자 로그인 없이 curl -X POST로 호출할 수 있다.
+    """
+    scope = ManifestScope.from_token(current_app.config['SECRET_KEY'], request.args.get('token', ''))
+    if scope is None:
+        return jsonify({'error': '잘못되었거나 만료된 확인 토큰'}), 403
+    updated = mark_downloaded(scope)
     db.session.commit()
-    zip_buffer.seek(0)
+    return jsonify({'updated': updated})
+
+
+# ==================== CLI ====================
+
+@command('derivatives-backfill')
+@click.option('--project-id', type=int, default=None, help='특정 프로젝트만 처리')
+@click.option('--limit', type=int, default=None, help='최대 처리 개수')
+def derivatives_backfill(project_id, limit):
+    """썸네일/미리보기가 없는 기존 사진의 파생 이미지 생성"""
+    query = Photo.query.filter(db.or_(Photo.derivatives.is_(None), Photo.derivatives == ''))
+    if project_id:
+        query = query.filter_by(project_id=project_id)
+    photos = query.order_by(Photo.id).limit(limit).all()
     
-    return send_file(
-        zip_buffer,
-        mimetype='application/zip',
-        as_attachment=True,
-        download_name=f'selected_photos_{datetime.now().strftime("%Y%m%d_%H%M%S")}.zip'
+    done = 0
+    for photo in photos:
+        try:
+            generate_derivatives(photo_storage(), photo)
+            db.session.commit()
+            done += 1
+        except Exception as e:
+            db.session.rollback()
+            print(f"파생 이미지 생성 실패 ({photo.filename}): {e}")
+    click.echo(f"{done}/{len(photos)}장 처리 완료")
+
+
+@command('dedupe-backfill')
+@click.option('--project-id', type=int, default=None, help='특정 프로젝트만 처리')
+@click.option('--limit', type=int, default=None, help='해시 계산 최대 개수')
+@click.option('--dry-run', is_flag=True, help='합칠 대상만 세고 변경하지 않음')
+def dedupe_backfill(project_id, limit, dry_run):
+    """기존 사진의 content_hash를 채우고 프로젝트 내 중복 객체를 합친다"""
+    done, failed = backfill_hashes(photo_storage(), project_id=project_id, limit=limit,
+                                   workers=current_app.config['UPLOAD_WORKERS'])
+    click.echo(f"해시 계산 {done}장, 실패 {failed}장")
+    
+    released, removed, repointed = collapse_duplicates(project_id=project_id, dry_run=dry_run)
+    keys = [key for k in released for key in [k] + [derivative_key(k, name) for name in DERIVATIVE_SPECS]]
+    if dry_run:
+        click.echo(f"[dry-run] 중복 행 삭제 {removed}개, 재지정 {repointed}개, 해제될 객체 {len(released)}개")
+        return
+    failed_keys = delete_keys(photo_storage(), keys, workers=current_app.config['S3_DELETE_WORKERS'])
+    click.echo(f"중복 행 삭제 {removed}개, 재지정 {repointed}개, 객체 {len(released)}개 해제 "
+               f"(키 삭제 실패 {len(failed_keys)}개)")
+
+
+@command('similar-backfill')
+@click.option('--project-id', type=int, default=None, help='특정 프로젝트만 처리')
+@click.option('--limit', type=int, default=None, help='최대 처리 개수')
+def similar_backfill(project_id, limit):
+    """유사 사진 서명(dHash, 선명도)이 없는 기존 사진의 서명을 채운다"""
+    from similar import backfill_signatures
+    done, failed = backfill_signatures(photo_storage(), project_id=project_id, limit=limit,
+                                       workers=current_app.config['UPLOAD_WORKERS'])
+    click.echo(f"서명 계산 {done}장, 실패 {failed}장")
+
+
+@command('storage-reconcile')
+@click.option('--workers', type=int, default=16, help='병렬 목록 조회 스레드 수')
+@click.option('--min-age', type=int, default=3600,
+              help='이보다 최근(초)에 생긴 고아 객체와 사진 행은 건너뜀 (진행 중 업로드/rekey)')
+@click.option('--report', 'report_path', type=click.Path(dir_okay=False), help='고아/누락 키 목록을 저장할 JSON 파일')
+@click.option('--delete-orphans', is_flag=True, help='고아 객체 삭제')
+@click.option('--prune-missing', is_flag=True, help='원본이 없는 사진 행 삭제, 없는 파생 이미지 표시 제거')
+def storage_reconcile(workers, min_age, report_path, delete_orphans, prune_missing):
+    """저장소 목록과 photos 테이블을 대조해 고아/누락 객체를 보고하고 선택적으로 정리한다"""
+    started = time.perf_counter()
+    report = reconcile.reconcile(
+        photo_storage(), workers=workers, min_age=min_age,
+        progress=lambda done, total: done % 100 == 0 and click.echo(f"  shard {done}/{total}", err=True)
     )
+    orphan_bytes = sum(entry['size'] for entry in report['orphans'])
+    missing_bytes = sum(entry['size'] or 0 for entry in report['missing'])
+    click.echo(f"shard {report['shards']}개, 객체 {report['objects']}개 ({format_bytes(report['bytes'])}), "
+               f"{time.perf_counter() - started:.1f}초")
+    click.echo(f"고아 객체 {len(report['orphans'])}개 ({format_bytes(orphan_bytes)}), "
+               f"최근 객체 {report['skipped_recent']}개, 최근 사진 행 {report['skipped_recent_rows']}개 건너뜀")
+    click.echo(f"누락 객체 {len(report['missing'])}개 (원본 기준 {format_bytes(missing_bytes)})")
+    for entry in report['orphans'][:10]:
+        click.echo(f"  고아 {entry['key']} ({format_bytes(entry['size'])})")
+    for entry in report['missing'][:10]:
+        click.echo(f"  누락 {entry['key']} (사진 {', '.join(map(str, entry['photo_ids']))})")
+
+    if report_path:
+        with open(report_path, 'w') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        click.echo(f"보고서 저장: {report_path}")
 
+    if delete_orphans and report['orphans']:
+        failed_keys = reconcile.delete_orphans(photo_storage(), report,
+                                               workers=current_app.config['S3_DELETE_WORKERS'])
+        click.echo(f"고아 객체 {len(report['orphans']) - len(failed_keys)}개 삭제 (실패 {len(failed_keys)}개)")
+    if prune_missing and report['missing']:
+        removed, fixed = reconcile.prune_missing(photo_storage(), report,
+                                                 workers=current_app.config['S3_DELETE_WORKERS'])
+        click.echo(f"사진 행 {removed}개 삭제, 파생 이미지 표시 {fixed}개 수정")
 
-# DB 초기화
-with app.app_context():
+
+def init_db():
+    """테이블 생성 + 미적용 스키마 마이그레이션 실행 (app context 안에서). 적용한 버전 목록 반환"""
     db.create_all()
+    return migrations.upgrade(db.engine)
+
+
+@command('storage-rekey')
+@click.option('--project-id', type=int, default=None, help='특정 프로젝트만 처리')
+@click.option('--limit', type=int, default=None, help='최대 처리 키 수')
+@click.option('--workers', type=int, default=16, help='병렬 복사 스레드 수')
+@click.option('--batch-size', type=int, default=500, help='한 트랜잭션에서 옮길 사진 행 수')
+@click.option('--delete-old', is_flag=True, help='새 키로 바꾼 뒤 옛 객체 삭제 (기본: 남겨 두고 reconcile로 정리)')
+def storage_rekey(project_id, limit, workers, batch_size, delete_old):
+    """기존 사진 객체를 hashed 키로 복사하고 Photo.filename을 배치 단위로 바꾼다 (중단 후 재실행 가능)"""
+    started = time.perf_counter()
+
+    def progress(stats):
+        click.echo(f"  이동 {stats['moved']}개 (행 {stats['rows']}개), 원본 없음 {stats['missing']}개, "
+                   f"실패 {stats['failed']}개", err=True)
+
+    stats = rekey.rekey_photos(photo_storage(), project_id=project_id, limit=limit, workers=workers,
+                               batch_size=batch_size, delete_old=delete_old,
+                               delete_workers=current_app.config['S3_DELETE_WORKERS'], progress=progress)
+    click.echo(f"키 {stats['moved']}개 이동, 사진 행 {stats['rows']}개 갱신 ({time.perf_counter() - started:.1f}초)")
+    if stats['deleted']:
+        click.echo(f"옛 객체 {stats['deleted']}개 삭제")
+    if stats['missing'] or stats['failed']:
+        click.echo(f"원본 없음 {stats['missing']}개, 실패 {stats['failed']}개 (flask storage-reconcile로 확인)")
+
+
+@command('db-upgrade')
+def db_upgrade():
+    """테이블 생성 + 미적용 스키마 마이그레이션 실행 (배포 시 앱을 띄우기 전에 한 번)"""
+    applied = init_db()
+    click.echo(f"적용된 마이그레이션: {applied or '없음'}")
+
+
+@command('reviews-flush')
+def reviews_flush():
+    """outbox에 쌓인 리뷰를 지금 Google Sheets로 전송"""
+    sent = review_flusher.flush_all()
+    pending = ReviewOutbox.query.filter(ReviewOutbox.sent_at.is_(None)).count()
+    click.echo(f"{sent}건 전송, 대기 {pending}건")
+
+
+def create_app(config=None):
+    """앱 팩토리 (``gunicorn 'wsgi:app'``, ``flask --app app``).
+    
+    config(dict)는 환경변수에서 읽은 Config 위에 덮어쓴다 (테스트/벤치마크). 저장소 클라이언트,
+    렌더링 캐시, 백그라운드 풀은 앱마다 만들고, import만으로는 아무것도 만들지 않는다. boto3, gspread,
+    NumPy는 처음 쓰는 요청에서 불러오고, 스키마 생성/마이그레이션은 ``flask db-upgrade``로 배포 때
+    한 번 실행한다.
+    """
+    app = Flask(__name__)
+    app.config.from_object(Config)
+    if config:
+        app.config.from_mapping(config)
+    # 커넥션 풀/타임아웃, 리플리카 bind, SQLite pragma
+    configure_database(app.config)
+    db.init_app(app)
+    init_database(app, db)
+    
+    # 요청/SQL/저장소/Sheets 시간 계측과 /metrics
+    init_metrics(app, db)
+    
+    # 업로드/다운로드/페이지별 동시 처리 한도 (gthread 워커에서 긴 I/O가 스레드를 독점하지 않도록)
+    AdmissionControl(app.config['ADMISSION_LIMITS'], retry_after=app.config['ADMISSION_RETRY_AFTER']).init_app(app)
+    
+    # 사진 저장소 (S3 또는 로컬 디렉터리). 클라이언트/커넥션 풀은 앱(워커 프로세스)당 하나를 공유
+    storage = instrument_storage(create_storage(app.config))
+    app.extensions['photo_storage'] = storage
+    app.extensions['signed_urls'] = SignedUrlCache(storage, ttl=app.config['SIGNED_URL_TTL'],
+                                                   maxsize=app.config['SIGNED_URL_CACHE_SIZE'])
+    
+    # 직접 업로드된 사진의 해시/썸네일/서명은 응답을 보낸 뒤 이 풀에서 채운다
+    app.extensions['post_upload_pool'] = ThreadPoolExecutor(max_workers=2, thread_name_prefix='post-upload')
+    
+    # 메인/대시보드 렌더링 캐시. 프로젝트/사진이 바뀌면 버전이 올라 무효화된다
+    render_cache = RenderCache(
+        app.config['RENDER_CACHE_PATH'] or os.path.join(app.instance_path, 'render_cache.sqlite3'),
+        enabled=app.config['RENDER_CACHE_ENABLED'])
+    init_render_cache(app, db, render_cache)
+    
+    # 리뷰는 outbox에 쌓고 워커 프로세스마다 하나인 백그라운드 스레드가 Sheets로 보낸다
+    app.extensions['review_flusher'] = ReviewFlusher(app)
+    app.before_request(start_background_workers)
+    
+    app.add_template_global(photo_url)
+    for rule, view, options in _routes:
+        app.add_url_rule(rule, view_func=view, **options)
+    for cmd in _commands:
+        app.cli.add_command(cmd)
+    return app
 
 
 if __name__ == '__main__':
+    app = create_app()
+    with app.app_context():
+        init_db()
     app.run(debug=True, host='0.0.0.0', port=5000)
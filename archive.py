@@ -0,0 +1,150 @@
+"""백그라운드 ZIP 아카이브 작업
+
+전체/업로더별 ZIP을 요청 워커가 아닌 백그라운드 스레드에서 만들어 저장소에 multipart로
+올린다. 관리자 연결이 끊겨도 작업은 계속되고, 완료되면 서명된 URL로 내려받는다.
+아카이브에는 담긴 사진 구성의 fingerprint를 기록해 두어, 사진이 추가/삭제/변경되지
+않았다면 같은 아카이브를 다시 만들지 않고 재사용한다.
+"""
+import hashlib
+import threading
+import time
+from datetime import datetime, timedelta
+
+from models import db, ArchiveJob, Photo
+from zipstream import ZipEntry, stream_zip
+
+ARCHIVE_PREFIX = '_archives'
+STALE_AFTER = timedelta(minutes=10)  # 이보다 오래 갱신이 없는 진행 중 작업은 죽은 것으로 본다
+PROGRESS_INTERVAL = 2  # 초마다 진행 상황 커밋
+
+
+def scope_photos(project_id, uploader_name=None):
+    """아카이브에 담을 사진 (ZIP 안의 순서와 같다)"""
+    query = Photo.query.filter_by(project_id=project_id)
+    if uploader_name is not None:
+        return query.filter_by(uploader_name=uploader_name).order_by(Photo.id).all()
+    return query.order_by(Photo.uploader_name, Photo.id).all()
+
+
+def zip_entries(photos, uploader_name=None):
+    """전체 아카이브는 업로더별 폴더, 업로더 아카이브는 파일만"""
+    if uploader_name is not None:
+        return [ZipEntry(photo.original_filename, photo.filename, photo.uploaded_at, photo) for photo in photos]
+    return [ZipEntry(f"{photo.uploader_name}/{photo.original_filename}", photo.filename, photo.uploaded_at, photo)
+            for photo in photos]
+
+
+def fingerprint(photos, uploader_name=None):
+    """ZIP 내용을 결정하는 값(범위, 사진 id, 저장소 키, 이름)의 해시"""
+    digest = hashlib.sha256(f"{uploader_name!r}".encode('utf-8'))
+    for photo in photos:
+        digest.update(f"\n{photo.id}\t{photo.filename}\t{photo.uploader_name}\t{photo.original_filename}"
+                      .encode('utf-8'))
+    return digest.hexdigest()
+
+
+def archive_key(job):
+    return f"{ARCHIVE_PREFIX}/{job.project_id}/{job.id}.zip"
+
+
+def is_stale(job):
+    return job.status in ('pending', 'running') and \
+        job.updated_at is not None and job.updated_at < datetime.utcnow() - STALE_AFTER
+
+
+def find_archive(project_id, uploader_name, current_fingerprint, include_active=True):
+    """같은 사진 구성으로 완료됐거나(혹은 진행 중인) 아카이브 작업"""
+    statuses = ['done', 'pending', 'running'] if include_active else ['done']
+    jobs = ArchiveJob.query.filter(
+        ArchiveJob.project_id == project_id,
+        ArchiveJob.uploader_name.is_(None) if uploader_name is None else ArchiveJob.uploader_name == uploader_name,
+        ArchiveJob.fingerprint == current_fingerprint,
+        ArchiveJob.status.in_(statuses)
+    ).order_by(ArchiveJob.id.desc()).all()
+    for job in jobs:
+        if not is_stale(job):
+            return job
+    return None
+
+
+def run_archive(app, job_id, storage, prefetch=4, max_buffer=16 * 1024 * 1024, part_size=16 * 1024 * 1024):
+    """아카이브를 만들어 저장소에 올리고, 같은 범위의 이전 아카이브는 지운다"""
+    with app.app_context():
+        job = db.session.get(ArchiveJob, job_id)
+        photos = scope_photos(job.project_id, job.uploader_name)
+        job.status = 'running'
+        job.key = archive_key(job)
+        job.fingerprint = fingerprint(photos, job.uploader_name)
+        job.max_photo_id = max((photo.id for photo in photos), default=0)
+        job.total = len(photos)
+        job.processed = job.skipped = 0
+        job.error = None
+        job.updated_at = datetime.utcnow()
+        db.session.commit()
+
+        writer = storage.open_writer(job.key, content_type='application/zip', part_size=part_size)
+        written = 0
+        last_commit = time.monotonic()
+
+        def on_entry(entry):
+            nonlocal written, last_commit
+            written += 1
+            if time.monotonic() - last_commit >= PROGRESS_INTERVAL:
+                job.processed = written
+                job.updated_at = datetime.utcnow()
+                db.session.commit()
+                last_commit = time.monotonic()
+
+        try:
+            for chunk in stream_zip(storage, zip_entries(photos, job.uploader_name),
+                                    prefetch=prefetch, max_buffer=max_buffer, on_entry=on_entry):
+                writer.write(chunk)
+            writer.close()
+        except Exception as e:
+            writer.abort()
+            db.session.rollback()
+            print(f"아카이브 작업 오류 (job {job_id}): {e}")
+            job = db.session.get(ArchiveJob, job_id)
+            if job is not None:  # 진행 중 프로젝트가 삭제됐으면 행이 없다
+                job.status = 'failed'
+                job.error = str(e)
+                job.updated_at = datetime.utcnow()
+                db.session.commit()
+            return
+
+        job.processed = written
+        job.skipped = len(photos) - written
+        job.size = writer.size
+        job.status = 'done'
+        job.updated_at = datetime.utcnow()
+        db.session.commit()
+
+        # 같은 범위의 이전 아카이브는 더 이상 재사용되지 않으므로 정리한다
+        scope = ArchiveJob.uploader_name.is_(None) if job.uploader_name is None \
+            else ArchiveJob.uploader_name == job.uploader_name
+        old = ArchiveJob.query.filter(ArchiveJob.project_id == job.project_id, scope,
+                                      ArchiveJob.id < job.id, ArchiveJob.status.in_(['done', 'failed'])).all()
+        drop_jobs(storage, old)
+
+
+def start_archive(app, job_id, storage, **options):
+    """백그라운드 스레드에서 run_archive 실행"""
+    thread = threading.Thread(target=run_archive, args=(app, job_id, storage), kwargs=options,
+                              name=f'archive-{job_id}', daemon=True)
+    thread.start()
+    return thread
+
+
+def drop_jobs(storage, jobs):
+    """아카이브 객체와 작업 행을 지운다 (커밋 포함)"""
+    keys = [job.key for job in jobs if job.key]
+    failed = set(storage.delete_batch(keys)) if keys else set()
+    for job in jobs:
+        if job.key not in failed:
+            db.session.delete(job)
+    db.session.commit()
+
+
+def drop_archives(storage, project_id):
+    """프로젝트 삭제 시 해당 프로젝트의 모든 아카이브 정리"""
+    drop_jobs(storage, ArchiveJob.query.filter_by(project_id=project_id).all())
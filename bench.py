@@ -0,0 +1,463 @@
+"""업로드/목록/ZIP 경로 벤치마크
+
+임시 디렉터리의 SQLite + LocalStorage(파일시스템)와 가짜 Sheets 클라이언트로 앱을 띄우고,
+1k/10k/100k장짜리 합성 프로젝트를 만들어 다음을 측정한다.
+
+- upload(): 파일 수/초, MB/초
+- 대시보드/프로젝트 상세/다음 페이지: 지연시간(p50/p95)과 SQL 쿼리 수
+- 전체/업로더 ZIP: 첫 바이트까지 시간(TTFB), 처리량, 최대 RSS 증가량
+- 리뷰 outbox flush: 건수/초
+- 기동: 새 프로세스에서 ``import app``, 첫 요청까지 시간과 불러온 모듈 수 (워커 부팅/콜드 스타트)
+
+결과는 JSON으로 출력하며, ``--compare``로 두 결과(커밋 간)를 비교할 수 있다.
+
+    python bench.py --sizes 1000,10000 --output before.json
+    python bench.py --sizes 1000,10000 --output after.json
+    python bench.py --compare before.json after.json
+    python bench.py --startup-only --startup-runs 10   # 기동 시간만
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='사진 관리 앱 벤치마크')
+    parser.add_argument('--sizes', default='1000,10000,100000', help='합성 프로젝트 사진 수 (쉼표 구분)')
+    parser.add_argument('--repeat', type=int, default=5, help='지연시간 측정 반복 횟수')
+    parser.add_argument('--per-uploader', type=int, default=50, help='업로더당 사진 수')
+    parser.add_argument('--objects', type=int, default=200, help='사진 행이 나눠 가리킬 실제 객체 수')
+    parser.add_argument('--object-size', type=int, default=256 * 1024, help='합성 객체 크기 (bytes)')
+    parser.add_argument('--upload-files', type=int, default=20, help='upload() 한 번에 올릴 파일 수')
+    parser.add_argument('--upload-rounds', type=int, default=3)
+    parser.add_argument('--zip-read-limit', type=int, default=64 * 1024 * 1024,
+                        help='전체 ZIP은 이만큼만 읽고 끊는다 (bytes)')
+    parser.add_argument('--reviews', type=int, default=2000, help='outbox flush 측정용 리뷰 수')
+    parser.add_argument('--startup-runs', type=int, default=5, help='기동 시간 측정 프로세스 수 (0이면 생략)')
+    parser.add_argument('--startup-only', action='store_true', help='기동 시간만 측정')
+    parser.add_argument('--workdir', help='DB/저장소 디렉터리 (기본: 임시 디렉터리)')
+    parser.add_argument('--output', help='결과 JSON 파일 (기본: 표준 출력)')
+    parser.add_argument('--compare', nargs=2, metavar=('BASE', 'NEW'), help='두 결과 JSON 비교')
+    return parser.parse_args(argv)
+
+
+# ---- 측정 도구 ----
+
+def current_rss():
+    """현재 RSS (bytes). /proc이 없으면 최대 RSS로 대신한다"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class RssSampler:
+    """구간 동안 RSS를 주기적으로 재서 시작 대비 최대 증가량을 구한다"""
+
+    def __init__(self, interval=0.01):
+        self.interval = interval
+        self.baseline = self.peak = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def __enter__(self):
+        self.baseline = self.peak = current_rss()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, current_rss())
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, current_rss())
+
+    @property
+    def growth(self):
+        return self.peak - self.baseline
+
+
+class QueryCounter:
+    """엔진에서 실행된 SQL 문 수"""
+
+    def __init__(self, engine):
+        from sqlalchemy import event
+        self.count = 0
+        event.listen(engine, 'before_cursor_execute', self._on_execute)
+
+    def _on_execute(self, *args):
+        self.count += 1
+
+
+class FakeWorksheet:
+    def __init__(self):
+        self.rows = []
+        self.calls = 0
+
+    def append_rows(self, rows):
+        self.calls += 1
+        self.rows.extend(rows)
+
+
+class FakeSheetsClient:
+    def __init__(self):
+        self.sheet1 = FakeWorksheet()
+
+    def open_by_key(self, key):
+        return self
+
+
+def summarize(samples):
+    samples = sorted(samples)
+    return {
+        'p50_ms': round(statistics.median(samples) * 1000, 2),
+        'p95_ms': round(samples[min(len(samples) - 1, int(len(samples) * 0.95))] * 1000, 2),
+        'max_ms': round(samples[-1] * 1000, 2),
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'],
+                                       cwd=os.path.dirname(os.path.abspath(__file__)),
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# ---- 앱 준비 ----
+
+def bench_environ(workdir):
+    """벤치마크 DB/저장소 환경변수. 새 프로세스(기동 측정, gunicorn)가 같은 DB/저장소를 쓰도록 넘긴다"""
+    return {
+        'DATABASE_URL': f"sqlite:///{os.path.join(workdir, 'bench.db')}",
+        'STORAGE_BACKEND': 'local',
+        'LOCAL_STORAGE_ROOT': os.path.join(workdir, 'storage'),
+        'RENDER_CACHE_PATH': os.path.join(workdir, 'render_cache.sqlite3'),
+        'REVIEW_FLUSHER_ENABLED': 'false',
+        'SECRET_KEY': os.environ.get('SECRET_KEY', 'bench'),
+    }
+
+
+def load_app(workdir):
+    """벤치마크용 설정으로 앱을 만들고 스키마를 준비한다"""
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    from app import create_app, init_db
+    environ = bench_environ(workdir)
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': environ['DATABASE_URL'],
+        'STORAGE_BACKEND': 'local',
+        'LOCAL_STORAGE_ROOT': environ['LOCAL_STORAGE_ROOT'],
+        'RENDER_CACHE_PATH': environ['RENDER_CACHE_PATH'],
+        'REVIEW_FLUSHER_ENABLED': False,
+        'SECRET_KEY': environ['SECRET_KEY'],
+    })
+    with app.app_context():
+        init_db()
+    return app
+
+
+def synthetic_jpeg(size, seed):
+    from PIL import Image
+    img = Image.effect_noise((size, size), 40 + seed % 20).convert('RGB')
+    buffer = io.BytesIO()
+    img.save(buffer, 'JPEG', quality=90)
+    return buffer.getvalue()
+
+
+def seed_project(name, total, per_uploader, object_keys):
+    """사진 행 ``total``개를 bulk INSERT로 만든다. 행은 object_keys를 돌아가며 가리킨다"""
+    from models import db, Project, Photo
+
+    project = Project(name=name, folder_name=f"{name}_{int(time.time() * 1000)}")
+    db.session.add(project)
+    db.session.commit()
+
+    started = datetime.utcnow() - timedelta(days=30)
+    rows = []
+    for i in range(total):
+        rows.append({
+            'project_id': project.id,
+            'filename': object_keys[i % len(object_keys)],
+            'original_filename': f"IMG_{i:06d}.jpg",
+            'uploader_name': f"uploader{i // per_uploader:05d}",
+            'file_size': 0,
+            'uploaded_at': started + timedelta(seconds=i * 20),
+            'is_downloaded': i % 3 == 0,
+            'derivatives': 'preview,thumb',
+        })
+        if len(rows) == 5000:
+            db.session.execute(db.insert(Photo), rows)
+            rows = []
+    if rows:
+        db.session.execute(db.insert(Photo), rows)
+    db.session.commit()
+    return project.id
+
+
+# ---- 측정 ----
+
+def timed_get(client, url, repeat, counter):
+    samples, queries = [], []
+    for _ in range(repeat):
+        before = counter.count
+        started = time.perf_counter()
+        response = client.get(url)
+        samples.append(time.perf_counter() - started)
+        queries.append(counter.count - before)
+        if response.status_code != 200:
+            raise RuntimeError(f"{url} → {response.status_code}")
+    result = summarize(samples)
+    result['queries'] = max(queries)
+    return result, response
+
+
+def measure_manifest(client, url, counter):
+    """매니페스트를 끝까지 받는 시간 (keyset 페이지 조회 + 일괄 서명 + 직렬화)"""
+    before = counter.count
+    started = time.perf_counter()
+    response = client.get(url, buffered=False)
+    lines = sum(chunk.count(b'\n') for chunk in response.response)
+    seconds = time.perf_counter() - started
+    response.close()
+    if response.status_code != 200:
+        raise RuntimeError(f"{url} → {response.status_code}")
+    return {'seconds': round(seconds, 3), 'rows': lines - 1, 'queries': counter.count - before,
+            'rows_per_second': round((lines - 1) / seconds) if seconds else None}
+
+
+def measure_zip(client, url, read_limit):
+    """스트리밍 응답을 읽으며 TTFB, 처리량, RSS 증가량을 잰다"""
+    with RssSampler() as rss:
+        started = time.perf_counter()
+        response = client.get(url, buffered=False)
+        ttfb = None
+        received = 0
+        for chunk in response.response:
+            if ttfb is None:
+                ttfb = time.perf_counter() - started
+            received += len(chunk)
+            if received >= read_limit:
+                break
+        response.close()
+        elapsed = time.perf_counter() - started
+    return {
+        'status': response.status_code,
+        'ttfb_ms': round((ttfb or elapsed) * 1000, 2),
+        'seconds': round(elapsed, 3),
+        'bytes': received,
+        'mb_per_s': round(received / elapsed / 1024 / 1024, 2) if elapsed else None,
+        'complete': received < read_limit,
+        'peak_rss_growth_mb': round(rss.growth / 1024 / 1024, 1),
+    }
+
+
+def bench_upload(client, args):
+    from models import db, Project
+    project = Project(name='bench-upload', folder_name=f"bench_upload_{int(time.time() * 1000)}")
+    db.session.add(project)
+    db.session.commit()
+
+    files = [synthetic_jpeg(1600, i) for i in range(args.upload_files)]
+    total_bytes = sum(len(data) for data in files)
+    samples = []
+    for round_number in range(args.upload_rounds):
+        payload = {
+            'uploader_name': f'bench{round_number}',
+            # 라운드마다 내용이 달라야 중복 제거에 걸리지 않는다
+            'photos': [(io.BytesIO(data + bytes([round_number])), f'bench_{i}.jpg') for i, data in enumerate(files)],
+        }
+        started = time.perf_counter()
+        response = client.post(f'/upload/{project.id}', data=payload, content_type='multipart/form-data')
+        samples.append(time.perf_counter() - started)
+        if response.status_code not in (200, 302):
+            raise RuntimeError(f"upload → {response.status_code}")
+    best = min(samples)
+    return {
+        'files': args.upload_files,
+        'bytes': total_bytes,
+        'seconds': summarize(samples),
+        'files_per_s': round(args.upload_files / best, 2),
+        'mb_per_s': round(total_bytes / best / 1024 / 1024, 2),
+    }
+
+
+def bench_reviews(app, args):
+    from models import db
+    from review_outbox import ReviewFlusher, enqueue_reviews
+
+    client = FakeSheetsClient()
+    flusher = ReviewFlusher(app, client_factory=lambda: client)
+    enqueue_reviews('bench', 'bench-reviews', [f'review {i}' for i in range(args.reviews)])
+    db.session.commit()
+    started = time.perf_counter()
+    sent = flusher.flush_all()
+    elapsed = time.perf_counter() - started
+    return {
+        'reviews': sent,
+        'append_calls': client.sheet1.calls,
+        'seconds': round(elapsed, 3),
+        'reviews_per_s': round(sent / elapsed, 1) if elapsed else None,
+    }
+
+
+# 새 인터프리터에서 실행: import 시간, 앱 생성 + 첫 요청 시간, 불러온 모듈 수.
+# create_app이 없는 이전 커밋에서도 돌도록 app.app으로 대신한다
+STARTUP_SCRIPT = '''
+import json, sys, time
+started = time.perf_counter()
+import app as app_module
+imported = time.perf_counter()
+application = app_module.create_app() if hasattr(app_module, 'create_app') else app_module.app
+application.test_client().get('/')
+finished = time.perf_counter()
+print(json.dumps({'import': imported - started, 'first_request': finished - imported,
+                  'modules': len(sys.modules), 'heavy': sorted(name for name in ('boto3', 'gspread', 'numpy')
+                                                               if name in sys.modules)}))
+'''
+
+
+def bench_startup(args, workdir):
+    """워커 부팅/콜드 스타트 비용. 새 프로세스는 벤치마크 DB/저장소를 환경변수로 받는다"""
+    root = os.path.dirname(os.path.abspath(__file__))
+    runs = []
+    for _ in range(args.startup_runs):
+        started = time.perf_counter()
+        output = subprocess.check_output([sys.executable, '-c', STARTUP_SCRIPT], cwd=root, text=True,
+                                         env=dict(os.environ, **bench_environ(workdir)), stderr=subprocess.DEVNULL)
+        elapsed = time.perf_counter() - started
+        runs.append(dict(json.loads(output.strip().splitlines()[-1]), process=elapsed))
+    return {
+        'import': summarize([run['import'] for run in runs]),
+        'first_request': summarize([run['first_request'] for run in runs]),
+        'process': summarize([run['process'] for run in runs]),
+        'modules': runs[-1]['modules'],
+        'heavy_modules_loaded': runs[-1]['heavy'],
+    }
+
+
+def run(args):
+    workdir = args.workdir or tempfile.mkdtemp(prefix='photo-bench-')
+    app = load_app(workdir)
+    results = {
+        'revision': git_revision(),
+        'created_at': datetime.utcnow().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'params': {key: value for key, value in vars(args).items() if key not in ('output', 'compare')},
+        'projects': {},
+    }
+
+    if args.startup_runs:
+        print('기동 시간 측정', file=sys.stderr)
+        results['startup'] = bench_startup(args, workdir)
+    if args.startup_only:
+        return results
+
+    with app.app_context():
+        from models import db
+        counter = QueryCounter(db.engine)
+
+        # 실제 객체는 몇백 개만 만들고 사진 행이 나눠 가리키게 해서 100k 준비 비용을 줄인다
+        payload = os.urandom(args.object_size)
+        object_keys = [f"bench/objects/{i:05d}.jpg" for i in range(args.objects)]
+        for key in object_keys:
+            app.extensions['photo_storage'].put(key, payload, content_type='image/jpeg')
+
+        client = app.test_client()
+        with client.session_transaction() as session:
+            session['is_admin'] = True
+
+        print('upload() 측정', file=sys.stderr)
+        results['upload'] = bench_upload(client, args)
+        print('리뷰 outbox 측정', file=sys.stderr)
+        results['reviews'] = bench_reviews(app, args)
+
+        for size in [int(value) for value in args.sizes.split(',') if value.strip()]:
+            print(f'{size}장 프로젝트 준비', file=sys.stderr)
+            started = time.perf_counter()
+            project_id = seed_project(f'bench-{size}', size, args.per_uploader, object_keys)
+            entry = {'seed_seconds': round(time.perf_counter() - started, 2)}
+
+            entry['dashboard'], _ = timed_get(client, '/admin', args.repeat, counter)
+            entry['detail'], response = timed_get(client, f'/admin/project/{project_id}', args.repeat, counter)
+            cursor = response.get_data(as_text=True).split('data-cursor="', 1)[-1].split('"', 1)[0]
+            if cursor:
+                entry['next_page'], _ = timed_get(
+                    client, f'/admin/project/{project_id}/photos?after={cursor}', args.repeat, counter)
+            entry['detail_filtered'], _ = timed_get(
+                client, f'/admin/project/{project_id}?downloaded=0', args.repeat, counter)
+
+            entry['manifest'] = measure_manifest(
+                client, f'/admin/project/{project_id}/manifest?format=csv&mark=none', counter)
+            entry['zip_uploader'] = measure_zip(
+                client, f'/admin/uploader/{project_id}/uploader00000/download', args.zip_read_limit)
+            entry['zip_all'] = measure_zip(
+                client, f'/admin/project/{project_id}/download-all', args.zip_read_limit)
+            results['projects'][str(size)] = entry
+
+    results['peak_rss_mb'] = round(current_rss() / 1024 / 1024, 1)
+    return results
+
+
+# ---- 비교 ----
+
+def flatten(data, prefix=''):
+    items = {}
+    for key, value in data.items():
+        path = f"{prefix}{key}"
+        if isinstance(value, dict):
+            items.update(flatten(value, path + '.'))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            items[path] = value
+    return items
+
+
+def compare(base_path, new_path):
+    with open(base_path) as f:
+        base = json.load(f)
+    with open(new_path) as f:
+        new = json.load(f)
+    print(f"{base.get('revision')} → {new.get('revision')}")
+    base_values = flatten({k: v for k, v in base.items() if k != 'params'})
+    new_values = flatten({k: v for k, v in new.items() if k != 'params'})
+    for key in sorted(set(base_values) & set(new_values)):
+        old, current = base_values[key], new_values[key]
+        change = f"{(current - old) / old * 100:+.1f}%" if old else '-'
+        print(f"{key:55s} {old:>12} {current:>12} {change:>9}")
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.compare:
+        compare(*args.compare)
+        return
+    # 앱의 print 로그가 결과 JSON과 섞이지 않도록 stderr로 보낸다
+    with contextlib.redirect_stdout(sys.stderr):
+        results = run(args)
+    output = json.dumps(results, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+        print(f"결과 저장: {args.output}", file=sys.stderr)
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
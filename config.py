@@ -10,14 +10,49 @@ class Config:
     if database_url and database_url.startswith('postgres://'):
         database_url = database_url.replace('postgres://', 'postgresql://', 1)
     SQLALCHEMY_DATABASE_URI = database_url
+    # 읽기 전용 리플리카 (설정 시 관리자 목록/내보내기 조회를 보냄)
+    replica_url = os.getenv('DATABASE_REPLICA_URL')
+    if replica_url and replica_url.startswith('postgres://'):
+        replica_url = replica_url.replace('postgres://', 'postgresql://', 1)
+    DATABASE_REPLICA_URL = replica_url
     
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     
+    # DB 커넥션 풀 (워커 프로세스별). pool_size + max_overflow가 gunicorn 스레드 수 + 백그라운드 스레드보다 커야
+    # 요청이 커넥션을 기다리지 않는다. 엔진 옵션은 database.py에서 만든다
+    DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 10))
+    DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', 30))
+    DB_POOL_TIMEOUT = int(os.getenv('DB_POOL_TIMEOUT', 10))  # 초, 커넥션을 못 받으면 오류
+    DB_POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', 1800))  # 초, 프록시/LB가 끊기 전에 교체
+    DB_POOL_PRE_PING = os.getenv('DB_POOL_PRE_PING', 'true').lower() == 'true'
+    DB_STATEMENT_TIMEOUT = float(os.getenv('DB_STATEMENT_TIMEOUT', 30))  # 초 (PostgreSQL, 0이면 제한 없음)
+    DB_REPLICA_STATEMENT_TIMEOUT = float(os.getenv('DB_REPLICA_STATEMENT_TIMEOUT', 120))  # 초
+    DB_REPLICA_STICKY_SECONDS = int(os.getenv('DB_REPLICA_STICKY_SECONDS', 10))  # 쓰기 후 primary에서 읽는 시간
+    
+    # 저장소: 's3' 또는 'local' (AWS 없이 로컬 디렉터리에 저장)
+    STORAGE_BACKEND = os.getenv('STORAGE_BACKEND', 's3')
+    LOCAL_STORAGE_ROOT = os.getenv('LOCAL_STORAGE_ROOT', 'storage_data')
+    
     # AWS S3 설정
     AWS_ACCESS_KEY_ID = os.getenv('AWS_ACCESS_KEY_ID')
     AWS_SECRET_ACCESS_KEY = os.getenv('AWS_SECRET_ACCESS_KEY')
     AWS_REGION = os.getenv('AWS_REGION', 'ap-northeast-2')
     S3_BUCKET_NAME = os.getenv('S3_BUCKET_NAME')
+    S3_MAX_POOL_CONNECTIONS = int(os.getenv('S3_MAX_POOL_CONNECTIONS', 50))  # 공유 클라이언트 커넥션 풀 크기
+    S3_MAX_ATTEMPTS = int(os.getenv('S3_MAX_ATTEMPTS', 5))
+    S3_CONNECT_TIMEOUT = int(os.getenv('S3_CONNECT_TIMEOUT', 5))  # 초
+    S3_READ_TIMEOUT = int(os.getenv('S3_READ_TIMEOUT', 60))  # 초
+    # 새 사진 키 규칙: 'hashed'(해시 prefix로 분산, 기본) 또는 'path'(folder_name/업로더/파일명). keys.py 참고
+    KEY_SCHEME = os.getenv('KEY_SCHEME', 'hashed')
+    
+    # 이미지 URL 서명 (버킷 퍼블릭 액세스 차단 시 필요). 서명 결과는 TTL 동안 LRU 캐시
+    SIGNED_URLS = os.getenv('SIGNED_URLS', 'true').lower() == 'true'
+    SIGNED_URL_TTL = int(os.getenv('SIGNED_URL_TTL', 6 * 3600))  # 초
+    SIGNED_URL_CACHE_SIZE = int(os.getenv('SIGNED_URL_CACHE_SIZE', 50000))
+    SIGNED_URL_BATCH_MAX = 1000
+    
+    # 개별 사진 다운로드: redirect(서명된 URL로 302) 또는 stream(서버가 청크 단위로 중계, Range 지원)
+    PHOTO_DOWNLOAD_MODE = os.getenv('PHOTO_DOWNLOAD_MODE', 'redirect')
     
     # 관리자 비밀번호
     ADMIN_PASSWORD = os.getenv('ADMIN_PASSWORD', 'admin1234')
@@ -25,3 +60,61 @@ class Config:
     # 업로드 설정
     MAX_CONTENT_LENGTH = 50 * 1024 * 1024  # 50MB 제한
     ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'webp'}
+    
+    # 리뷰 outbox → Google Sheets 전송
+    REVIEW_FLUSHER_ENABLED = os.getenv('REVIEW_FLUSHER_ENABLED', 'true').lower() == 'true'
+    REVIEW_FLUSH_INTERVAL = int(os.getenv('REVIEW_FLUSH_INTERVAL', 30))  # 초
+    
+    # 서버 경유 업로드 시 동시에 S3로 전송할 파일 수
+    UPLOAD_WORKERS = int(os.getenv('UPLOAD_WORKERS', 8))
+    
+    # 브라우저 → S3 직접 업로드 (presigned POST / multipart)
+    DIRECT_UPLOAD_ENABLED = os.getenv('DIRECT_UPLOAD_ENABLED', 'true').lower() == 'true'
+    DIRECT_UPLOAD_MAX_BYTES = int(os.getenv('DIRECT_UPLOAD_MAX_BYTES', 200 * 1024 * 1024))
+    DIRECT_UPLOAD_MULTIPART_THRESHOLD = 16 * 1024 * 1024  # 이보다 큰 파일은 multipart
+    DIRECT_UPLOAD_PART_SIZE = 8 * 1024 * 1024
+    DIRECT_UPLOAD_MAX_FILES = 200
+    DIRECT_UPLOAD_EXPIRES = 3600  # 초
+    
+    # 업로드 이미지 정규화 프로세스 수 (정책은 프로젝트별 설정, 기본 CPU 수)
+    NORMALIZE_WORKERS = int(os.getenv('NORMALIZE_WORKERS', 0)) or None
+    
+    # 썸네일/미리보기 생성 (false면 `flask derivatives-backfill`로만 생성)
+    DERIVATIVES_ON_UPLOAD = os.getenv('DERIVATIVES_ON_UPLOAD', 'true').lower() == 'true'
+    
+    # 삭제 설정
+    PURGE_SYNC_LIMIT = int(os.getenv('PURGE_SYNC_LIMIT', 500))  # 이보다 사진이 많은 프로젝트는 백그라운드 삭제
+    S3_DELETE_WORKERS = int(os.getenv('S3_DELETE_WORKERS', 4))  # 병렬 DeleteObjects 요청 수
+    
+    # ZIP 스트리밍 설정
+    ZIP_PREFETCH_WINDOW = int(os.getenv('ZIP_PREFETCH_WINDOW', 4))  # 미리 가져올 S3 객체 수
+    ZIP_PREFETCH_MAX_BYTES = int(os.getenv('ZIP_PREFETCH_MAX_BYTES', 16 * 1024 * 1024))  # 이보다 큰 객체는 스트리밍
+    ARCHIVE_PART_SIZE = int(os.getenv('ARCHIVE_PART_SIZE', 16 * 1024 * 1024))  # 백그라운드 아카이브 multipart part 크기
+    
+    # 병렬 다운로드용 매니페스트: presigned URL 유효 시간 (SigV4 최대 7일), keyset 페이지/일괄 서명 단위
+    MANIFEST_URL_TTL = int(os.getenv('MANIFEST_URL_TTL', 12 * 3600))  # 초
+    MANIFEST_BATCH_SIZE = int(os.getenv('MANIFEST_BATCH_SIZE', 1000))
+    
+    # 메인/대시보드 렌더링 캐시 (같은 서버의 워커들이 공유하는 SQLite 파일)
+    RENDER_CACHE_ENABLED = os.getenv('RENDER_CACHE_ENABLED', 'true').lower() == 'true'
+    RENDER_CACHE_PATH = os.getenv('RENDER_CACHE_PATH')  # 기본: Flask instance 폴더의 render_cache.sqlite3
+    
+    # 유사 사진 묶기: dHash 해밍 거리 상한 (64비트 중 다른 비트 수)
+    SIMILAR_MAX_DISTANCE = int(os.getenv('SIMILAR_MAX_DISTANCE', 6))
+    
+    # 라우트 종류별 동시 처리 한도 (워커 프로세스별, 0이면 제한 없음). 넘치면 503 + Retry-After
+    ADMISSION_LIMITS = {
+        'upload': int(os.getenv('ADMISSION_UPLOAD_LIMIT', 4)),
+        'archive': int(os.getenv('ADMISSION_ARCHIVE_LIMIT', 4)),
+        'page': int(os.getenv('ADMISSION_PAGE_LIMIT', 24)),
+    }
+    ADMISSION_RETRY_AFTER = int(os.getenv('ADMISSION_RETRY_AFTER', 5))  # 초
+    
+    # 계측: 느린 요청 로그 기준, /metrics 접근 토큰(Bearer). 토큰이나 관리자 세션 없이 열려면 METRICS_PUBLIC=true
+    SLOW_REQUEST_SECONDS = float(os.getenv('SLOW_REQUEST_SECONDS', 2.0))
+    METRICS_TOKEN = os.getenv('METRICS_TOKEN')
+    METRICS_PUBLIC = os.getenv('METRICS_PUBLIC', 'false').lower() == 'true'
+    # 스택 샘플링 프로파일 (opt-in): 지정한 endpoint 요청 중 일부를 folded stack 파일로 저장
+    PROFILE_ROUTES = [name.strip() for name in os.getenv('PROFILE_ROUTES', '').split(',') if name.strip()]
+    PROFILE_SAMPLE_RATE = float(os.getenv('PROFILE_SAMPLE_RATE', 0.05))
+    PROFILE_DIR = os.getenv('PROFILE_DIR', 'profiles')
@@ -0,0 +1,123 @@
+"""DB 엔진 설정과 읽기 전용 리플리카 라우팅
+
+- PostgreSQL: 워커 프로세스별 커넥션 풀 크기/overflow/recycle/pre-ping과 문장 타임아웃
+  (``statement_timeout``)을 설정에서 받는다.
+- SQLite(로컬 실행): WAL 저널, synchronous=NORMAL, busy timeout 등 pragma를 연결마다 설정해
+  목록 조회가 업로드 커밋을 막지 않게 한다.
+- ``DATABASE_REPLICA_URL``이 있으면 ``@read_replica``를 붙인 관리자 목록/내보내기 뷰의 SELECT를
+  리플리카로 보낸다. 쓰기(flush, UPDATE/DELETE 문)는 항상 primary로 가고, 쓰기를 한 브라우저
+  세션은 ``DB_REPLICA_STICKY_SECONDS`` 동안 primary에서 읽어 방금 바꾼 내용이 보이게 한다.
+"""
+import contextvars
+import functools
+import time
+from contextlib import contextmanager
+
+from flask import g, has_request_context, session
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+REPLICA_BIND = 'replica'
+WRITE_STATEMENTS = ('INSERT', 'UPDATE', 'DELETE')
+
+_use_replica = contextvars.ContextVar('use_replica', default=False)
+
+
+def engine_options(url, config, statement_timeout):
+    """URL 종류에 맞는 create_engine 인자"""
+    if url.startswith('sqlite'):
+        if make_url(url).database in (None, '', ':memory:'):
+            # 메모리 DB는 Flask-SQLAlchemy가 StaticPool(연결 하나)을 쓰므로 풀 크기 인자를 받지 않는다
+            return {'connect_args': {'check_same_thread': False, 'timeout': 15}}
+        # 파일 DB는 QueuePool을 쓰므로 크기는 맞춰 주고, 잠금 대기는 busy timeout(pragma)으로
+        return {'pool_size': config['DB_POOL_SIZE'], 'max_overflow': config['DB_MAX_OVERFLOW'],
+                'pool_timeout': config['DB_POOL_TIMEOUT'], 'connect_args': {'timeout': 15}}
+
+    options = {
+        'pool_size': config['DB_POOL_SIZE'],
+        'max_overflow': config['DB_MAX_OVERFLOW'],
+        'pool_timeout': config['DB_POOL_TIMEOUT'],
+        'pool_recycle': config['DB_POOL_RECYCLE'],
+        'pool_pre_ping': config['DB_POOL_PRE_PING'],
+    }
+    if url.startswith('postgresql') and statement_timeout:
+        options['connect_args'] = {'options': f"-c statement_timeout={int(statement_timeout * 1000)}"}
+    return options
+
+
+def configure_database(config):
+    """db.init_app 전에 엔진 옵션과 리플리카 bind를 app.config에 채운다"""
+    url = config['SQLALCHEMY_DATABASE_URI']
+    config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', {}).update(
+        engine_options(url, config, config['DB_STATEMENT_TIMEOUT']))
+    replica_url = config.get('DATABASE_REPLICA_URL')
+    if replica_url:
+        config.setdefault('SQLALCHEMY_BINDS', {})[REPLICA_BIND] = dict(
+            engine_options(replica_url, config, config['DB_REPLICA_STATEMENT_TIMEOUT']), url=replica_url)
+
+
+class RoutingSession(Session):
+    """``read_replica`` 구간의 SELECT만 리플리카 엔진으로 보내는 세션"""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and _use_replica.get() and not self._flushing and getattr(clause, 'is_select', False):
+            engine = self._db.engines.get(REPLICA_BIND)
+            if engine is not None:
+                return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+@contextmanager
+def replica_reads():
+    """블록 안의 SELECT를 리플리카에서 읽는다 (리플리카가 없거나 최근에 쓴 세션이면 primary)"""
+    sticky = has_request_context() and session.get('db_primary_until', 0) > time.time()
+    token = _use_replica.set(not sticky)
+    try:
+        yield
+    finally:
+        _use_replica.reset(token)
+
+
+def read_replica(view):
+    """읽기 전용 뷰 데코레이터. 복제 지연만큼 오래된 데이터가 보여도 되는 목록/내보내기에만 붙인다"""
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        with replica_reads():
+            return view(*args, **kwargs)
+    return wrapper
+
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute('PRAGMA journal_mode=WAL')  # 읽기와 쓰기가 서로 막지 않음
+    cursor.execute('PRAGMA synchronous=NORMAL')  # WAL에서는 체크포인트 때만 fsync
+    cursor.execute('PRAGMA busy_timeout=15000')
+    cursor.execute('PRAGMA temp_store=MEMORY')
+    cursor.execute('PRAGMA cache_size=-32000')  # 연결당 약 32MB 페이지 캐시
+    cursor.close()
+
+
+def init_database(app, db):
+    """SQLite pragma와 쓰기 후 primary 고정(리플리카가 있을 때)을 등록한다"""
+    with app.app_context():
+        engines = dict(db.engines)
+
+    for engine in engines.values():
+        if engine.dialect.name == 'sqlite':
+            event.listen(engine, 'connect', _set_sqlite_pragmas)
+
+    if REPLICA_BIND not in engines:
+        return
+    sticky_seconds = app.config['DB_REPLICA_STICKY_SECONDS']
+
+    @event.listens_for(engines[None], 'after_cursor_execute')
+    def track_writes(conn, cursor, statement, parameters, context, executemany):
+        if has_request_context() and statement.lstrip()[:6].upper() in WRITE_STATEMENTS:
+            g.db_wrote = True
+
+    @app.after_request
+    def stick_to_primary(response):
+        if g.pop('db_wrote', False) and sticky_seconds:
+            session['db_primary_until'] = time.time() + sticky_seconds
+        return response
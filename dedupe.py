@@ -0,0 +1,138 @@
+"""프로젝트 단위 콘텐츠 주소(SHA-256) 중복 제거
+
+같은 프로젝트에 같은 내용의 사진이 다시 올라오면 저장소 객체를 새로 만들지 않는다.
+
+- 같은 업로더가 다시 올린 사진: 아예 등록하지 않음 (폼 오류 후 재업로드 등)
+- 다른 업로더가 올린 같은 사진: 기존 객체를 가리키는 메타데이터 전용 행
+"""
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+
+from models import db, Photo
+from storage import StorageError
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def hash_fileobj(fileobj):
+    """파일 객체의 SHA-256 (읽은 뒤 처음 위치로 되돌림)"""
+    digest = hashlib.sha256()
+    fileobj.seek(0)
+    for chunk in iter(lambda: fileobj.read(HASH_CHUNK_SIZE), b''):
+        digest.update(chunk)
+    fileobj.seek(0)
+    return digest.hexdigest()
+
+
+def hash_stored(storage, key):
+    """저장소 객체를 스트리밍으로 읽으며 SHA-256 계산"""
+    digest = hashlib.sha256()
+    for chunk in storage.open(key).iter_chunks(HASH_CHUNK_SIZE):
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+def existing_by_hash(project_id, hashes):
+    """{hash: [(filename, derivatives, uploader_name, file_size, perceptual_hash, sharpness), ...]}
+
+    인덱스 (project_id, content_hash) 조회 한 번
+    """
+    found = {}
+    if not hashes:
+        return found
+    rows = db.session.query(
+        Photo.content_hash, Photo.filename, Photo.derivatives, Photo.uploader_name, Photo.file_size,
+        Photo.perceptual_hash, Photo.sharpness
+    ).filter(
+        Photo.project_id == project_id,
+        Photo.content_hash.in_(list(set(hashes)))
+    ).order_by(Photo.id)
+    for content_hash, *row in rows:
+        found.setdefault(content_hash, []).append(tuple(row))
+    return found
+
+
+def backfill_hashes(storage, project_id=None, limit=None, workers=8, batch_size=200):
+    """content_hash가 없는 사진의 객체를 읽어 해시를 채운다. (처리 수, 실패 수) 반환"""
+    done = failed = 0
+    last_id = 0
+    while limit is None or done + failed < limit:
+        query = Photo.query.filter(Photo.content_hash.is_(None), Photo.id > last_id)
+        if project_id:
+            query = query.filter_by(project_id=project_id)
+        size = batch_size if limit is None else min(batch_size, limit - done - failed)
+        photos = query.order_by(Photo.id).limit(size).all()
+        if not photos:
+            break
+        last_id = photos[-1].id
+
+        def work(key):
+            try:
+                return hash_stored(storage, key)
+            except StorageError as e:
+                print(f"해시 계산 실패 ({key}): {e}")
+                return None
+
+        # 같은 키를 여러 행이 가리킬 수 있으므로 키 단위로 한 번만 읽는다
+        keys = list({photo.filename for photo in photos})
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            hashes = dict(zip(keys, pool.map(work, keys)))
+        for photo in photos:
+            photo.content_hash = hashes[photo.filename]
+            if photo.content_hash:
+                done += 1
+            else:
+                failed += 1
+        db.session.commit()
+    return done, failed
+
+
+def collapse_duplicates(project_id=None, dry_run=False):
+    """같은 프로젝트의 같은 해시를 가장 오래된 행의 객체로 합친다.
+
+    같은 업로더의 중복 행은 삭제하고, 다른 업로더의 행은 대표 객체를 가리키게 바꾼다.
+    더 이상 어떤 행도 참조하지 않게 된 키 목록과 (삭제 행 수, 재지정 행 수)를 반환한다.
+    """
+    groups = db.session.query(Photo.project_id, Photo.content_hash).filter(
+        Photo.content_hash.isnot(None)
+    ).group_by(Photo.project_id, Photo.content_hash).having(db.func.count(Photo.id) > 1)
+    if project_id:
+        groups = groups.filter(Photo.project_id == project_id)
+
+    removed = repointed = 0
+    released = set()
+    for group_project_id, content_hash in groups.all():
+        photos = Photo.query.filter_by(project_id=group_project_id, content_hash=content_hash) \
+            .order_by(Photo.id).all()
+        canonical = photos[0]
+        uploaders = {canonical.uploader_name}
+        for photo in photos[1:]:
+            if photo.filename != canonical.filename:
+                released.add(photo.filename)
+            if photo.uploader_name in uploaders:
+                canonical.is_downloaded = canonical.is_downloaded or photo.is_downloaded
+                if not dry_run:
+                    db.session.delete(photo)
+                removed += 1
+            else:
+                uploaders.add(photo.uploader_name)
+                if photo.filename != canonical.filename:
+                    if not dry_run:
+                        photo.filename = canonical.filename
+                        photo.derivatives = canonical.derivatives
+                    repointed += 1
+
+    if dry_run:
+        db.session.rollback()
+        return sorted(released), removed, repointed
+
+    db.session.flush()
+    # 합친 뒤에도 다른 행이 참조하는 키는 지우지 않는다
+    still_used = set()
+    released = list(released)
+    for start in range(0, len(released), 500):
+        chunk = released[start:start + 500]
+        still_used.update(row.filename for row in
+                          Photo.query.with_entities(Photo.filename).filter(Photo.filename.in_(chunk)))
+    db.session.commit()
+    return [key for key in released if key not in still_used], removed, repointed
@@ -0,0 +1,93 @@
+"""관리자 그리드용 썸네일/미리보기(WebP) 파생 이미지 생성"""
+import io
+
+from PIL import Image, ImageFilter, ImageOps, ImageStat
+
+# 이름: (긴 변 최대 픽셀, WebP 품질)
+DERIVATIVE_SPECS = {
+    'thumb': (320, 70),
+    'preview': (1280, 80),
+}
+
+DERIVATIVE_PREFIX = '_derivatives'
+SIGNATURE_SIZE = DERIVATIVE_SPECS['thumb'][0]  # 유사 사진 서명은 썸네일 크기에서 계산 (썸네일로 backfill해도 같은 값)
+
+
+def derivative_key(photo_key, name):
+    """원본 S3 키에 대응하는 파생 이미지 키 (원본과 분리된 prefix 아래)"""
+    return f"{DERIVATIVE_PREFIX}/{name}/{photo_key}.webp"
+
+
+def derivative_keys(photo):
+    """사진에 대해 생성된 파생 이미지 S3 키 목록"""
+    return [derivative_key(photo.filename, name) for name in photo.derivative_names]
+
+
+def dhash(img):
+    """64비트 difference hash (가로로 이웃한 픽셀 밝기 비교)"""
+    pixels = list(img.convert('L').resize((9, 8), Image.LANCZOS).getdata())
+    value = 0
+    for row in range(8):
+        for col in range(8):
+            value = (value << 1) | (pixels[row * 9 + col] > pixels[row * 9 + col + 1])
+    return value
+
+
+def image_signature(img):
+    """유사 사진 서명: (DB 저장용 부호 있는 64비트 dHash, 선명도). img는 긴 변 SIGNATURE_SIZE 이하"""
+    value = dhash(img)
+    sharpness = ImageStat.Stat(img.convert('L').filter(ImageFilter.FIND_EDGES)).var[0]
+    return (value - (1 << 64) if value >= 1 << 63 else value), round(sharpness, 2)
+
+
+def signature_from_bytes(data):
+    """이미지 바이트(원본 또는 썸네일)로부터 서명 계산"""
+    with Image.open(io.BytesIO(data)) as img:
+        img.draft('RGB', (SIGNATURE_SIZE, SIGNATURE_SIZE))
+        img = ImageOps.exif_transpose(img)
+        img = img.convert('RGB')
+        img.thumbnail((SIGNATURE_SIZE, SIGNATURE_SIZE), Image.LANCZOS)
+        return image_signature(img)
+
+
+def build_derivatives(data):
+    """원본 이미지 바이트로부터 ({이름: WebP 바이트}, 유사 사진 서명)을 만든다"""
+    largest = max(size for size, _ in DERIVATIVE_SPECS.values())
+
+    with Image.open(io.BytesIO(data)) as img:
+        # JPEG는 축소 디코딩으로 큰 원본도 빠르게 연다
+        img.draft('RGB', (largest, largest))
+        img = ImageOps.exif_transpose(img)
+        if img.mode not in ('RGB', 'RGBA'):
+            img = img.convert('RGBA' if 'transparency' in img.info or img.mode in ('LA', 'PA') else 'RGB')
+
+        results = {}
+        # 큰 것부터 만들고 그 결과를 다시 줄여 리샘플링 비용을 줄인다
+        for name, (size, quality) in sorted(DERIVATIVE_SPECS.items(), key=lambda item: -item[1][0]):
+            img.thumbnail((size, size), Image.LANCZOS)
+            buffer = io.BytesIO()
+            img.save(buffer, 'WEBP', quality=quality, method=4)
+            results[name] = buffer.getvalue()
+        img.thumbnail((SIGNATURE_SIZE, SIGNATURE_SIZE), Image.LANCZOS)
+        return results, image_signature(img)
+
+
+def generate_derivatives(storage, photo, data=None):
+    """파생 이미지를 만들어 저장소에 올리고 photo.derivatives와 유사 사진 서명을 갱신한다 (커밋은 호출자 몫)"""
+    if data is None:
+        data = storage.read(photo.filename)
+
+    derivatives, signature = build_derivatives(data)
+    created = []
+    for name, payload in derivatives.items():
+        storage.put(
+            derivative_key(photo.filename, name),
+            payload,
+            content_type='image/webp',
+            cache_control='max-age=31536000, immutable'
+        )
+        created.append(name)
+
+    photo.derivatives = ','.join(sorted(created))
+    photo.perceptual_hash, photo.sharpness = signature
+    return created
@@ -0,0 +1,15 @@
+"""gunicorn 설정 (gunicorn이 작업 디렉터리의 이 파일을 자동으로 읽는다)
+
+ZIP 스트리밍이나 느린 업로드가 워커 프로세스 하나를 통째로 붙잡지 않도록 스레드 워커(gthread)를
+쓴다. S3/Sheets 클라이언트와 업로드·ZIP 프리페치가 모두 스레드 기반이라 gevent 몽키패치 없이
+그대로 동작한다. 라우트 종류별 동시 처리 한도는 admission.py(ADMISSION_*_LIMIT)가 맡는다.
+"""
+import os
+
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'gthread')
+workers = int(os.getenv('WEB_CONCURRENCY', 2))
+threads = int(os.getenv('GUNICORN_THREADS', 32))
+# gthread에서 timeout은 요청 시간이 아니라 워커 heartbeat 기준이라 긴 다운로드도 끊기지 않는다
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 300))
+graceful_timeout = 30
+keepalive = 5
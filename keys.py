@@ -0,0 +1,67 @@
+"""사진 원본의 저장소 키 규칙
+
+- ``hashed`` (기본): ``{해시 2자리}/{uuid}_{파일명}``. 한 행사의 업로드와 ZIP 읽기가 256개 prefix로
+  흩어져 S3 prefix당 요청 한도에 걸리지 않는다. 사람이 읽을 수 있는 경로
+  (``{프로젝트 folder_name}/{업로더}/{파일명}``)는 객체 메타데이터 ``x-amz-meta-source-path``에 남긴다.
+- ``path``: ``{프로젝트 folder_name}/{업로더}/{uuid}_{파일명}``. 예전 키는 표시 이름(Project.name)을
+  썼는데, 이름은 바뀔 수 있으므로 바뀌지 않는 folder_name을 쓴다.
+
+어떤 규칙이든 Photo.filename에 전체 키가 저장되므로 섞여 있어도 된다. 기존 객체는
+``flask storage-rekey``로 hashed 키로 옮긴다.
+"""
+import hashlib
+import hmac
+import re
+import uuid
+from urllib.parse import quote
+
+from werkzeug.utils import secure_filename
+
+KEY_SCHEMES = ('hashed', 'path')
+HASH_CHARS = 2
+HASHED_KEY = re.compile(r'^[0-9a-f]{%d}/[0-9a-f]{32}_[^/]*$' % HASH_CHARS)
+HASHED_SHARD = re.compile(r'^[0-9a-f]{%d}/$' % HASH_CHARS)
+UUID_NAME = re.compile(r'^[0-9a-f]{32}_')
+
+
+def is_hashed_key(key):
+    return bool(HASHED_KEY.match(key))
+
+
+def key_shard(key):
+    """hashed 키의 prefix (``ab/``). hashed 키가 아니면 None"""
+    return key[:HASH_CHARS + 1] if is_hashed_key(key) else None
+
+
+def hashed_key(name):
+    """``{uuid}_{파일명}`` → ``{해시 2자리}/{uuid}_{파일명}``"""
+    return f"{hashlib.md5(name.encode('utf-8')).hexdigest()[:HASH_CHARS]}/{name}"
+
+
+def new_photo_key(scheme, project, uploader_name, original_filename):
+    """새 사진의 키"""
+    name = f"{uuid.uuid4().hex}_{secure_filename(original_filename)}"
+    if scheme == 'path':
+        return f"{project.folder_name}/{uploader_name}/{name}"
+    return hashed_key(name)
+
+
+def rekeyed(key):
+    """기존 키 → hashed 키. 같은 키는 항상 같은 결과라 중단 후 다시 실행해도 된다"""
+    name = key.rsplit('/', 1)[-1]
+    if not UUID_NAME.match(name):
+        name = f"{uuid.uuid5(uuid.NAMESPACE_URL, key).hex}_{name}"
+    return hashed_key(name)
+
+
+def source_metadata(folder_name, uploader_name, original_filename):
+    """객체 메타데이터로 남길 사람이 읽을 수 있는 경로 (S3 메타데이터는 ASCII만 허용하므로 URL 인코딩)"""
+    return {'source-path': quote(f"{folder_name}/{uploader_name}/{original_filename}")}
+
+
+def upload_token(secret_key, project_id, uploader_name, key, size):
+    """직접 업로드용으로 발급한 키임을 확인하는 서명 (hashed 키에는 프로젝트/업로더가 드러나지 않으므로).
+    신고한 크기도 서명에 넣어 완료 단계에서 실제 객체 크기와 비교할 수 있게 한다"""
+    secret = secret_key.encode('utf-8') if isinstance(secret_key, str) else secret_key
+    message = f"{project_id}\n{uploader_name}\n{key}\n{size}".encode('utf-8')
+    return hmac.new(secret, message, hashlib.sha256).hexdigest()
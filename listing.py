@@ -0,0 +1,132 @@
+"""프로젝트 사진 목록: 필터 + keyset 페이지네이션 + 업로더별 요약"""
+import base64
+import json
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import and_, bindparam, case, func, or_
+
+from models import db, Photo
+
+DEFAULT_PAGE_SIZE = 200
+MAX_PAGE_SIZE = 500
+
+
+def _parse_date(value):
+    try:
+        return datetime.strptime(value, '%Y-%m-%d')
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_filters(args):
+    """쿼리스트링(uploader, downloaded, from, to, best)을 필터 dict로 변환"""
+    filters = {}
+    if args.get('uploader'):
+        filters['uploader'] = args['uploader']
+    if args.get('downloaded') in ('0', '1'):
+        filters['downloaded'] = args['downloaded'] == '1'
+    date_from = _parse_date(args.get('from'))
+    if date_from:
+        filters['from'] = date_from
+    date_to = _parse_date(args.get('to'))
+    if date_to:
+        filters['to'] = date_to
+    if args.get('best') == '1':
+        filters['best'] = True
+    return filters
+
+
+def parse_since(value):
+    """증분 내보내기 기준 시각 (YYYY-MM-DD 또는 ISO 8601 일시)"""
+    try:
+        return datetime.fromisoformat(value) if value else None
+    except ValueError:
+        return None
+
+
+def incremental_photos(project_id, uploader_name=None, since=None):
+    """아직 받지 않은 사진(since가 없을 때) 또는 since 이후 업로드된 사진을 쿼리 한 번으로 조회.
+
+    (project_id, is_downloaded) / (project_id, uploaded_at) 인덱스를 타도록 조건을 하나만 쓴다.
+    """
+    filters = {} if since else {'downloaded': False}
+    if uploader_name is not None:
+        filters['uploader'] = uploader_name
+    conditions = filter_conditions(project_id, filters)
+    if since:
+        conditions.append(Photo.uploaded_at > since)
+    order = [Photo.id] if uploader_name is not None else [Photo.uploader_name, Photo.id]
+    return Photo.query.filter(*conditions).order_by(*order).all()
+
+
+def filter_conditions(project_id, filters):
+    """(project_id, ...) 복합 인덱스를 탈 수 있는 WHERE 조건 목록"""
+    conditions = [Photo.project_id == project_id]
+    if 'uploader' in filters:
+        conditions.append(Photo.uploader_name == filters['uploader'])
+    if 'downloaded' in filters:
+        conditions.append(Photo.is_downloaded.is_(True) if filters['downloaded']
+                          else or_(Photo.is_downloaded.is_(False), Photo.is_downloaded.is_(None)))
+    if 'from' in filters:
+        conditions.append(Photo.uploaded_at >= filters['from'])
+    if 'to' in filters:
+        conditions.append(Photo.uploaded_at < filters['to'] + timedelta(days=1))
+    if filters.get('best'):
+        # 유사 사진 묶음에서 대표가 아닌 사진 제외 (업로더 필터가 있으면 그 업로더 안에서 묶는다).
+        # similar는 NumPy를 불러오므로 처음 쓸 때 import
+        from similar import project_clusters
+        hidden = project_clusters(project_id, filters.get('uploader'),
+                                  current_app.config['SIMILAR_MAX_DISTANCE']).hidden
+        if hidden:
+            # 개수가 많을 수 있어 바인드 변수 대신 리터럴로 렌더링 (SQLite 변수 개수 제한)
+            conditions.append(Photo.id.not_in(bindparam('similar_hidden', sorted(hidden), expanding=True,
+                                                        literal_execute=True, unique=True)))
+    return conditions
+
+
+def encode_cursor(photo):
+    raw = json.dumps([photo.uploader_name, photo.id], ensure_ascii=False).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii')
+
+
+def decode_cursor(cursor):
+    try:
+        uploader_name, photo_id = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        return str(uploader_name), int(photo_id)
+    except (ValueError, TypeError, AttributeError):
+        return None
+
+
+def list_photos(project_id, filters=None, after=None, limit=DEFAULT_PAGE_SIZE):
+    """(업로더, id) 순서의 keyset 페이지. (사진 목록, 다음 커서 또는 None) 반환"""
+    limit = max(1, min(int(limit or DEFAULT_PAGE_SIZE), MAX_PAGE_SIZE))
+    query = Photo.query.filter(*filter_conditions(project_id, filters or {}))
+
+    position = decode_cursor(after) if after else None
+    if position:
+        uploader_name, photo_id = position
+        query = query.filter(or_(
+            Photo.uploader_name > uploader_name,
+            and_(Photo.uploader_name == uploader_name, Photo.id > photo_id)
+        ))
+
+    photos = query.order_by(Photo.uploader_name, Photo.id).limit(limit + 1).all()
+    next_cursor = encode_cursor(photos[limit - 1]) if len(photos) > limit else None
+    return photos[:limit], next_cursor
+
+
+def uploader_summary(project_id, filters=None):
+    """업로더별 (이름, 사진 수, 다운로드 수, 용량) - 행을 불러오지 않는 GROUP BY 한 번"""
+    rows = db.session.query(
+        Photo.uploader_name,
+        func.count(Photo.id),
+        func.coalesce(func.sum(case((Photo.is_downloaded.is_(True), 1), else_=0)), 0),
+        func.coalesce(func.sum(Photo.file_size), 0)
+    ).filter(
+        *filter_conditions(project_id, filters or {})
+    ).group_by(Photo.uploader_name).order_by(Photo.uploader_name)
+    return [
+        {'uploader_name': name, 'count': count, 'downloaded': downloaded, 'bytes': size}
+        for name, count, downloaded, size in rows
+    ]
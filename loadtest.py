@@ -0,0 +1,288 @@
+"""대량 다운로드 중 페이지 지연시간 부하 테스트
+
+bench.py와 같은 합성 데이터(SQLite + 로컬 저장소)로 gunicorn(gunicorn.conf.py)을 띄운 뒤,
+
+1. 페이지(메인, 대시보드, 프로젝트 사진 목록)만 요청하며 기준 지연시간을 재고
+2. 느리게 읽는 ZIP 다운로드 클라이언트 여러 개를 붙인 상태에서 다시 잰다.
+3. ``--uploads N``이면 업로드 N개를 동시에 보내며(503이면 Retry-After 뒤 재시도) 다시 잰다.
+
+다운로드가 스레드를 차지해도 페이지 p50/p95가 크게 변하지 않아야 하며, archive 한도를
+넘는 다운로드는 기다리지 않고 503 + Retry-After를 받아야 한다. 업로드 폭주 중에도 목록 조회가
+DB 커넥션을 기다리지 않아야 하고(500 없음), 모든 업로드가 결국 성공해야 한다. 결과는 JSON으로 출력한다.
+
+    python loadtest.py --downloads 8 --download-rate 1048576 --duration 20
+    python loadtest.py --downloads 0 --uploads 200
+"""
+import argparse
+import contextlib
+import http.cookiejar
+import json
+import os
+import runpy
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections import Counter
+
+import bench
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='대량 다운로드 중 페이지 지연시간 부하 테스트')
+    parser.add_argument('--photos', type=int, default=2000, help='합성 프로젝트 사진 수')
+    parser.add_argument('--objects', type=int, default=100)
+    parser.add_argument('--object-size', type=int, default=1024 * 1024)
+    parser.add_argument('--downloads', type=int, default=8, help='동시 ZIP 다운로드 클라이언트 수')
+    parser.add_argument('--download-rate', type=int, default=1024 * 1024, help='클라이언트당 읽기 속도 (bytes/s)')
+    parser.add_argument('--page-clients', type=int, default=4, help='동시 페이지 요청 클라이언트 수')
+    parser.add_argument('--uploads', type=int, default=0, help='동시에 보낼 업로드 요청 수 (0이면 생략)')
+    parser.add_argument('--upload-size', type=int, default=512, help='업로드 합성 JPEG 한 변 픽셀 수')
+    parser.add_argument('--duration', type=float, default=20, help='단계별 측정 시간 (초)')
+    parser.add_argument('--port', type=int, default=0, help='gunicorn 포트 (기본: 빈 포트)')
+    parser.add_argument('--workdir', help='DB/저장소 디렉터리 (기본: 임시 디렉터리)')
+    parser.add_argument('--output', help='결과 JSON 파일 (기본: 표준 출력)')
+    return parser.parse_args(argv)
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def admin_opener(base_url, password):
+    """관리자 세션 쿠키를 가진 opener"""
+    opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()))
+    data = urllib.parse.urlencode({'password': password}).encode()
+    opener.open(f"{base_url}/admin/login", data=data, timeout=30).read()
+    return opener
+
+
+def prepare(args):
+    """합성 데이터를 만들고 프로젝트 id를 돌려준다 (gunicorn이 같은 DB/저장소를 쓰도록 환경변수도 설정)"""
+    workdir = args.workdir or tempfile.mkdtemp(prefix='photo-loadtest-')
+    os.environ.update(bench.bench_environ(workdir))
+    os.environ.setdefault('ADMIN_PASSWORD', 'loadtest')
+    with contextlib.redirect_stdout(sys.stderr):
+        app = bench.load_app(workdir)
+        with app.app_context():
+            payload = os.urandom(args.object_size)
+            keys = [f"loadtest/objects/{i:05d}.jpg" for i in range(args.objects)]
+            for key in keys:
+                app.extensions['photo_storage'].put(key, payload, content_type='image/jpeg')
+            return bench.seed_project('loadtest', args.photos, 50, keys)
+
+
+def server_settings():
+    """이번 실행에 쓰인 gunicorn 워커 설정과 admission 한도"""
+    from config import Config
+    conf = runpy.run_path(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'gunicorn.conf.py'))
+    return {
+        'worker_class': conf['worker_class'],
+        'workers': conf['workers'],
+        'threads': conf['threads'],
+        'admission_limits': Config.ADMISSION_LIMITS,
+    }
+
+
+def start_server(port):
+    root = os.path.dirname(os.path.abspath(__file__))
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', os.path.join(root, 'gunicorn.conf.py'),
+         '-b', f'127.0.0.1:{port}', 'wsgi:app'],
+        cwd=root, env=dict(os.environ, REVIEW_FLUSHER_ENABLED='false'),
+        stdout=subprocess.DEVNULL, stderr=sys.stderr
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        try:
+            urllib.request.urlopen(base_url + '/', timeout=2).read()
+            return process, base_url
+        except (urllib.error.URLError, ConnectionError, socket.timeout):
+            if process.poll() is not None:
+                raise RuntimeError('gunicorn이 시작되지 않았습니다')
+            time.sleep(0.3)
+    process.terminate()
+    raise RuntimeError('gunicorn 응답 대기 시간 초과')
+
+
+def page_client(opener, base_url, paths, stop, samples, errors):
+    i = 0
+    while not stop.is_set():
+        path = paths[i % len(paths)]
+        i += 1
+        started = time.perf_counter()
+        try:
+            opener.open(base_url + path, timeout=60).read()
+            samples.append(time.perf_counter() - started)
+        except urllib.error.HTTPError as e:
+            errors[e.code] += 1
+        except (urllib.error.URLError, ConnectionError, socket.timeout) as e:
+            errors[type(e).__name__] += 1
+
+
+def download_client(opener, url, rate, stop, statuses, transferred):
+    """ZIP을 rate bytes/s로 천천히 읽는다 (느린 관리자 회선). 503이면 Retry-After만큼 쉬고 다시 시도"""
+    chunk = max(16 * 1024, rate // 10)
+    while not stop.is_set():
+        try:
+            with opener.open(url, timeout=60) as response:
+                statuses[response.status] += 1
+                while not stop.is_set():
+                    started = time.monotonic()
+                    data = response.read(chunk)
+                    if not data:
+                        break
+                    transferred[0] += len(data)
+                    time.sleep(max(0.0, len(data) / rate - (time.monotonic() - started)))
+        except urllib.error.HTTPError as e:
+            statuses[e.code] += 1
+            time.sleep(float(e.headers.get('Retry-After') or 1) if e.code == 503 else 1)
+        except (urllib.error.URLError, ConnectionError, socket.timeout) as e:
+            statuses[type(e).__name__] += 1
+            time.sleep(1)
+
+
+class NoRedirect(urllib.request.HTTPRedirectHandler):
+    """업로드 성공(302)을 따라가지 않고 응답으로 받는다"""
+
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        return None
+
+
+def upload_client(base_url, project_id, index, payload, results):
+    """사진 한 장을 업로드한다. 503이면 Retry-After만큼 쉬고 다시 시도. (상태 기록, 완료까지 걸린 시간)"""
+    boundary = f"loadtest{index:06d}"
+    body = b''.join([
+        f'--{boundary}\r\nContent-Disposition: form-data; name="uploader_name"\r\n\r\n'.encode(),
+        f'burst-{index:04d}\r\n'.encode(),
+        f'--{boundary}\r\nContent-Disposition: form-data; name="photos"; filename="burst-{index:04d}.jpg"\r\n'
+        'Content-Type: image/jpeg\r\n\r\n'.encode(),
+        payload,
+        f'\r\n--{boundary}--\r\n'.encode(),
+    ])
+    opener = urllib.request.build_opener(NoRedirect)
+    started = time.perf_counter()
+    deadline = time.monotonic() + 300
+    while time.monotonic() < deadline:
+        request = urllib.request.Request(f"{base_url}/upload/{project_id}", data=body,
+                                         headers={'Content-Type': f'multipart/form-data; boundary={boundary}'})
+        try:
+            with opener.open(request, timeout=120) as response:
+                results['statuses'][response.status] += 1
+        except urllib.error.HTTPError as e:
+            results['statuses'][e.code] += 1
+            if e.code == 503:
+                time.sleep(float(e.headers.get('Retry-After') or 1))
+                continue
+            if e.code != 302:
+                return
+        except (urllib.error.URLError, ConnectionError, socket.timeout) as e:
+            results['statuses'][type(e).__name__] += 1
+            return
+        results['seconds'].append(time.perf_counter() - started)
+        return
+
+
+def measure_pages(base_url, password, clients, duration, paths):
+    stop = threading.Event()
+    samples, errors = [], Counter()
+    threads = [threading.Thread(target=page_client, args=(admin_opener(base_url, password), base_url, paths,
+                                                           stop, samples, errors), daemon=True)
+               for _ in range(clients)]
+    for thread in threads:
+        thread.start()
+    time.sleep(duration)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    result = bench.summarize(samples) if samples else {}
+    result.update({'requests': len(samples), 'errors': dict(errors),
+                   'rps': round(len(samples) / duration, 1)})
+    return result
+
+
+def run(args):
+    project_id = prepare(args)
+    password = os.environ['ADMIN_PASSWORD']
+    process, base_url = start_server(args.port or free_port())
+    paths = ['/', '/admin', f'/admin/project/{project_id}']
+    uploads = None
+    try:
+        print('기준 페이지 지연시간 측정', file=sys.stderr)
+        baseline = measure_pages(base_url, password, args.page_clients, args.duration, paths)
+
+        print(f'ZIP 다운로드 {args.downloads}개와 함께 측정', file=sys.stderr)
+        stop = threading.Event()
+        statuses, transferred = Counter(), [0]
+        url = f"{base_url}/admin/project/{project_id}/download-all"
+        downloaders = [threading.Thread(target=download_client,
+                                        args=(admin_opener(base_url, password), url, args.download_rate,
+                                              stop, statuses, transferred), daemon=True)
+                       for _ in range(args.downloads)]
+        for thread in downloaders:
+            thread.start()
+        time.sleep(1)  # 다운로드가 자리를 잡은 뒤부터 잰다
+        during = measure_pages(base_url, password, args.page_clients, args.duration, paths)
+        stop.set()
+        for thread in downloaders:
+            thread.join(timeout=10)
+
+        if args.uploads:
+            print(f'업로드 {args.uploads}개 동시 요청과 함께 측정', file=sys.stderr)
+            payloads = [bench.synthetic_jpeg(args.upload_size, i) for i in range(args.uploads)]
+            results = {'statuses': Counter(), 'seconds': []}
+            uploaders = [threading.Thread(target=upload_client,
+                                          args=(base_url, project_id, i, payloads[i], results), daemon=True)
+                         for i in range(args.uploads)]
+            started = time.perf_counter()
+            for thread in uploaders:
+                thread.start()
+            pages = measure_pages(base_url, password, args.page_clients, args.duration, paths)
+            for thread in uploaders:
+                thread.join(timeout=300)
+            uploads = {
+                'pages': pages,
+                'statuses': {str(k): v for k, v in results['statuses'].items()},
+                'completed': len(results['seconds']),
+                'wall_seconds': round(time.perf_counter() - started, 2),
+                'completion': bench.summarize(results['seconds']) if results['seconds'] else {},
+            }
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+
+    return {
+        'revision': bench.git_revision(),
+        'params': {key: value for key, value in vars(args).items() if key != 'output'},
+        'server': server_settings(),
+        'pages_baseline': baseline,
+        'pages_during_downloads': during,
+        'p95_ratio': round(during['p95_ms'] / baseline['p95_ms'], 2)
+        if baseline.get('p95_ms') and during.get('p95_ms') else None,
+        'downloads': {'statuses': {str(k): v for k, v in statuses.items()},
+                      'mb_transferred': round(transferred[0] / 1024 / 1024, 1)},
+        'pages_during_uploads': uploads,
+    }
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    output = json.dumps(run(args), ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+        print(f"결과 저장: {args.output}", file=sys.stderr)
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,208 @@
+"""병렬 다운로드용 내보내기 매니페스트
+
+수십 GB 프로젝트는 앱을 거치는 ZIP 스트림 하나로는 빨리 받을 수 없다. 매니페스트는 사진마다 저장할
+경로, 크기, SHA-256, presigned URL을 담아 aria2c/rclone/wget 같은 병렬 다운로더가 S3에서 바로
+받게 한다.
+
+- 행은 (업로더, id) keyset 페이지로 읽고(OFFSET 없음), 페이지마다 URL을 일괄 서명(storage.urls)해
+  바로 흘려보낸다. 발급 시점의 최대 id까지만 담으므로 도중에 올라온 사진은 다음 매니페스트에 들어간다.
+- 경로는 ZIP과 같은 규칙(``{업로더}/{파일명}``, 업로더 범위는 파일명만)이고, 같은 경로는 `` (2)``를 붙여
+  겹치지 않게 한다. 업로더/파일명의 경로 구분자는 ``_``로 바꾼다.
+- SHA-256은 저장된 객체가 업로드 원본 그대로일 때만 쓴다 (정규화된 사진의 content_hash는 원본 기준).
+- 다운로드 처리: ``issue``는 매니페스트를 끝까지 보낸 뒤, ``confirm``은 매니페스트에 담긴 확인 URL로
+  POST할 때 범위 전체를 UPDATE 한 번으로 처리한다.
+"""
+import csv
+import io
+import json
+import posixpath
+from datetime import datetime, timedelta
+
+from itsdangerous import BadSignature, URLSafeTimedSerializer
+from sqlalchemy import and_, bindparam, func, or_
+
+from listing import filter_conditions, parse_filters
+from models import db, Photo
+
+MANIFEST_FORMATS = {
+    'csv': ('text/csv', 'csv'),
+    'json': ('application/json', 'json'),
+    'aria2': ('text/plain', 'txt'),  # aria2c -i <파일>
+}
+MARK_MODES = ('issue', 'confirm', 'none')
+FILTER_ARGS = ('uploader', 'downloaded', 'from', 'to', 'best')
+CSV_COLUMNS = ('id', 'path', 'size', 'sha256', 'url')
+CONFIRM_MAX_AGE = 7 * 24 * 3600  # 확인 토큰 유효 기간 (초)
+CHUNK_SIZE = 64 * 1024
+
+
+class ManifestScope:
+    """매니페스트에 담을 사진 범위: 프로젝트 + 목록 필터, 또는 선택한 사진 id. max_id까지만"""
+
+    def __init__(self, project_id=None, filter_args=None, photo_ids=None, max_id=None):
+        self.project_id = project_id
+        self.filter_args = {name: filter_args[name] for name in FILTER_ARGS if filter_args and filter_args.get(name)}
+        self.photo_ids = sorted(set(photo_ids)) if photo_ids is not None else None
+        self.max_id = max_id
+
+    @property
+    def with_uploader(self):
+        """경로에 업로더 폴더를 붙일지 (업로더 하나로 좁힌 매니페스트는 파일명만)"""
+        return self.photo_ids is not None or 'uploader' not in self.filter_args
+
+    def conditions(self):
+        if self.photo_ids is not None:
+            # 선택이 길 수 있어 바인드 변수 대신 리터럴로 렌더링 (SQLite 변수 개수 제한)
+            conditions = [Photo.id.in_(bindparam('manifest_ids', self.photo_ids, expanding=True,
+                                                 literal_execute=True, unique=True))]
+        else:
+            conditions = filter_conditions(self.project_id, parse_filters(self.filter_args))
+        if self.max_id is not None:
+            conditions.append(Photo.id <= self.max_id)
+        return conditions
+
+    def summarize(self):
+        """(사진 수, 총 크기)를 구하고 max_id를 발급 시점 값으로 고정한다"""
+        count, size, max_id = db.session.query(
+            func.count(Photo.id), func.coalesce(func.sum(Photo.file_size), 0), func.max(Photo.id)
+        ).filter(*self.conditions()).one()
+        if self.max_id is None:
+            self.max_id = max_id or 0
+        return count, size
+
+    def to_token(self, secret_key):
+        payload = {'p': self.project_id, 'f': self.filter_args, 'ids': self.photo_ids, 'max': self.max_id}
+        return URLSafeTimedSerializer(secret_key, salt='photo-manifest').dumps(payload)
+
+    @classmethod
+    def from_token(cls, secret_key, token):
+        """확인 토큰 → 범위. 잘못됐거나 만료됐으면 None"""
+        try:
+            payload = URLSafeTimedSerializer(secret_key, salt='photo-manifest').loads(token, max_age=CONFIRM_MAX_AGE)
+        except BadSignature:
+            return None
+        return cls(payload['p'], payload['f'], payload['ids'], payload['max'])
+
+
+def mark_downloaded(scope, when=None):
+    """범위 안의 아직 받지 않은 사진을 UPDATE 문 하나로 다운로드 처리 (커밋은 호출자 몫). 갱신한 행 수 반환"""
+    conditions = scope.conditions() + [or_(Photo.is_downloaded.is_(False), Photo.is_downloaded.is_(None))]
+    return Photo.query.filter(*conditions).update(
+        {'is_downloaded': True, 'downloaded_at': when or datetime.utcnow()}, synchronize_session=False
+    )
+
+
+def photo_batches(scope, batch_size=1000):
+    """범위 안의 사진을 (업로더, id) keyset 페이지로 읽는다. 매니페스트에 필요한 컬럼만"""
+    conditions = scope.conditions()
+    position = None
+    while True:
+        query = db.session.query(Photo.id, Photo.filename, Photo.original_filename, Photo.uploader_name,
+                                 Photo.file_size, Photo.original_size, Photo.content_hash).filter(*conditions)
+        if position:
+            uploader_name, photo_id = position
+            query = query.filter(or_(
+                Photo.uploader_name > uploader_name,
+                and_(Photo.uploader_name == uploader_name, Photo.id > photo_id)
+            ))
+        rows = query.order_by(Photo.uploader_name, Photo.id).limit(batch_size).all()
+        if not rows:
+            return
+        yield rows
+        if len(rows) < batch_size:
+            return
+        position = (rows[-1].uploader_name, rows[-1].id)
+
+
+def safe_component(name):
+    """경로 한 단계로 쓸 수 있게 (구분자, 빈 이름, ``.``/``..`` 방지)"""
+    name = (name or '').replace('/', '_').replace('\\', '_').strip()
+    return '_' if name in ('', '.', '..') else name
+
+
+def unique_path(seen, path):
+    """이미 나온 경로면 ``이름 (2).jpg``처럼 번호를 붙인다"""
+    candidate = path
+    stem, ext = posixpath.splitext(path)
+    number = 2
+    while candidate.lower() in seen:  # 대소문자를 구분하지 않는 파일시스템(Windows/macOS)에서도 겹치지 않게
+        candidate = f"{stem} ({number}){ext}"
+        number += 1
+    seen.add(candidate.lower())
+    return candidate
+
+
+def checksum(row):
+    """저장된 객체의 SHA-256. 정규화로 원본과 달라진 객체면 None"""
+    if row.content_hash and (row.original_size is None or row.original_size == row.file_size):
+        return row.content_hash
+    return None
+
+
+def manifest_entries(storage, scope, expires, batch_size=1000, url_root=''):
+    """매니페스트 항목 dict를 흘려보낸다. 페이지마다 URL을 한 번에 서명.
+
+    url_root: 상대 URL(LocalStorage의 /storage/...) 앞에 붙일 앱 주소 (다운로더는 절대 URL이 필요)
+    """
+    seen = set()
+    for rows in photo_batches(scope, batch_size):
+        urls = storage.urls({row.filename for row in rows}, expires=expires)
+        for row in rows:
+            name = safe_component(row.original_filename)
+            path = f"{safe_component(row.uploader_name)}/{name}" if scope.with_uploader else name
+            url = urls[row.filename]
+            yield {'id': row.id, 'path': unique_path(seen, path), 'size': row.file_size,
+                   'sha256': checksum(row), 'url': url_root + url if url.startswith('/') else url}
+
+
+def _lines(entries, fmt, meta):
+    if fmt == 'csv':
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(CSV_COLUMNS)
+        for entry in entries:
+            writer.writerow(['' if entry[column] is None else entry[column] for column in CSV_COLUMNS])
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        yield buffer.getvalue()
+    elif fmt == 'json':
+        head = json.dumps(meta, ensure_ascii=False)
+        yield head[:-1] + ', "photos": ['
+        for i, entry in enumerate(entries):
+            yield (',\n' if i else '\n') + json.dumps(entry, ensure_ascii=False)
+        yield '\n]}\n'
+    else:
+        # aria2c 입력 파일: URL 줄 다음에 들여쓴 옵션 줄 (out=, checksum=)
+        for name, value in meta.items():
+            if value is not None:
+                yield f"# {name}: {value}\n"
+        for entry in entries:
+            yield f"{entry['url']}\n  out={entry['path']}\n"
+            if entry['sha256']:
+                yield f"  checksum=sha-256={entry['sha256']}\n"
+
+
+def render_manifest(entries, fmt, meta):
+    """항목들을 형식에 맞는 텍스트로 (64KB 안팎 조각으로 모아 보낸다). meta는 JSON 머리/aria2 주석"""
+    pending, size = [], 0
+    for line in _lines(entries, fmt, meta):
+        pending.append(line)
+        size += len(line)
+        if size >= CHUNK_SIZE:
+            yield ''.join(pending)
+            pending, size = [], 0
+    if pending:
+        yield ''.join(pending)
+
+
+def manifest_meta(count, size, expires, project=None, confirm_url=None):
+    now = datetime.utcnow()
+    return {
+        'project': project.name if project is not None else None,
+        'generated_at': now.isoformat(timespec='seconds') + 'Z',
+        'expires_at': (now + timedelta(seconds=expires)).isoformat(timespec='seconds') + 'Z',
+        'count': count,
+        'bytes': size,
+        'confirm_url': confirm_url,
+    }
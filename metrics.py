@@ -0,0 +1,286 @@
+"""요청/저장소/Sheets/SQL 계측과 Prometheus 형식 /metrics 출력
+
+- 요청마다 전체 시간과 구간별(SQL, 저장소, Sheets, 템플릿 렌더링) 소요 시간을 모아
+  히스토그램에 기록하고, 느린 요청은 구간별 내역을 로그로 남긴다.
+- 지정한 라우트는 일정 비율로 스택 샘플링 프로파일을 떠서 folded stack 파일로 저장한다
+  (flamegraph.pl / speedscope로 열 수 있다).
+
+값은 프로세스 메모리에 있으므로 gunicorn 워커마다 따로 집계된다. 스트리밍 응답(ZIP)의
+요청 시간은 본문 전송 전까지(첫 바이트까지)만 포함된다.
+"""
+import functools
+import hmac
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+from flask import Response, g, request, session, template_rendered, before_render_template
+from sqlalchemy import event
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+# 요청 처리 중인 스레드의 구간별 누적 {구간: [횟수, 초]}
+_local = threading.local()
+
+
+class Histogram:
+    """라벨별 누적 버킷 히스토그램 (스레드 안전)"""
+
+    def __init__(self, name, documentation, labelnames, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels.get(name, '')) for name in self.labelnames)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * len(self.buckets), 0, 0.0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][i] += 1
+            series[1] += 1
+            series[2] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted((key, ([*counts], total, amount)) for key, (counts, total, amount) in self._series.items())
+        for key, (counts, total, amount) in items:
+            labels = [f'{name}="{_escape(value)}"' for name, value in zip(self.labelnames, key)]
+            for bound, count in zip(self.buckets, counts):
+                le = 'le="%s"' % bound
+                lines.append(f"{self.name}_bucket{_labels(labels + [le])} {count}")
+            le = 'le="+Inf"'
+            lines.append(f"{self.name}_bucket{_labels(labels + [le])} {total}")
+            suffix = _labels(labels)
+            lines.append(f"{self.name}_count{suffix} {total}")
+            lines.append(f"{self.name}_sum{suffix} {amount:.6f}")
+        return '\n'.join(lines)
+
+
+def _labels(pairs):
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+REQUEST_SECONDS = Histogram('http_request_duration_seconds', 'HTTP 요청 처리 시간',
+                            ['method', 'endpoint', 'status'])
+STORAGE_SECONDS = Histogram('storage_call_duration_seconds', '저장소(S3/로컬) 호출 시간',
+                            ['backend', 'operation', 'outcome'])
+SHEETS_SECONDS = Histogram('sheets_call_duration_seconds', 'Google Sheets 호출 시간',
+                           ['operation', 'outcome'])
+SQL_SECONDS = Histogram('db_query_duration_seconds', 'SQL 문 실행 시간', ['statement'],
+                        buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 5))
+REGISTRY = [REQUEST_SECONDS, STORAGE_SECONDS, SHEETS_SECONDS, SQL_SECONDS]
+
+
+def render_metrics():
+    return '\n'.join(metric.render() for metric in REGISTRY) + '\n'
+
+
+_breakdown_lock = threading.Lock()
+
+
+def _add(part, seconds):
+    breakdown = getattr(_local, 'breakdown', None)
+    if breakdown is not None:
+        with _breakdown_lock:
+            entry = breakdown.setdefault(part, [0, 0.0])
+            entry[0] += 1
+            entry[1] += seconds
+
+
+def current_breakdown():
+    return getattr(_local, 'breakdown', None)
+
+
+def in_request_breakdown(func, breakdown):
+    """요청이 띄운 워커 스레드에서 실행할 함수. 그 스레드의 계측도 요청 내역에 더해진다"""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        _local.breakdown = breakdown
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _local.breakdown = None
+    return wrapper
+
+
+@contextmanager
+def timed(histogram, part, **labels):
+    """블록 실행 시간을 histogram에 기록하고 현재 요청의 ``part`` 구간에 더한다"""
+    started = time.perf_counter()
+    outcome = 'ok'
+    try:
+        yield
+    except Exception:
+        outcome = 'error'
+        raise
+    finally:
+        elapsed = time.perf_counter() - started
+        if 'outcome' in histogram.labelnames:
+            labels['outcome'] = outcome
+        histogram.observe(elapsed, **labels)
+        _add(part, elapsed)
+
+
+STORAGE_OPERATIONS = ('open', 'read', 'head', 'put', 'upload_fileobj', 'copy', 'delete_batch', 'url', 'urls',
+                      'send', 'presigned_post', 'create_multipart', 'presigned_part_url', 'complete_multipart')
+
+
+def instrument_storage(storage):
+    """저장소 인스턴스의 메서드를 시간 측정 래퍼로 바꾼다"""
+    backend = type(storage).__name__
+    for name in STORAGE_OPERATIONS:
+        method = getattr(storage, name, None)
+        if method is None:
+            continue
+
+        def wrapper(*args, _method=method, _name=name, **kwargs):
+            with timed(STORAGE_SECONDS, 'storage', backend=backend, operation=_name):
+                return _method(*args, **kwargs)
+
+        setattr(storage, name, functools.wraps(method)(wrapper))
+    return storage
+
+
+def sheets_call(operation):
+    """Google Sheets 호출 측정용 컨텍스트"""
+    return timed(SHEETS_SECONDS, 'sheets', operation=operation)
+
+
+class StackSampler:
+    """대상 스레드의 스택을 주기적으로 떠서 folded stack 형태로 센다"""
+
+    def __init__(self, thread_id, interval=0.005):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='stack-sampler', daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                frame = frame.f_back
+            if stack:
+                self.stacks[';'.join(reversed(stack))] += 1
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        return self.stacks
+
+    def write(self, path):
+        with open(path, 'w') as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+def _statement_kind(statement):
+    kind = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else 'OTHER'
+    return kind if kind in ('SELECT', 'INSERT', 'UPDATE', 'DELETE') else 'OTHER'
+
+
+def init_metrics(app, db):
+    """요청 훅, SQL 이벤트, 템플릿 렌더링 시그널, /metrics 라우트를 등록한다"""
+    slow_seconds = app.config['SLOW_REQUEST_SECONDS']
+    profile_routes = set(app.config['PROFILE_ROUTES'])
+    profile_rate = app.config['PROFILE_SAMPLE_RATE']
+    profile_dir = app.config['PROFILE_DIR']
+
+    with app.app_context():
+        engines = list(db.engines.values())  # primary + 리플리카(설정 시)
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info['query_started'].pop()
+        SQL_SECONDS.observe(elapsed, statement=_statement_kind(statement))
+        _add('sql', elapsed)
+
+    for engine in engines:
+        event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+        event.listen(engine, 'after_cursor_execute', after_cursor_execute)
+
+    def on_render_start(sender, template, context, **extra):
+        _local.render_started = time.perf_counter()
+
+    def on_rendered(sender, template, context, **extra):
+        started = getattr(_local, 'render_started', None)
+        if started is not None:
+            _add('render', time.perf_counter() - started)
+
+    before_render_template.connect(on_render_start, app, weak=False)
+    template_rendered.connect(on_rendered, app, weak=False)
+
+    @app.before_request
+    def start_request_timer():
+        _local.breakdown = {}
+        g.request_started = time.perf_counter()
+        endpoint = request.endpoint or ''
+        if endpoint in profile_routes and random.random() < profile_rate:
+            g.profiler = StackSampler(threading.get_ident()).start()
+
+    @app.after_request
+    def record_request(response):
+        started = g.pop('request_started', None)
+        if started is None:
+            return response
+        elapsed = time.perf_counter() - started
+        endpoint = request.endpoint or 'unknown'
+        REQUEST_SECONDS.observe(elapsed, method=request.method, endpoint=endpoint, status=response.status_code)
+
+        breakdown = getattr(_local, 'breakdown', None) or {}
+        if elapsed >= slow_seconds:
+            parts = ', '.join(f"{part} {count}회 {seconds:.3f}s"
+                              for part, (count, seconds) in sorted(breakdown.items()))
+            print(f"느린 요청 {request.method} {request.path} {response.status_code} "
+                  f"{elapsed:.3f}s ({parts or '내역 없음'})")
+
+        profiler = g.pop('profiler', None)
+        if profiler is not None:
+            profiler.stop()
+            os.makedirs(profile_dir, exist_ok=True)
+            path = os.path.join(profile_dir, f"{endpoint}-{int(time.time() * 1000)}.folded")
+            profiler.write(path)
+            print(f"프로파일 저장: {path} ({elapsed:.3f}s)")
+        return response
+
+    @app.teardown_request
+    def clear_breakdown(exc):
+        profiler = g.pop('profiler', None)
+        if profiler is not None:
+            profiler.stop()
+        _local.breakdown = None
+
+    @app.route('/metrics')
+    def metrics_endpoint():
+        # 기본은 Bearer 토큰이나 관리자 세션이 있어야 하고, METRICS_PUBLIC=true일 때만 누구나 읽는다
+        token = app.config['METRICS_TOKEN']
+        authorized = (app.config['METRICS_PUBLIC'] or session.get('is_admin') or
+                      (token and hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}')))
+        if not authorized:
+            return ('', 401)
+        return Response(render_metrics(), mimetype='text/plain; version=0.0.4')
@@ -0,0 +1,66 @@
+"""버전 기반 스키마 마이그레이션
+
+``db.create_all()``은 기존 테이블에 컬럼/인덱스를 추가하지 않으므로, 스키마 변경은
+여기에 버전 번호와 함께 추가한다. 적용된 버전은 ``schema_version`` 테이블에 기록된다.
+각 단계는 새로 만든 DB(이미 최신 스키마)에서도 안전하도록 멱등적으로 작성한다.
+"""
+from sqlalchemy import inspect, text
+
+
+def add_column(conn, table, column, ddl):
+    existing = {col['name'] for col in inspect(conn).get_columns(table)}
+    if column not in existing:
+        conn.execute(text(f'ALTER TABLE {table} ADD COLUMN {column} {ddl}'))
+
+
+def create_index(conn, name, table, columns):
+    conn.execute(text(f'CREATE INDEX IF NOT EXISTS {name} ON {table} ({", ".join(columns)})'))
+
+
+MIGRATIONS = [
+    (1, '사진 파생 이미지 컬럼', lambda conn: add_column(conn, 'photos', 'derivatives', 'VARCHAR(100)')),
+    (2, '사진 목록 복합 인덱스', lambda conn: (
+        create_index(conn, 'ix_photos_project_uploader', 'photos', ['project_id', 'uploader_name']),
+        create_index(conn, 'ix_photos_project_downloaded', 'photos', ['project_id', 'is_downloaded']),
+        create_index(conn, 'ix_photos_project_uploaded_at', 'photos', ['project_id', 'uploaded_at']),
+    )),
+    (3, '사진 콘텐츠 해시', lambda conn: (
+        add_column(conn, 'photos', 'content_hash', 'VARCHAR(64)'),
+        create_index(conn, 'ix_photos_project_hash', 'photos', ['project_id', 'content_hash']),
+    )),
+    (4, '업로드 정규화 정책과 원본 크기', lambda conn: (
+        add_column(conn, 'projects', 'normalize_max_edge', 'INTEGER'),
+        add_column(conn, 'projects', 'normalize_quality', 'INTEGER DEFAULT 85'),
+        add_column(conn, 'photos', 'original_size', 'INTEGER'),
+    )),
+    (5, '사진 키 인덱스', lambda conn: create_index(conn, 'ix_photos_filename', 'photos', ['filename'])),
+    (6, '유사 사진 서명', lambda conn: (
+        add_column(conn, 'photos', 'perceptual_hash', 'BIGINT'),
+        add_column(conn, 'photos', 'sharpness', 'FLOAT'),
+    )),
+    (7, '사진 키 해시 prefix 인덱스',
+     lambda conn: create_index(conn, 'ix_photos_key_prefix', 'photos', ['substr(filename, 1, 3)'])),
+    (8, '아카이브에 담긴 최대 사진 id', lambda conn: add_column(conn, 'archive_jobs', 'max_photo_id', 'INTEGER')),
+]
+
+
+def current_version(conn):
+    conn.execute(text('CREATE TABLE IF NOT EXISTS schema_version (version INTEGER NOT NULL)'))
+    return conn.execute(text('SELECT MAX(version) FROM schema_version')).scalar() or 0
+
+
+def upgrade(engine):
+    """적용되지 않은 마이그레이션을 순서대로 적용하고 적용된 버전 목록을 반환"""
+    with engine.begin() as conn:
+        version = current_version(conn)
+
+    applied = []
+    for number, description, step in MIGRATIONS:
+        if number <= version:
+            continue
+        with engine.begin() as conn:
+            step(conn)
+            conn.execute(text('INSERT INTO schema_version (version) VALUES (:v)'), {'v': number})
+        print(f"마이그레이션 {number} 적용: {description}")
+        applied.append(number)
+    return applied
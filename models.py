@@ -1,7 +1,23 @@
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import case, func
 from datetime import datetime
+from database import RoutingSession
 
-db = SQLAlchemy()
+# 세션은 @read_replica 구간의 SELECT를 리플리카로 보낸다 (database.py)
+db = SQLAlchemy(session_options={'class_': RoutingSession})
+
+
+def format_bytes(size):
+    if size is None:
+        return '-'
+    if size < 1024:
+        return f'{size} B'
+    elif size < 1024 * 1024:
+        return f'{size / 1024:.1f} KB'
+    elif size < 1024 * 1024 * 1024:
+        return f'{size / (1024 * 1024):.1f} MB'
+    else:
+        return f'{size / (1024 * 1024 * 1024):.1f} GB'
 
 class Project(db.Model):
     __tablename__ = 'projects'
@@ -12,23 +28,77 @@ class Project(db.Model):
     folder_name = db.Column(db.String(200), nullable=False, unique=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     is_active = db.Column(db.Boolean, default=True)
+    # 업로드 정규화 정책: 긴 변 상한(px)이 있으면 EXIF 회전 적용, 메타데이터 제거, 축소 후 재인코딩
+    normalize_max_edge = db.Column(db.Integer)
+    normalize_quality = db.Column(db.Integer, default=85)
     
     photos = db.relationship('Photo', backref='project', lazy=True, cascade='all, delete-orphan')
     
     def __repr__(self):
         return f'<Project {self.name}>'
     
+    @staticmethod
+    def load_stats(projects):
+        """여러 프로젝트의 사진 수/다운로드 수/용량/원본 용량을 GROUP BY 쿼리 한 번으로 채운다"""
+        projects = list(projects)
+        ids = [p.id for p in projects]
+        stats = {}
+        if ids:
+            rows = db.session.query(
+                Photo.project_id,
+                func.count(Photo.id),
+                func.coalesce(func.sum(case((Photo.is_downloaded.is_(True), 1), else_=0)), 0),
+                func.coalesce(func.sum(Photo.file_size), 0),
+                func.coalesce(func.sum(func.coalesce(Photo.original_size, Photo.file_size)), 0)
+            ).filter(Photo.project_id.in_(ids)).group_by(Photo.project_id)
+            stats = {row[0]: tuple(row[1:]) for row in rows}
+        for project in projects:
+            project._stats = stats.get(project.id, (0, 0, 0, 0))
+        return projects
+    
+    @property
+    def stats(self):
+        """(사진 수, 다운로드 수, 총 용량, 정규화 전 원본 용량) - 사진 행을 불러오지 않고 집계"""
+        if getattr(self, '_stats', None) is None:
+            Project.load_stats([self])
+        return self._stats
+    
     @property
     def photo_count(self):
-        return len(self.photos)
+        return self.stats[0]
     
     @property
     def downloaded_count(self):
-        return sum(1 for p in self.photos if p.is_downloaded)
+        return self.stats[1]
+    
+    @property
+    def storage_bytes(self):
+        return self.stats[2]
+    
+    @property
+    def storage_display(self):
+        return format_bytes(self.storage_bytes)
+    
+    @property
+    def original_bytes(self):
+        return self.stats[3]
+    
+    @property
+    def saved_display(self):
+        """업로드 정규화로 줄어든 용량 (줄어든 게 없으면 None)"""
+        saved = self.original_bytes - self.storage_bytes
+        return format_bytes(saved) if saved > 0 else None
 
 
 class Photo(db.Model):
     __tablename__ = 'photos'
+    __table_args__ = (
+        db.Index('ix_photos_project_uploader', 'project_id', 'uploader_name'),
+        db.Index('ix_photos_project_downloaded', 'project_id', 'is_downloaded'),
+        db.Index('ix_photos_project_uploaded_at', 'project_id', 'uploaded_at'),
+        db.Index('ix_photos_project_hash', 'project_id', 'content_hash'),
+        db.Index('ix_photos_filename', 'filename'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     project_id = db.Column(db.Integer, db.ForeignKey('projects.id'), nullable=False)
@@ -39,6 +109,11 @@ class Photo(db.Model):
     uploaded_at = db.Column(db.DateTime, default=datetime.utcnow)
     is_downloaded = db.Column(db.Boolean, default=False)
     downloaded_at = db.Column(db.DateTime)
+    derivatives = db.Column(db.String(100))  # 생성된 파생 이미지 이름 (쉼표 구분, 예: "preview,thumb")
+    content_hash = db.Column(db.String(64))  # 업로드된 원본의 SHA-256 (같은 프로젝트의 같은 사진은 같은 객체를 공유)
+    original_size = db.Column(db.Integer)  # 정규화 전 업로드 크기 (bytes). file_size는 저장된 크기
+    perceptual_hash = db.Column(db.BigInteger)  # 64비트 dHash (부호 있는 정수로 저장, 유사 사진 묶기용)
+    sharpness = db.Column(db.Float)  # 썸네일 크기에서 잰 선명도 (유사 사진 묶음의 대표 선택용)
     
     def __repr__(self):
         return f'<Photo {self.original_filename} by {self.uploader_name}>'
@@ -47,13 +122,149 @@ class Photo(db.Model):
     def s3_key(self):
         return self.filename
     
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'project_id': self.project_id,
+            'original_filename': self.original_filename,
+            'uploader_name': self.uploader_name,
+            'file_size': self.file_size,
+            'uploaded_at': self.uploaded_at.isoformat() if self.uploaded_at else None,
+            'is_downloaded': bool(self.is_downloaded),
+            'downloaded_at': self.downloaded_at.isoformat() if self.downloaded_at else None,
+        }
+    
+    @staticmethod
+    def mark_downloaded(photo_ids, when=None):
+        """사진들을 UPDATE 문으로 한꺼번에 다운로드 처리 (커밋은 호출자 몫). 갱신한 행 수 반환"""
+        photo_ids = list(photo_ids)
+        when = when or datetime.utcnow()
+        updated = 0
+        for start in range(0, len(photo_ids), 500):
+            updated += Photo.query.filter(Photo.id.in_(photo_ids[start:start + 500])).update(
+                {'is_downloaded': True, 'downloaded_at': when}, synchronize_session=False
+            )
+        return updated
+    
+    @property
+    def derivative_names(self):
+        return [name for name in (self.derivatives or '').split(',') if name]
+    
+    def has_derivative(self, name):
+        return name in self.derivative_names
+    
     @property
     def file_size_display(self):
-        if self.file_size is None:
-            return '-'
-        if self.file_size < 1024:
-            return f'{self.file_size} B'
-        elif self.file_size < 1024 * 1024:
-            return f'{self.file_size / 1024:.1f} KB'
-        else:
-            return f'{self.file_size / (1024 * 1024):.1f} MB'
+        return format_bytes(self.file_size)
+
+
+# hashed 키의 prefix (``ab/``, keys.py). 식 인덱스와 조회 식이 글자 그대로 같아야 SQLite가 인덱스를
+# 쓰므로 인자를 바인드 변수 대신 리터럴로 둔다
+photo_key_prefix = func.substr(Photo.filename, db.literal_column('1'), db.literal_column('3'))
+db.Index('ix_photos_key_prefix', photo_key_prefix)
+
+
+class PurgeJob(db.Model):
+    """대형 프로젝트의 백그라운드 삭제 작업"""
+    __tablename__ = 'purge_jobs'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    project_id = db.Column(db.Integer, nullable=False, index=True)  # 삭제 완료 후에도 남도록 FK 없음
+    project_name = db.Column(db.String(200), nullable=False)
+    total = db.Column(db.Integer, default=0)
+    deleted = db.Column(db.Integer, default=0)
+    failed = db.Column(db.Integer, default=0)
+    status = db.Column(db.String(20), default='pending')  # pending / running / done / failed
+    error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<PurgeJob {self.project_name} {self.status}>'
+    
+    @property
+    def progress(self):
+        if not self.total:
+            return 100
+        return min(100, int(self.deleted * 100 / self.total))
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'project_id': self.project_id,
+            'project_name': self.project_name,
+            'total': self.total,
+            'deleted': self.deleted,
+            'failed': self.failed,
+            'status': self.status,
+            'error': self.error,
+            'progress': self.progress,
+        }
+
+
+class ArchiveJob(db.Model):
+    """백그라운드로 만들어 저장소에 올려 두는 ZIP 아카이브 (사진 구성이 같으면 재사용)"""
+    __tablename__ = 'archive_jobs'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    project_id = db.Column(db.Integer, nullable=False, index=True)
+    uploader_name = db.Column(db.String(100))  # None이면 프로젝트 전체
+    download_name = db.Column(db.String(300), nullable=False)
+    fingerprint = db.Column(db.String(64))  # 아카이브에 담긴 사진 구성의 해시
+    max_photo_id = db.Column(db.Integer)  # 아카이브에 담긴 가장 큰 사진 id (받을 때 이 id까지만 다운로드 처리)
+    key = db.Column(db.String(500))
+    total = db.Column(db.Integer, default=0)
+    processed = db.Column(db.Integer, default=0)
+    skipped = db.Column(db.Integer, default=0)
+    size = db.Column(db.BigInteger, default=0)
+    status = db.Column(db.String(20), default='pending')  # pending / running / done / failed
+    error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<ArchiveJob {self.project_id} {self.uploader_name or "*"} {self.status}>'
+    
+    @property
+    def progress(self):
+        if self.status == 'done' or not self.total:
+            return 100 if self.status == 'done' else 0
+        return min(99, int(self.processed * 100 / self.total))
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'project_id': self.project_id,
+            'uploader_name': self.uploader_name,
+            'total': self.total,
+            'processed': self.processed,
+            'skipped': self.skipped,
+            'size': self.size,
+            'size_display': format_bytes(self.size),
+            'status': self.status,
+            'error': self.error,
+            'progress': self.progress,
+        }
+
+
+class ReviewOutbox(db.Model):
+    """Google Sheets로 보낼 리뷰 대기열"""
+    __tablename__ = 'review_outbox'
+    __table_args__ = (
+        db.Index('ix_review_outbox_pending', 'sent_at', 'next_attempt_at'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    uploader_name = db.Column(db.String(100), nullable=False)
+    project_name = db.Column(db.String(200), nullable=False)
+    review = db.Column(db.Text, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    attempts = db.Column(db.Integer, default=0)
+    next_attempt_at = db.Column(db.DateTime, default=datetime.utcnow)
+    last_error = db.Column(db.Text)
+    claim_token = db.Column(db.String(32), index=True)
+    claimed_at = db.Column(db.DateTime)
+    sent_at = db.Column(db.DateTime)
+    
+    def __repr__(self):
+        return f'<ReviewOutbox {self.uploader_name} {"sent" if self.sent_at else "pending"}>'
@@ -0,0 +1,60 @@
+"""업로드 시 이미지 정규화 (EXIF 회전 적용, 메타데이터 제거, 긴 변 제한, 재인코딩)
+
+Pillow 디코딩/인코딩은 CPU를 오래 쓰므로 프로세스 풀에서 실행해 요청 스레드(GIL)를
+막지 않는다. JPEG/WebP만 같은 포맷으로 다시 저장하고, 그 밖의 포맷은 그대로 둔다.
+다시 저장한 결과가 원본보다 커지는 경우(회전/축소 없음)에는 원본에서 메타데이터만 뺀다.
+
+gthread 워커는 스레드가 여럿이라 fork하면 다른 스레드가 잡고 있던 락(로깅, S3 커넥션 풀 등)이
+자식에 잠긴 채 복사돼 멈출 수 있다. 그래서 forkserver(없으면 spawn)로 자식을 만들고, 자식은
+Pillow만 쓰는 normalize_worker 모듈만 불러온다.
+"""
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from normalize_worker import normalize_image
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool(workers=None):
+    """프로세스 풀 (처음 사용할 때 한 번 생성, 프로세스 안에서 공유)"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                if 'forkserver' in multiprocessing.get_all_start_methods():
+                    context = multiprocessing.get_context('forkserver')
+                    # forkserver가 __main__ 대신 워커 모듈(Pillow)만 미리 불러 두고 자식은 거기서 fork
+                    context.set_forkserver_preload(['normalize_worker'])
+                else:
+                    context = multiprocessing.get_context('spawn')
+                _pool = ProcessPoolExecutor(max_workers=workers or os.cpu_count(), mp_context=context)
+    return _pool
+
+
+def reset_pool(broken):
+    """망가진 풀을 버린다 (다른 스레드가 이미 새 풀로 바꿨으면 그대로 둔다)"""
+    global _pool
+    with _pool_lock:
+        if _pool is broken:
+            _pool = None
+    broken.shutdown(wait=False, cancel_futures=True)
+
+
+def normalize_in_pool(data, max_edge, quality=85, workers=None):
+    """프로세스 풀에서 normalize_image를 실행하고 결과를 기다린다 (워커 스레드에서 호출).
+
+    자식 프로세스 하나가 죽으면(큰 이미지에서 OOM 등) 풀 전체가 BrokenProcessPool이 되므로
+    새 풀로 바꿔 한 번 다시 시도한다.
+    """
+    pool = get_pool(workers)
+    try:
+        return pool.submit(normalize_image, data, max_edge, quality).result()
+    except BrokenProcessPool:
+        print("정규화 프로세스 풀이 깨져 새로 만듭니다")
+        reset_pool(pool)
+        return get_pool(workers).submit(normalize_image, data, max_edge, quality).result()
@@ -0,0 +1,90 @@
+"""정규화 프로세스 풀의 자식 프로세스에서 실행되는 코드
+
+자식 프로세스는 이 모듈만 불러온다. Pillow 외에는 아무것도 import하지 않으므로 Flask 앱,
+DB 엔진, S3 클라이언트가 자식 프로세스에서 다시 만들어지지 않는다.
+"""
+import io
+import struct
+
+from PIL import Image, ImageOps
+
+NORMALIZE_FORMATS = {'JPEG', 'WEBP'}
+ORIENTATION_TAG = 0x0112
+# 원본을 그대로 둘 때 남기는 JPEG APPn 세그먼트: JFIF(APP0), ICC 프로파일(APP2), Adobe 색 공간(APP14)
+JPEG_KEEP_SEGMENTS = {0xE0, 0xE2, 0xEE}
+WEBP_METADATA_CHUNKS = {b'EXIF', b'XMP '}
+
+
+def strip_jpeg_metadata(data):
+    """JPEG 바이트에서 EXIF/XMP/IPTC/주석 세그먼트를 무손실로 뺀다. 구조를 읽을 수 없으면 None"""
+    if data[:2] != b'\xff\xd8':
+        return None
+    out = [data[:2]]
+    i = 2
+    while i + 4 <= len(data):
+        if data[i] != 0xFF:
+            return None
+        marker = data[i + 1]
+        if marker == 0xFF:  # 채움 바이트
+            i += 1
+            continue
+        if marker == 0xDA:  # 스캔 시작부터 끝까지는 이미지 데이터
+            out.append(data[i:])
+            return b''.join(out)
+        length = struct.unpack('>H', data[i + 2:i + 4])[0]
+        if not (0xE0 <= marker <= 0xEF or marker == 0xFE) or marker in JPEG_KEEP_SEGMENTS:
+            out.append(data[i:i + 2 + length])
+        i += 2 + length
+    return None
+
+
+def strip_webp_metadata(data):
+    """WebP(RIFF)에서 EXIF/XMP 청크를 빼고 VP8X 플래그를 고친다. 구조를 읽을 수 없으면 None"""
+    if data[:4] != b'RIFF' or data[8:12] != b'WEBP':
+        return None
+    chunks = []
+    i = 12
+    while i + 8 <= len(data):
+        fourcc = data[i:i + 4]
+        size = struct.unpack('<I', data[i + 4:i + 8])[0]
+        chunk = data[i:i + 8 + size + (size & 1)]
+        if fourcc == b'VP8X':
+            # 플래그 바이트의 EXIF(0x08)/XMP(0x04) 비트를 끈다
+            chunk = chunk[:8] + bytes([chunk[8] & ~0x0C]) + chunk[9:]
+        if fourcc not in WEBP_METADATA_CHUNKS:
+            chunks.append(chunk)
+        i += 8 + size + (size & 1)
+    body = b'WEBP' + b''.join(chunks)
+    return b'RIFF' + struct.pack('<I', len(body)) + body
+
+
+def normalize_image(data, max_edge, quality=85):
+    """정규화한 이미지 바이트를 반환한다. 대상 포맷이 아니면 None.
+
+    회전/축소 없이 다시 저장만 했는데 원본보다 커지면 원본에서 메타데이터만 무손실로 뺀 바이트를 쓴다.
+    """
+    with Image.open(io.BytesIO(data)) as img:
+        fmt = img.format
+        if fmt not in NORMALIZE_FORMATS:
+            return None
+        rotated = img.getexif().get(ORIENTATION_TAG, 1) != 1
+        resized = max(img.size) > max_edge
+        if fmt == 'JPEG':
+            img.draft('RGB', (max_edge, max_edge))
+        img = ImageOps.exif_transpose(img)
+        if max(img.size) > max_edge:
+            img.thumbnail((max_edge, max_edge), Image.LANCZOS)
+
+        buffer = io.BytesIO()
+        if fmt == 'JPEG':
+            if img.mode not in ('RGB', 'L'):
+                img = img.convert('RGB')
+            # exif/icc_profile을 넘기지 않으므로 메타데이터는 모두 빠진다
+            img.save(buffer, 'JPEG', quality=quality, optimize=True, progressive=True)
+        else:
+            img.save(buffer, 'WEBP', quality=quality, method=4)
+        if not rotated and not resized and buffer.tell() >= len(data):
+            stripped = strip_jpeg_metadata(data) if fmt == 'JPEG' else strip_webp_metadata(data)
+            if stripped is not None:
+                return stripped
+        return buffer.getvalue()
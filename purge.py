@@ -0,0 +1,116 @@
+"""저장소 일괄 삭제(S3 DeleteObjects)와 대형 프로젝트 백그라운드 삭제"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from archive import drop_archives
+from derivatives import derivative_keys
+from models import db, Project, Photo, PurgeJob
+
+DELETE_BATCH_SIZE = 1000  # DeleteObjects 한 번에 보낼 수 있는 최대 키 수
+PURGE_PAGE_SIZE = 2000  # 백그라운드 삭제 시 한 번에 처리할 사진 수
+
+
+def photo_keys(photo):
+    """사진 하나가 S3에 가진 모든 키 (원본 + 파생 이미지)"""
+    return [photo.filename] + derivative_keys(photo)
+
+
+def unreferenced_keys(photos):
+    """삭제할 사진들의 키 중, 남는 다른 사진(중복 제거 참조)이 쓰지 않는 것만 반환"""
+    photos = list(photos)
+    if not photos:
+        return []
+    ids = [p.id for p in photos]
+    filenames = list({p.filename for p in photos})
+    shared = set()
+    for start in range(0, len(filenames), 500):
+        shared.update(row.filename for row in Photo.query.with_entities(Photo.filename).filter(
+            Photo.filename.in_(filenames[start:start + 500]), ~Photo.id.in_(ids)
+        ))
+    return [key for p in photos if p.filename not in shared for key in photo_keys(p)]
+
+
+def delete_keys(storage, keys, workers=4, retries=2):
+    """키들을 1000개 단위 DeleteObjects로 병렬 삭제한다.
+
+    부분 실패한 키만 지수 백오프로 재시도하며, 끝내 삭제하지 못한 키 목록을 반환한다.
+    """
+    pending = list(dict.fromkeys(keys))
+    for attempt in range(retries + 1):
+        if not pending:
+            break
+        if attempt:
+            time.sleep(2 ** (attempt - 1))
+        batches = [pending[i:i + DELETE_BATCH_SIZE] for i in range(0, len(pending), DELETE_BATCH_SIZE)]
+        with ThreadPoolExecutor(max_workers=max(1, min(workers, len(batches)))) as pool:
+            pending = [key for failed in pool.map(storage.delete_batch, batches)
+                       for key in failed]
+    return pending
+
+
+def run_purge(app, job_id, storage, workers=4):
+    """프로젝트 사진을 페이지 단위로 S3/DB에서 지우고 진행 상황을 PurgeJob에 기록한다.
+
+    S3 삭제에 실패한 사진의 행은 남겨 두므로, 같은 작업을 다시 실행하면 남은 것만 재시도한다.
+    """
+    with app.app_context():
+        job = db.session.get(PurgeJob, job_id)
+        job.status = 'running'
+        job.failed = 0
+        job.error = None
+        db.session.commit()
+
+        try:
+            last_id = 0
+            while True:
+                photos = (Photo.query
+                          .filter(Photo.project_id == job.project_id, Photo.id > last_id)
+                          .order_by(Photo.id)
+                          .limit(PURGE_PAGE_SIZE)
+                          .all())
+                if not photos:
+                    break
+                last_id = photos[-1].id
+
+                failed = set(delete_keys(storage, [key for p in photos for key in photo_keys(p)], workers))
+                done_ids = [p.id for p in photos if not failed.intersection(photo_keys(p))]
+                if done_ids:
+                    Photo.query.filter(Photo.id.in_(done_ids)).delete(synchronize_session=False)
+
+                job.deleted += len(done_ids)
+                job.failed += len(photos) - len(done_ids)
+                job.updated_at = datetime.utcnow()
+                db.session.commit()
+                db.session.expunge_all()
+                job = db.session.get(PurgeJob, job_id)
+
+            if job.failed:
+                job.status = 'failed'
+                job.error = f'{job.failed}장의 S3 객체 삭제 실패 - 재시도 필요'
+            else:
+                project = db.session.get(Project, job.project_id)
+                if project:
+                    db.session.delete(project)
+                job.status = 'done'
+            job.updated_at = datetime.utcnow()
+            db.session.commit()
+            if job.status == 'done':
+                drop_archives(storage, job.project_id)
+        except Exception as e:
+            db.session.rollback()
+            print(f"프로젝트 삭제 작업 오류 (job {job_id}): {e}")
+            job = db.session.get(PurgeJob, job_id)
+            job.status = 'failed'
+            job.error = str(e)
+            job.updated_at = datetime.utcnow()
+            db.session.commit()
+
+
+def start_purge(app, job_id, storage, workers=4):
+    """백그라운드 스레드에서 run_purge 실행"""
+    thread = threading.Thread(target=run_purge, args=(app, job_id, storage, workers),
+                              name=f'purge-{job_id}', daemon=True)
+    thread.start()
+    return thread
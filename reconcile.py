@@ -0,0 +1,337 @@
+"""저장소(S3/로컬)와 photos 테이블 대조
+
+업로드가 저장소 쓰기 뒤에 실패하거나 삭제 중 저장소 오류가 나면 버킷과 DB가 어긋난다.
+
+- 고아 객체: 어떤 사진 행도 가리키지 않는 원본/파생 이미지, 어떤 작업도 가리키지 않는 아카이브
+- 누락 객체: 사진 행이 가리키는데 저장소에 없는 원본/파생 이미지
+
+키 공간을 shard로 나눠 스레드 풀에서 병렬로 목록을 조회하고 (list_objects_v2 페이지 단위),
+DB 비교는 메인 스레드에서 shard마다 인덱스 조회와 filename 일괄 조회로 한다.
+shard 하나의 키만 메모리에 올리므로 버킷 전체 키 수와 무관하게 동작한다.
+
+- hashed 키(keys.py)는 ``{해시}/`` prefix 하나가 shard이고, 행은 키 prefix 식 인덱스로 찾는다.
+- 경로형 키는 ``{프로젝트 이름 또는 folder_name}/{업로더}/``가 shard이고,
+  행은 (project_id, uploader_name) 인덱스로 찾는다.
+"""
+import time
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from archive import ARCHIVE_PREFIX
+from derivatives import DERIVATIVE_PREFIX, DERIVATIVE_SPECS, derivative_key
+from keys import HASHED_SHARD, is_hashed_key
+from models import db, ArchiveJob, Photo, Project, photo_key_prefix
+from purge import delete_keys
+from storage import ObjectNotFound
+
+QUERY_BATCH_SIZE = 500  # IN 절 한 번에 넣을 키 수
+RESERVED_PREFIXES = (f"{DERIVATIVE_PREFIX}/", f"{ARCHIVE_PREFIX}/")
+
+
+def empty_report():
+    return {
+        'shards': 0,
+        'objects': 0,
+        'bytes': 0,
+        'orphans': [],  # {'key', 'size', 'kind'}
+        'missing': [],  # {'key', 'kind', 'photo_ids', 'size'}
+        'skipped_recent': 0,
+        'skipped_recent_rows': 0,  # 목록 조회 무렵 생긴 사진 행 (객체 업로드/rekey 진행 중일 수 있음)
+    }
+
+
+def discover_shards(storage, pool):
+    """저장소와 DB 양쪽에서 shard 목록과 shard 밖의 객체를 모은다.
+
+    (shard 목록, {shard: [(업로더, project_ids), ...]}, shard 밖 객체) 반환. 다른 shard 안에 들어가는
+    shard(예: 이름에 /가 있는 프로젝트)는 바깥 shard에 합쳐 객체를 두 번 세지 않는다.
+    """
+    shards, loose, tops = set(), [], []
+
+    def add(prefix, nested):
+        if HASHED_SHARD.match(prefix):
+            shards.add(prefix)
+        else:
+            tops.append(nested)
+
+    roots, objects = storage.list_prefixes('')
+    loose.extend(objects)
+    for prefix in roots:
+        if prefix not in RESERVED_PREFIXES:
+            add(prefix, prefix)
+    # 파생 이미지만 남은 shard도 찾는다: _derivatives/{이름}/{shard}
+    derivative_roots = [f"{DERIVATIVE_PREFIX}/{name}/" for name in DERIVATIVE_SPECS]
+    for root, (prefixes, objects) in zip(derivative_roots, pool.map(storage.list_prefixes, derivative_roots)):
+        loose.extend(objects)
+        for prefix in prefixes:
+            add(prefix[len(root):], prefix)
+
+    for prefixes, objects in pool.map(storage.list_prefixes, tops):
+        loose.extend(objects)
+        for prefix in prefixes:
+            for root in derivative_roots:
+                if prefix.startswith(root):
+                    prefix = prefix[len(root):]
+                    break
+            shards.add(prefix)
+
+    entries = {}
+    rows = (db.session.query(Project.name, Project.folder_name, Photo.project_id, Photo.uploader_name)
+            .join(Project, Project.id == Photo.project_id).distinct())
+    for name, folder_name, project_id, uploader_name in rows:
+        # 예전 키는 프로젝트 이름, 경로형 새 키는 folder_name 아래에 있다
+        for top in {name, folder_name}:
+            prefix = f"{top}/{uploader_name}/"
+            entries.setdefault(prefix, {}).setdefault(uploader_name, set()).add(project_id)
+            shards.add(prefix)
+    shards.update(prefix for (prefix,) in db.session.query(photo_key_prefix).distinct()
+                  if prefix and HASHED_SHARD.match(prefix))
+
+    kept, groups = [], {}
+    for prefix in sorted(shards):  # 바깥 shard 바로 뒤에 안쪽 shard들이 온다
+        if kept and prefix.startswith(kept[-1]):
+            groups[kept[-1]].extend(entries.get(prefix, {}).items())
+            continue
+        kept.append(prefix)
+        groups[prefix] = list(entries.get(prefix, {}).items())
+    return kept, groups, loose
+
+
+def list_shard(storage, prefix):
+    """shard 하나의 원본과 파생 이미지 객체 {키: (크기, 수정 시각)}"""
+    objects = {}
+    for page in storage.iter_objects(prefix):
+        objects.update((key, (size, modified)) for key, size, modified in page)
+    for name in DERIVATIVE_SPECS:
+        for page in storage.iter_objects(f"{DERIVATIVE_PREFIX}/{name}/{prefix}"):
+            objects.update((key, (size, modified)) for key, size, modified in page)
+    return objects
+
+
+def split_derivative(key):
+    """파생 이미지 키 → (파생 이름, 원본 키). 파생 이미지가 아니면 (None, 키)"""
+    if key.startswith(f"{DERIVATIVE_PREFIX}/") and key.endswith('.webp'):
+        name, _, original = key[len(DERIVATIVE_PREFIX) + 1:-len('.webp')].partition('/')
+        if name in DERIVATIVE_SPECS and original:
+            return name, original
+    return None, key
+
+
+def referenced(keys):
+    """키들 중 사진 행이 가리키는 것 (다른 업로더의 중복 제거 참조 행 포함)"""
+    wanted = {}
+    for key in keys:
+        name, original = split_derivative(key)
+        wanted.setdefault(original, []).append((name, key))
+    found = set()
+    originals = list(wanted)
+    for start in range(0, len(originals), QUERY_BATCH_SIZE):
+        rows = db.session.query(Photo.filename, Photo.derivatives).filter(
+            Photo.filename.in_(originals[start:start + QUERY_BATCH_SIZE])
+        )
+        for filename, derivatives in rows:
+            names = set((derivatives or '').split(','))
+            found.update(key for name, key in wanted[filename] if name is None or name in names)
+    return found
+
+
+def classify_orphans(report, candidates, min_age):
+    """DB가 가리키지 않는 후보를 고아로 기록한다. 최근 객체는 진행 중인 업로드일 수 있어 건너뜀"""
+    cutoff = time.time() - min_age
+    recent = {key for key, (size, modified) in candidates.items() if modified > cutoff}
+    report['skipped_recent'] += len(recent)
+    pending = [key for key in candidates if key not in recent]
+    used = referenced(pending)
+    for key in pending:
+        if key not in used:
+            name, _ = split_derivative(key)
+            report['orphans'].append({'key': key, 'size': candidates[key][0], 'kind': name or 'original'})
+
+
+def shard_rows(prefix, group):
+    """shard에 객체가 있을 것으로 보이는 사진 행 (id, project_id, 업로더, 키, 파생 이미지, 크기, 업로드 시각)"""
+    columns = (Photo.id, Photo.project_id, Photo.uploader_name, Photo.filename, Photo.derivatives, Photo.file_size,
+               Photo.uploaded_at)
+    seen = set()
+    queries = []
+    if HASHED_SHARD.match(prefix):
+        queries.append(db.session.query(*columns).filter(photo_key_prefix == prefix))
+    for uploader_name, project_ids in group:
+        queries.append(db.session.query(*columns).filter(
+            Photo.project_id.in_(project_ids), Photo.uploader_name == uploader_name
+        ))
+    for query in queries:
+        for row in query:
+            if row[0] not in seen:
+                seen.add(row[0])
+                yield row
+
+
+def compared_elsewhere(filename, project_id, uploader_name, groups):
+    """shard 밖 키를 가리키는 행을 키가 속한 다른 shard에서 비교하는지
+    (hashed 키이거나, 그 shard가 같은 프로젝트/업로더 행을 조회하는 경우)"""
+    if is_hashed_key(filename):
+        return True
+    end = filename.find('/')
+    while end != -1:
+        for uploader, project_ids in groups.get(filename[:end + 1], ()):
+            if uploader == uploader_name and project_id in project_ids:
+                return True
+        end = filename.find('/', end + 1)
+    return False
+
+
+def compare_shard(report, prefix, objects, groups, min_age, foreign, listed_at=None):
+    """shard의 목록과 사진 행을 비교한다. 다른 shard에서 비교하지 않는 shard 밖 키는 foreign에 모은다.
+
+    listed_at(목록 조회 시작 시각) - min_age 이후에 생긴 행은 목록에 객체가 아직 없을 수 있으므로
+    (업로드/rekey 진행 중) 누락으로 보지 않는다.
+    """
+    report['shards'] += 1
+    report['objects'] += len(objects)
+    report['bytes'] += sum(size for size, _ in objects.values())
+    cutoff = datetime.utcfromtimestamp((listed_at or time.time()) - min_age)
+
+    expected, missing = set(), {}
+    for photo_id, project_id, uploader_name, filename, derivatives, file_size, uploaded_at in \
+            shard_rows(prefix, groups[prefix]):
+        inside = filename.startswith(prefix)
+        if not inside and compared_elsewhere(filename, project_id, uploader_name, groups):
+            continue
+        keys = [(filename, 'original', file_size)] + [
+            (derivative_key(filename, name), name, None)
+            for name in (derivatives or '').split(',') if name
+        ]
+        recent = uploaded_at is None or uploaded_at > cutoff
+        if recent:
+            report['skipped_recent_rows'] += 1
+        for key, kind, size in keys:
+            if recent:
+                expected.add(key)
+                continue
+            if not inside:
+                foreign.setdefault(key, {'key': key, 'kind': kind, 'photo_ids': [], 'size': size})
+                foreign[key]['photo_ids'].append(photo_id)
+                continue
+            expected.add(key)
+            if key not in objects:
+                missing.setdefault(key, {'key': key, 'kind': kind, 'photo_ids': [], 'size': size})
+                missing[key]['photo_ids'].append(photo_id)
+    report['missing'].extend(missing.values())
+
+    classify_orphans(report, {key: value for key, value in objects.items() if key not in expected}, min_age)
+
+
+def exists(storage, key):
+    """HEAD로 객체가 있는지 확인 (404만 없음으로 본다. 다른 저장소 오류는 그대로 올라감)"""
+    try:
+        storage.head(key)
+        return True
+    except ObjectNotFound:
+        return False
+
+
+def check_foreign(storage, pool, report, foreign):
+    """다른 shard(중복 제거 참조, 이름이 바뀐 프로젝트)의 키를 가리키는 행은 HEAD로 확인한다"""
+    entries = list(foreign.values())
+    for entry, found in zip(entries, pool.map(lambda key: exists(storage, key),
+                                              [entry['key'] for entry in entries])):
+        if not found:
+            report['missing'].append(entry)
+
+
+def reconcile(storage, workers=16, min_age=3600, progress=None):
+    """저장소 전체를 대조해 보고서(dict)를 반환한다. 저장소/DB는 바꾸지 않는다"""
+    report = empty_report()
+    foreign = {}
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        shards, groups, loose = discover_shards(storage, pool)
+        # 목록 조회가 DB 비교보다 앞서 나가 결과가 메모리에 쌓이지 않도록 진행 중 shard 수를 제한
+        remaining, futures, done = iter(shards), {}, 0
+        while True:
+            for prefix in remaining:
+                futures[pool.submit(list_shard, storage, prefix)] = (prefix, time.time())
+                if len(futures) >= workers * 2:
+                    break
+            if not futures:
+                break
+            future = next(as_completed(futures))
+            prefix, listed_at = futures.pop(future)
+            compare_shard(report, prefix, future.result(), groups, min_age, foreign, listed_at)
+            done += 1
+            if progress:
+                progress(done, len(shards))
+
+        # shard 밖에 놓인 객체 (예상하지 못한 위치)
+        classify_orphans(report, {key: (size, modified) for key, size, modified in loose}, min_age)
+        report['objects'] += len(loose)
+        report['bytes'] += sum(size for _, size, _ in loose)
+
+        # 아카이브: 어떤 작업도 가리키지 않는 ZIP
+        archive_keys = {key for (key,) in db.session.query(ArchiveJob.key).filter(ArchiveJob.key.isnot(None))}
+        cutoff = time.time() - min_age
+        for page in storage.iter_objects(f"{ARCHIVE_PREFIX}/"):
+            report['objects'] += len(page)
+            report['bytes'] += sum(size for _, size, _ in page)
+            for key, size, modified in page:
+                if key in archive_keys:
+                    continue
+                if modified > cutoff:
+                    report['skipped_recent'] += 1
+                else:
+                    report['orphans'].append({'key': key, 'size': size, 'kind': 'archive'})
+
+        check_foreign(storage, pool, report, foreign)
+    return report
+
+
+def delete_orphans(storage, report, workers=4):
+    """고아 객체를 DeleteObjects 1000개 단위로 삭제하고 실패한 키 목록을 반환"""
+    return delete_keys(storage, [entry['key'] for entry in report['orphans']], workers)
+
+
+def still_missing(storage, entries, workers):
+    """삭제 직전에 다시 HEAD해서 여전히 404인 항목만 남긴다 (보고서 이후 올라온 객체 보호)"""
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        found = list(pool.map(lambda entry: exists(storage, entry['key']), entries))
+    return [entry for entry, present in zip(entries, found) if not present]
+
+
+def prune_missing(storage, report, workers=4):
+    """원본이 없는 사진 행은 지우고(남은 파생 이미지도 삭제), 파생 이미지만 없는 행은 표시를 지운다.
+
+    보고서 뒤에 객체가 생겼거나 rekey로 행의 키가 바뀌었을 수 있으므로, 키를 다시 HEAD해 404이고
+    행이 아직 그 키를 가리킬 때만 고친다. 파생 표시를 지운 사진은 ``flask derivatives-backfill``로
+    다시 만들 수 있다. (삭제한 행 수, 파생 표시를 고친 행 수) 반환
+    """
+    originals = still_missing(storage, [entry for entry in report['missing'] if entry['kind'] == 'original'], workers)
+    lost = {photo_id: entry['key'] for entry in originals for photo_id in entry['photo_ids']}
+    stale = {}
+    derivatives = still_missing(storage, [entry for entry in report['missing'] if entry['kind'] != 'original'],
+                                workers)
+    for entry in derivatives:
+        for photo_id in entry['photo_ids']:
+            if photo_id not in lost:
+                stale.setdefault(photo_id, {})[entry['kind']] = entry['key']
+
+    removed = 0
+    ids = sorted(lost)
+    for start in range(0, len(ids), QUERY_BATCH_SIZE):
+        photos = [photo for photo in Photo.query.filter(Photo.id.in_(ids[start:start + QUERY_BATCH_SIZE]))
+                  if photo.filename == lost[photo.id]]
+        delete_keys(storage, [derivative_key(photo.filename, name)
+                              for photo in photos for name in photo.derivative_names], workers)
+        if photos:
+            removed += Photo.query.filter(Photo.id.in_([p.id for p in photos])).delete(synchronize_session=False)
+        db.session.commit()
+
+    fixed = 0
+    ids = sorted(stale)
+    for start in range(0, len(ids), QUERY_BATCH_SIZE):
+        for photo in Photo.query.filter(Photo.id.in_(ids[start:start + QUERY_BATCH_SIZE])):
+            gone = {name for name, key in stale[photo.id].items() if derivative_key(photo.filename, name) == key}
+            if gone:
+                photo.derivatives = ','.join(name for name in photo.derivative_names if name not in gone) or None
+                fixed += 1
+        db.session.commit()
+    return removed, fixed
@@ -0,0 +1,138 @@
+"""기존 사진 객체를 hashed 키(keys.py)로 옮기는 온라인 마이그레이션
+
+배치마다 원본과 파생 이미지를 서버 측 복사(CopyObject)로 새 키에 만들고, 복사가 끝난 키만
+한 트랜잭션에서 ``Photo.filename``을 새 키로 바꾼다. 커밋 전에는 옛 키, 커밋 후에는 새 키를
+읽으므로 서비스를 멈추지 않아도 된다. 새 키는 옛 키에서 결정적으로 정해지므로 중단된 뒤 다시
+실행하면 남은 행부터 이어서 처리한다 (이미 복사된 객체는 다시 덮어쓸 뿐).
+
+옛 객체는 기본적으로 남겨 둔다. 이미 렌더링된 페이지의 서명 URL(SIGNED_URL_TTL)이나 진행 중인
+ZIP이 옛 키를 읽을 수 있기 때문이다. ``--delete-old``를 주면 커밋 직후 지우고, 아니면 나중에
+``flask storage-reconcile --delete-orphans``로 정리한다.
+"""
+import mimetypes
+from concurrent.futures import ThreadPoolExecutor
+
+from derivatives import derivative_key
+from keys import is_hashed_key, rekeyed, source_metadata
+from models import db, Photo, Project
+from purge import delete_keys
+from storage import ObjectNotFound, StorageError
+
+
+def pending_batch(project_id, after_id, batch_size):
+    """id 순서로 다음 배치를 읽어 아직 hashed 키가 아닌 행만 돌려준다. (행 목록, 마지막 id)"""
+    query = db.session.query(Photo.id, Photo.filename, Photo.derivatives, Photo.uploader_name,
+                             Photo.original_filename, Project.folder_name) \
+        .join(Project, Project.id == Photo.project_id).filter(Photo.id > after_id)
+    if project_id:
+        query = query.filter(Photo.project_id == project_id)
+    rows = query.order_by(Photo.id).limit(batch_size).all()
+    if not rows:
+        return [], None
+    return [row for row in rows if not is_hashed_key(row.filename)], rows[-1].id
+
+
+def plan_moves(rows):
+    """같은 키를 가리키는 행(중복 제거 참조)을 묶어 키마다 한 번만 옮긴다.
+
+    {옛 키: (새 키, 파생 이미지 이름 집합, 메타데이터)}. 파생 이미지는 그 키를 가리키는 모든 행 기준
+    """
+    moves = {}
+    for row in rows:
+        if row.filename not in moves:
+            metadata = source_metadata(row.folder_name, row.uploader_name, row.original_filename)
+            moves[row.filename] = (rekeyed(row.filename), set(), metadata)
+    keys = list(moves)
+    for start in range(0, len(keys), 500):
+        for filename, derivatives in db.session.query(Photo.filename, Photo.derivatives).filter(
+                Photo.filename.in_(keys[start:start + 500])):
+            moves[filename][1].update(name for name in (derivatives or '').split(',') if name)
+    return moves
+
+
+def copy_object(storage, old, new, derivatives, metadata):
+    """원본과 파생 이미지를 새 키로 복사한다. (상태, 복사하지 못한 파생 이미지 이름 집합)
+
+    옛 원본이 없어도 이전 실행에서 이미 새 키로 옮겼다면(--delete-old 뒤 재실행) 옮긴 것으로 본다.
+    """
+    content_type = mimetypes.guess_type(old)[0] or 'application/octet-stream'
+    try:
+        storage.copy(old, new, content_type=content_type, metadata=metadata)
+    except ObjectNotFound:
+        try:
+            storage.head(new)
+        except ObjectNotFound:
+            return 'missing', set()
+    except StorageError as e:
+        print(f"키 이동 실패 ({old}): {e}")
+        return 'failed', set()
+
+    lost = set()
+    for name in derivatives:
+        try:
+            storage.copy(derivative_key(old, name), derivative_key(new, name))
+        except ObjectNotFound:
+            try:
+                storage.head(derivative_key(new, name))
+            except ObjectNotFound:
+                lost.add(name)
+        except StorageError as e:
+            print(f"파생 이미지 이동 실패 ({old}, {name}): {e}")
+            return 'failed', set()
+    return 'moved', lost
+
+
+def repoint(moves, results):
+    """복사가 끝난 키를 가리키는 행을 새 키로 바꾼다 (커밋은 호출자 몫). 바꾼 행 수 반환.
+
+    옛 파생 이미지가 없어 복사하지 못한 이름은 표시에서 빼서 ``flask derivatives-backfill``이 다시 만들게 한다.
+    """
+    updated = 0
+    for old, (status, lost) in results.items():
+        if status != 'moved':
+            continue
+        new, derivatives, _ = moves[old]
+        values = {'filename': new}
+        if lost:
+            values['derivatives'] = ','.join(sorted(derivatives - lost)) or None
+        updated += Photo.query.filter(Photo.filename == old).update(values, synchronize_session=False)
+    return updated
+
+
+def rekey_photos(storage, project_id=None, limit=None, workers=16, batch_size=500, delete_old=False,
+                 delete_workers=4, progress=None):
+    """hashed 키가 아닌 사진 객체를 옮긴다. {'moved', 'rows', 'missing', 'failed', 'deleted'} 반환"""
+    stats = {'moved': 0, 'rows': 0, 'missing': 0, 'failed': 0, 'deleted': 0}
+    after_id = 0
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        while limit is None or stats['moved'] + stats['missing'] + stats['failed'] < limit:
+            rows, after_id = pending_batch(project_id, after_id, batch_size)
+            if after_id is None:
+                break
+            moves = plan_moves(rows)
+            if limit is not None:
+                remaining = limit - stats['moved'] - stats['missing'] - stats['failed']
+                moves = dict(list(moves.items())[:remaining])
+            if not moves:
+                continue
+
+            olds = list(moves)
+            statuses = pool.map(lambda old: copy_object(storage, old, *moves[old]), olds)
+            results = dict(zip(olds, statuses))
+            stats['rows'] += repoint(moves, results)
+            db.session.commit()
+            for status, _ in results.values():
+                stats[status] += 1
+
+            if delete_old:
+                moved = [old for old, (status, _) in results.items() if status == 'moved']
+                # 커밋 사이에 옛 키로 새 행(중복 제거 참조)이 생겼으면 그 키는 남긴다
+                still_used = {filename for (filename,) in db.session.query(Photo.filename).filter(
+                    Photo.filename.in_(moved))} if moved else set()
+                old_keys = [key for old in moved if old not in still_used
+                            for key in [old] + [derivative_key(old, name) for name in moves[old][1]]]
+                failed_keys = delete_keys(storage, old_keys, workers=delete_workers)
+                stats['deleted'] += len(old_keys) - len(failed_keys)
+            if progress:
+                progress(stats)
+    return stats
@@ -0,0 +1,175 @@
+"""메인/대시보드 페이지 렌더링 캐시 + 조건부 GET
+
+렌더링 결과를 SQLite 파일에 저장해 같은 서버의 모든 gunicorn 워커가 공유한다.
+projects/photos/purge_jobs 테이블에 쓰기가 커밋될 때마다 데이터 버전이 올라가고,
+캐시 항목은 버전이 같을 때만 재사용된다. 응답에는 ETag/Last-Modified를 붙여
+변경이 없으면 본문 없이 304로 응답한다.
+"""
+import functools
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+
+from flask import Response, current_app, make_response, request, session
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+# 캐시된 페이지 내용에 영향을 주는 테이블에 대한 쓰기
+WRITE_PATTERN = re.compile(r'^\s*(?:INSERT\s+INTO|UPDATE|DELETE\s+FROM)\s+["`]?(projects|photos|purge_jobs)\b',
+                           re.IGNORECASE)
+
+
+class RenderCache:
+    """SQLite 파일 기반 페이지 캐시와 데이터 버전 카운터 (프로세스/스레드 간 공유)"""
+
+    def __init__(self, path, enabled=True):
+        self.path = os.path.abspath(path)
+        self.enabled = enabled
+        self._local = threading.local()
+        self.hits = 0
+        self.misses = 0
+
+    def _connect(self):
+        """스레드별 연결. 파일과 테이블은 처음 연결할 때 만든다 (import/워커 부팅 시점이 아니라)"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute('CREATE TABLE IF NOT EXISTS versions '
+                         '(name TEXT PRIMARY KEY, value INTEGER NOT NULL, updated_at REAL NOT NULL)')
+            conn.execute('CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, version INTEGER NOT NULL, '
+                         'etag TEXT NOT NULL, content_type TEXT NOT NULL, body BLOB NOT NULL)')
+            self._local.conn = conn
+        return _Transaction(conn)
+
+    def version(self, name='data'):
+        """(버전 번호, 마지막 변경 시각 epoch)"""
+        with self._connect() as conn:
+            row = conn.execute('SELECT value, updated_at FROM versions WHERE name = ?', (name,)).fetchone()
+        return row if row else (0, 0.0)
+
+    def bump(self, name='data'):
+        if not self.enabled:
+            return
+        with self._connect() as conn:
+            conn.execute('INSERT INTO versions (name, value, updated_at) VALUES (?, 1, ?) '
+                         'ON CONFLICT(name) DO UPDATE SET value = value + 1, updated_at = excluded.updated_at',
+                         (name, time.time()))
+
+    def get(self, key, version):
+        with self._connect() as conn:
+            row = conn.execute('SELECT etag, content_type, body FROM entries WHERE key = ? AND version = ?',
+                               (key, version)).fetchone()
+        return row
+
+    def put(self, key, version, body, content_type):
+        etag = f"v{version}-{hashlib.sha1(body).hexdigest()[:16]}"
+        with self._connect() as conn:
+            conn.execute('INSERT OR REPLACE INTO entries (key, version, etag, content_type, body) '
+                         'VALUES (?, ?, ?, ?, ?)', (key, version, etag, content_type, body))
+        return etag, content_type, body
+
+    def clear(self):
+        with self._connect() as conn:
+            conn.execute('DELETE FROM entries')
+
+    def cached(self, name, private=False):
+        """GET 응답을 (name, 경로, 관리자 여부, 데이터 버전) 단위로 캐시하는 뷰 데코레이터.
+
+        플래시 메시지가 남아 있는 요청은 개인화된 내용이므로 캐시하지 않는다.
+        """
+        def decorator(view):
+            @functools.wraps(view)
+            def wrapper(*args, **kwargs):
+                return self.respond(name, private, view, args, kwargs)
+            return wrapper
+        return decorator
+
+    def respond(self, name, private, view, args, kwargs):
+        if not self.enabled or request.method != 'GET' or session.get('_flashes'):
+            return view(*args, **kwargs)
+
+        version, updated_at = self.version()
+        # 쿼리스트링은 키에 넣지 않는다 (임의 파라미터로 항목이 무한히 늘지 않도록)
+        key = f"{name}:{request.path}:{int(bool(session.get('is_admin')))}"
+        entry = self.get(key, version)
+        if entry is None:
+            self.misses += 1
+            response = make_response(view(*args, **kwargs))
+            if response.status_code != 200 or response.direct_passthrough:
+                return response
+            entry = self.put(key, version, response.get_data(), response.content_type)
+        else:
+            self.hits += 1
+
+        etag, content_type, body = entry
+        response = Response(body, content_type=content_type)
+        response.set_etag(etag)
+        if updated_at:
+            response.last_modified = datetime.fromtimestamp(int(updated_at), timezone.utc)
+        response.cache_control.no_cache = True
+        if private:
+            response.cache_control.private = True
+        response.vary.add('Cookie')
+        return response.make_conditional(request)
+
+
+def cached(name, private=False):
+    """현재 앱의 렌더링 캐시(init_render_cache로 등록)를 쓰는 ``RenderCache.cached``. 앱 팩토리의 뷰용"""
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            return current_app.extensions['render_cache'].respond(name, private, view, args, kwargs)
+        return wrapper
+    return decorator
+
+
+class _Transaction:
+    """스레드별 연결을 재사용하면서 블록 단위로 BEGIN/COMMIT"""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        self.conn.execute('BEGIN')
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        self.conn.execute('ROLLBACK' if exc_type else 'COMMIT')
+
+
+def init_render_cache(app, db, cache):
+    """페이지 내용에 영향을 주는 쓰기가 커밋되면 데이터 버전을 올린다.
+
+    쓰기는 SQL 문 단위로 감지하므로 bulk UPDATE/DELETE도 포함된다. 버전은 커밋이 끝난
+    뒤에 올려야 다른 워커가 커밋 전 데이터를 새 버전으로 캐시하지 않는다.
+    """
+    app.extensions['render_cache'] = cache
+    if not cache.enabled:
+        return
+
+    dirty = threading.local()
+
+    with app.app_context():
+        engine = db.engine
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def track_writes(conn, cursor, statement, parameters, context, executemany):
+        if WRITE_PATTERN.match(statement):
+            dirty.value = True
+
+    @event.listens_for(Session, 'after_commit')
+    def bump_after_commit(session):
+        if getattr(dirty, 'value', False):
+            dirty.value = False
+            cache.bump()
+
+    @event.listens_for(Session, 'after_rollback')
+    def forget_on_rollback(session):
+        dirty.value = False
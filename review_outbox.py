@@ -0,0 +1,163 @@
+"""리뷰 → Google Sheets 저장용 outbox
+
+요청 처리 중에는 리뷰를 ``review_outbox`` 테이블에 넣기만 하고, 백그라운드 스레드가
+인증된 클라이언트 하나로 여러 제출분을 모아 ``append_rows`` 한 번으로 보낸다.
+실패한 행은 지수 백오프 후 다시 시도한다. 여러 gunicorn 워커가 동시에 돌아도
+행을 claim한 워커만 전송하므로 중복 저장되지 않는다.
+"""
+import json
+import os
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from sqlalchemy import or_
+
+from metrics import sheets_call
+from models import db, ReviewOutbox
+
+GOOGLE_SHEETS_ID = '1eAuotbbl7bbj8N8rCr4lbgE-g9Ja_l66ZUk_N9UVtEI'
+
+BATCH_SIZE = 500
+CLAIM_TIMEOUT = timedelta(minutes=5)  # 이보다 오래된 claim은 워커가 죽은 것으로 보고 회수
+MAX_BACKOFF = timedelta(minutes=30)
+
+
+def get_sheets_client():
+    """Google Sheets 클라이언트 생성 (gspread/google-auth는 무거워서 처음 보낼 때 import)"""
+    try:
+        import gspread
+        from google.oauth2.service_account import Credentials
+
+        creds_json = os.environ.get('GOOGLE_CREDENTIALS')
+        if not creds_json:
+            print("GOOGLE_CREDENTIALS 환경변수가 없습니다")
+            return None
+
+        creds_dict = json.loads(creds_json)
+        scopes = [
+            'https://www.googleapis.com/auth/spreadsheets',
+            'https://www.googleapis.com/auth/drive'
+        ]
+        credentials = Credentials.from_service_account_info(creds_dict, scopes=scopes)
+        with sheets_call('authorize'):
+            client = gspread.authorize(credentials)
+        return client
+    except Exception as e:
+        print(f"Google Sheets 연결 오류: {e}")
+        return None
+
+
+def enqueue_reviews(uploader_name, project_name, reviews):
+    """리뷰를 outbox에 추가한다 (커밋은 호출자의 트랜잭션에서). 추가한 건수 반환"""
+    count = 0
+    for review in reviews:
+        if review.strip():
+            db.session.add(ReviewOutbox(
+                uploader_name=uploader_name,
+                project_name=project_name,
+                review=review.strip()
+            ))
+            count += 1
+    return count
+
+
+def backoff(attempts):
+    return min(timedelta(seconds=10 * 2 ** max(attempts - 1, 0)), MAX_BACKOFF)
+
+
+class ReviewFlusher:
+    """outbox를 비워 Sheets에 쓰는 워커. 인증된 워크시트를 재사용한다."""
+
+    def __init__(self, app, client_factory=get_sheets_client, sheet_id=GOOGLE_SHEETS_ID):
+        self.app = app
+        self.client_factory = client_factory
+        self.sheet_id = sheet_id
+        self._worksheet = None
+        self._wake = threading.Event()
+        self._thread = None
+
+    def worksheet(self):
+        if self._worksheet is None:
+            client = self.client_factory()
+            if client is None:
+                raise RuntimeError('Google Sheets 연결 실패')
+            with sheets_call('open'):
+                self._worksheet = client.open_by_key(self.sheet_id).sheet1
+        return self._worksheet
+
+    def _claim(self, now):
+        """전송할 행을 이 워커 몫으로 표시하고 가져온다"""
+        token = uuid.uuid4().hex
+        ready = db.session.query(ReviewOutbox.id).filter(
+            ReviewOutbox.sent_at.is_(None),
+            ReviewOutbox.next_attempt_at <= now,
+            or_(ReviewOutbox.claimed_at.is_(None), ReviewOutbox.claimed_at < now - CLAIM_TIMEOUT)
+        ).order_by(ReviewOutbox.id).limit(BATCH_SIZE)
+        ReviewOutbox.query.filter(
+            ReviewOutbox.id.in_(ready.scalar_subquery()),
+            or_(ReviewOutbox.claimed_at.is_(None), ReviewOutbox.claimed_at < now - CLAIM_TIMEOUT)
+        ).update({'claim_token': token, 'claimed_at': now}, synchronize_session=False)
+        db.session.commit()
+        return ReviewOutbox.query.filter_by(claim_token=token).order_by(ReviewOutbox.id).all()
+
+    def flush_once(self):
+        """한 배치를 전송하고 보낸 건수를 반환 (앱 컨텍스트 안에서 호출)"""
+        now = datetime.utcnow()
+        rows = self._claim(now)
+        if not rows:
+            return 0
+
+        try:
+            worksheet = self.worksheet()
+            with sheets_call('append_rows'):
+                worksheet.append_rows([[row.uploader_name, row.project_name, row.review] for row in rows])
+        except Exception as e:
+            print(f"Sheets 저장 오류 ({len(rows)}건, 재시도 예정): {e}")
+            # 인증 만료 등일 수 있으므로 다음 시도 때 클라이언트를 새로 만든다
+            self._worksheet = None
+            for row in rows:
+                row.attempts = (row.attempts or 0) + 1
+                row.last_error = str(e)[:500]
+                row.next_attempt_at = now + backoff(row.attempts)
+                row.claim_token = None
+                row.claimed_at = None
+            db.session.commit()
+            return 0
+
+        for row in rows:
+            row.sent_at = now
+            row.claim_token = None
+        db.session.commit()
+        return len(rows)
+
+    def flush_all(self):
+        total = 0
+        while True:
+            sent = self.flush_once()
+            total += sent
+            if sent < BATCH_SIZE:
+                return total
+
+    def wake(self):
+        self._wake.set()
+
+    def _run(self, interval, linger):
+        while True:
+            if self._wake.wait(interval):
+                # 잠깐 기다려 동시에 들어온 제출을 한 번의 append_rows로 묶는다
+                self._wake.clear()
+                time.sleep(linger)
+            try:
+                with self.app.app_context():
+                    self.flush_all()
+            except Exception as e:
+                print(f"리뷰 outbox 처리 오류: {e}")
+
+    def start(self, interval=30, linger=2):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, args=(interval, linger),
+                                            name='review-flusher', daemon=True)
+            self._thread.start()
+        return self._thread
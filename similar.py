@@ -0,0 +1,207 @@
+"""지각 해시(dHash) 기반 프로젝트 내 유사 사진 묶기
+
+연사나 다시 저장한 스크린샷처럼 바이트는 다르지만 거의 같은 사진을 묶고, 묶음마다
+가장 선명한 한 장만 남기는 "대표만 보기/받기"에 쓴다.
+
+- 서명: 썸네일 크기 이미지의 64비트 dHash와 선명도(에지 분산, derivatives.image_signature).
+  파생 이미지를 만들 때 함께 계산하고, 기존 사진은 ``flask similar-backfill``로 채운다.
+- 묶기: 해시를 NumPy uint64 배열로 올려 해밍 거리 ``max_distance`` 이하인 쌍을 연결한다.
+  16비트 블록 단위 비둘기집 원리로 후보만 골라 비교하므로(candidate_pairs) 전체 쌍을
+  비교하지 않으면서도 빠뜨리는 쌍이 없다. 묶음은 연결 요소(single linkage)다.
+"""
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from sqlalchemy import func
+
+from derivatives import derivative_key, signature_from_bytes
+from models import db, Photo
+from storage import StorageError
+
+CACHE_SIZE = 32
+BLOCK_BITS = 16
+CANDIDATE_CHUNK = 4_000_000  # 한 번에 만들 후보 쌍 수 (메모리 상한)
+SHARPNESS_STEP = 1.1  # 이 비율 안의 선명도 차이는 같은 것으로 본다
+
+
+def block_masks(radius):
+    """16비트 블록에서 radius개 이하 비트를 뒤집는 XOR 마스크들"""
+    masks = [0]
+    for _ in range(radius):
+        masks = sorted({mask | (1 << bit) for mask in masks for bit in range(BLOCK_BITS)} | set(masks))
+    return np.array(masks, dtype=np.int64)
+
+
+def candidate_pairs(hashes, max_distance):
+    """해밍 거리 max_distance 이하인 (i, j) 인덱스 쌍 배열 두 개 (i < j, 중복 가능)
+
+    64비트를 16비트 블록 4개로 나누면, 거리 d 이하인 두 해시는 적어도 한 블록에서
+    d // 4 비트 이하만 다르다(비둘기집). 그래서 블록마다 그 비트 수만큼 뒤집은 값이 같은
+    해시만 후보로 보고 전체 거리를 잰다. 블록 값별 위치는 정렬 + 계수 표로 찾는다.
+    """
+    masks = block_masks(max_distance // (64 // BLOCK_BITS))
+    found_a, found_b = [], []
+    for shift in range(0, 64, BLOCK_BITS):
+        keys = ((hashes >> np.uint64(shift)) & np.uint64((1 << BLOCK_BITS) - 1)).astype(np.int64)
+        order = np.argsort(keys, kind='stable')
+        bucket_size = np.bincount(keys, minlength=1 << BLOCK_BITS)
+        bucket_start = np.cumsum(bucket_size) - bucket_size
+        # (해시, 마스크) 조합마다 뒤집은 블록 값과 같은 해시들이 후보. 같은 쌍을 양쪽에서
+        # 두 번 만들지 않도록 뒤집은 값이 더 큰 쪽에서만 찾는다 (블록이 같은 쌍은 a < b로 거른다)
+        probes = keys[:, None] ^ masks[None, :]
+        counts = np.where(probes >= keys[:, None], bucket_size[probes], 0).ravel()
+        probes = probes.ravel()
+        totals = np.cumsum(counts)
+        # 한 블록 값에 해시가 몰려도 메모리가 넘치지 않도록 후보를 CANDIDATE_CHUNK개 안팎씩 만든다
+        first = 0
+        while first < len(probes):
+            done = totals[first - 1] if first else 0
+            last = max(int(np.searchsorted(totals, done + CANDIDATE_CHUNK, side='right')), first + 1)
+            repeat = counts[first:last]
+            a = np.repeat(np.arange(first, last) // len(masks), repeat)
+            within = np.arange(len(a)) - np.repeat(np.cumsum(repeat) - repeat, repeat)
+            b = order[np.repeat(bucket_start[probes[first:last]], repeat) + within]
+            keep = (a < b) | (keys[a] != keys[b])
+            a, b = a[keep], b[keep]
+            close = np.bitwise_count(hashes[a] ^ hashes[b]) <= max_distance
+            found_a.append(a[close])
+            found_b.append(b[close])
+            first = last
+    if not found_a:
+        return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.intp)
+    return np.concatenate(found_a), np.concatenate(found_b)
+
+
+def connected_labels(size, a, b):
+    """쌍으로 연결된 원소들에 같은 번호(묶음 안 최소 인덱스)를 붙인다"""
+    parent = np.arange(size)
+    while len(a):
+        roots_a, roots_b = parent[a], parent[b]
+        if np.array_equal(roots_a, roots_b):
+            break
+        low = np.minimum(roots_a, roots_b)
+        np.minimum.at(parent, roots_a, low)
+        np.minimum.at(parent, roots_b, low)
+        while True:  # 경로 압축: 모두 루트를 가리킬 때까지
+            jumped = parent[parent]
+            if np.array_equal(jumped, parent):
+                break
+            parent = jumped
+    return parent
+
+
+def cluster(hashes, max_distance):
+    """uint64 해시 배열 → 묶음 번호 배열. 같은 해시는 먼저 합쳐서 비교 대상을 줄인다"""
+    if len(hashes) < 2:
+        return np.arange(len(hashes))
+    unique, inverse = np.unique(hashes, return_inverse=True)
+    a, b = candidate_pairs(unique, max_distance) if max_distance > 0 else ([], [])
+    labels = connected_labels(len(unique), np.asarray(a, dtype=np.intp), np.asarray(b, dtype=np.intp))
+    return labels[inverse.ravel()]
+
+
+class Clusters:
+    """범위(프로젝트, 업로더) 하나의 묶음 결과.
+
+    hidden: 대표가 아닌 사진 id / sizes: 대표 사진 id → 묶음 크기 (2장 이상인 묶음만)
+    """
+
+    def __init__(self, hidden, sizes):
+        self.hidden = hidden
+        self.sizes = sizes
+
+
+def build_clusters(rows, max_distance):
+    """(id, 해시, 선명도, 크기) 행 → Clusters. 대표는 선명도, 파일 크기, 먼저 올라온 순으로 고른다"""
+    if not rows:
+        return Clusters(frozenset(), {})
+    ids = np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows))
+    hashes = np.fromiter((row[1] for row in rows), dtype=np.int64, count=len(rows)).view(np.uint64)
+    sharpness = np.fromiter((row[2] or 0.0 for row in rows), dtype=np.float64, count=len(rows))
+    sizes = np.fromiter((row[3] or 0 for row in rows), dtype=np.int64, count=len(rows))
+
+    labels = cluster(hashes, max_distance)
+    counts = np.bincount(labels, minlength=len(labels))
+    grouped = counts[labels] > 1
+    if not grouped.any():
+        return Clusters(frozenset(), {})
+
+    # 묶음별로 정렬한 뒤 각 묶음의 마지막(가장 좋은) 사진이 대표. 선명도는 약 10% 단위로 묶어
+    # 비슷하면 파일 크기로 고른다 (낮은 품질로 다시 저장한 사본은 압축 노이즈로 선명도가 약간 높게 나온다)
+    sharpness = np.floor(np.log1p(sharpness) / np.log(SHARPNESS_STEP))
+    order = np.lexsort((-ids, sizes, sharpness, labels))
+    order = order[grouped[order]]
+    last = np.append(labels[order][1:] != labels[order][:-1], True)
+    best = order[last]
+    hidden = frozenset(ids[order[~last]].tolist())
+    return Clusters(hidden, dict(zip(ids[best].tolist(), counts[labels[best]].tolist())))
+
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def project_clusters(project_id, uploader_name=None, max_distance=6):
+    """프로젝트(또는 업로더) 범위의 유사 사진 묶음. 사진 구성이 바뀌지 않았으면 캐시를 쓴다"""
+    scope = [Photo.project_id == project_id]
+    if uploader_name is not None:
+        scope.append(Photo.uploader_name == uploader_name)
+    # 추가/삭제/서명 backfill이 있으면 달라지는 값
+    state = tuple(db.session.query(
+        func.count(Photo.id), func.max(Photo.id), func.count(Photo.perceptual_hash)
+    ).filter(*scope).one())
+    key = (project_id, uploader_name, max_distance, state)
+    with _cache_lock:
+        if key in _cache:
+            _cache.move_to_end(key)
+            return _cache[key]
+
+    rows = db.session.query(Photo.id, Photo.perceptual_hash, Photo.sharpness, Photo.file_size).filter(
+        *scope, Photo.perceptual_hash.isnot(None)
+    ).all()
+    result = build_clusters(rows, max_distance)
+    with _cache_lock:
+        _cache[key] = result
+        while len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+    return result
+
+
+def backfill_signatures(storage, project_id=None, limit=None, workers=8, batch_size=200):
+    """perceptual_hash가 없는 사진의 서명을 채운다 (썸네일이 있으면 썸네일을 읽는다). (처리 수, 실패 수) 반환"""
+    done = failed = 0
+    last_id = 0
+    while limit is None or done + failed < limit:
+        query = Photo.query.filter(Photo.perceptual_hash.is_(None), Photo.id > last_id)
+        if project_id:
+            query = query.filter_by(project_id=project_id)
+        size = batch_size if limit is None else min(batch_size, limit - done - failed)
+        photos = query.order_by(Photo.id).limit(size).all()
+        if not photos:
+            break
+        last_id = photos[-1].id
+
+        def work(key):
+            try:
+                return signature_from_bytes(storage.read(key))
+            except (StorageError, OSError, ValueError) as e:
+                print(f"서명 계산 실패 ({key}): {e}")
+                return None
+
+        # 같은 객체를 여러 행이 가리킬 수 있으므로 키 단위로 한 번만 읽는다
+        sources = {photo.id: derivative_key(photo.filename, 'thumb') if photo.has_derivative('thumb')
+                   else photo.filename for photo in photos}
+        keys = list(set(sources.values()))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            signatures = dict(zip(keys, pool.map(work, keys)))
+        for photo in photos:
+            signature = signatures[sources[photo.id]]
+            if signature is None:
+                failed += 1
+                continue
+            photo.perceptual_hash, photo.sharpness = signature
+            done += 1
+        db.session.commit()
+    return done, failed
@@ -0,0 +1,675 @@
+"""사진 저장소 백엔드
+
+모든 라우트는 S3 클라이언트 대신 ``Storage`` 인터페이스를 사용한다.
+
+- ``S3Storage``: 프로세스당 하나의 스레드 안전한 boto3 클라이언트를 공유하며
+  커넥션 풀 크기, 재시도, 타임아웃을 설정할 수 있다.
+- ``LocalStorage``: 로컬 디렉터리에 저장한다. AWS 없이 앱과 벤치마크를 돌릴 때 사용하며,
+  파일은 ``send_file``(gunicorn에서 sendfile 시스템콜)로 복사 없이 전송한다.
+"""
+import hashlib
+import hmac
+import os
+import shutil
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import parse_qsl, quote, urlencode, urlsplit
+
+from flask import Response, request, send_file
+
+
+class StorageError(Exception):
+    """저장소 작업 실패"""
+
+
+class ObjectNotFound(StorageError):
+    """키에 해당하는 객체가 없음"""
+
+
+class StoredObject:
+    """열린 객체: size와 청크 단위로 읽을 수 있는 body"""
+
+    def __init__(self, size, body):
+        self.size = size
+        self.body = body
+
+    def read(self):
+        try:
+            return self.body.read()
+        finally:
+            self.body.close()
+
+    def iter_chunks(self, chunk_size):
+        try:
+            while True:
+                chunk = self.body.read(chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+        finally:
+            self.body.close()
+
+    def close(self):
+        self.body.close()
+
+
+class S3MultipartWriter:
+    """write()로 받은 바이트를 part_size 단위 multipart 업로드로 S3에 흘려 쓰는 파일 객체"""
+
+    def __init__(self, storage, key, content_type=None, part_size=16 * 1024 * 1024):
+        self.storage = storage
+        self.key = key
+        self.content_type = content_type
+        self.part_size = max(part_size, 5 * 1024 * 1024)  # S3 최소 part 크기
+        self.upload_id = None
+        self.parts = []
+        self.size = 0
+        self._buffer = bytearray()
+
+    def write(self, data):
+        self._buffer += data
+        self.size += len(data)
+        while len(self._buffer) >= self.part_size:
+            self._upload_part(bytes(self._buffer[:self.part_size]))
+            del self._buffer[:self.part_size]
+        return len(data)
+
+    def _upload_part(self, data):
+        client = self.storage.client
+        try:
+            if self.upload_id is None:
+                self.upload_id = self.storage.create_multipart(self.key, self.content_type or 'application/octet-stream')
+            number = len(self.parts) + 1
+            response = client.upload_part(Bucket=self.storage.bucket, Key=self.key,
+                                          UploadId=self.upload_id, PartNumber=number, Body=data)
+        except StorageError:
+            raise
+        except Exception as e:
+            raise self.storage._error(e) from e
+        self.parts.append({'PartNumber': number, 'ETag': response['ETag']})
+
+    def close(self):
+        """남은 버퍼를 올리고 업로드를 완료한다. 한 part도 안 찼으면 put_object 한 번으로 끝낸다"""
+        if self.upload_id is None:
+            self.storage.put(self.key, bytes(self._buffer), content_type=self.content_type)
+        else:
+            if self._buffer:
+                self._upload_part(bytes(self._buffer))
+            self.storage.complete_multipart(self.key, self.upload_id, self.parts)
+        self._buffer = bytearray()
+
+    def abort(self):
+        if self.upload_id is not None:
+            try:
+                self.storage.client.abort_multipart_upload(Bucket=self.storage.bucket, Key=self.key,
+                                                           UploadId=self.upload_id)
+            except Exception as e:
+                print(f"multipart 업로드 중단 실패 ({self.key}): {e}")
+        self._buffer = bytearray()
+
+
+class S3BatchPresigner:
+    """botocore가 서명한 presigned GET URL 하나를 틀로 삼아 다른 키를 같은 시각/만료/자격 증명으로 서명한다.
+
+    generate_presigned_url은 키마다 요청 객체를 만들고 이벤트 훅을 돌려 URL 하나에 0.5ms 남짓 걸린다.
+    SigV4 쿼리 서명에서 키마다 달라지는 것은 경로뿐이므로, 서명 키와 쿼리 문자열은 한 번만 만들고
+    키마다 HMAC 한 번만 계산한다. 틀 URL의 서명을 직접 다시 계산해 botocore 결과와 같을 때만 쓴다
+    (다르면 ValueError → 호출자가 botocore로 하나씩 서명).
+    """
+
+    def __init__(self, reference_url, reference_key, secret_key):
+        parts = urlsplit(reference_url)
+        quoted = quote(reference_key, safe='/~')
+        if not parts.path.endswith(quoted):
+            raise ValueError('경로 형식을 알 수 없음')
+        params = parse_qsl(parts.query, keep_blank_values=True)
+        fields = dict(params)
+        if fields.get('X-Amz-Algorithm') != 'AWS4-HMAC-SHA256' or fields.get('X-Amz-SignedHeaders') != 'host':
+            raise ValueError('SigV4 쿼리 서명이 아님')
+
+        self.base = f"{parts.scheme}://{parts.netloc}"
+        self.path_prefix = parts.path[:-len(quoted)] if quoted else parts.path
+        self.host = parts.netloc
+        self.query = '&'.join(f"{quote(name, safe='-_.~')}={quote(value, safe='-_.~')}"
+                              for name, value in sorted(params) if name != 'X-Amz-Signature')
+        scope = fields['X-Amz-Credential'].split('/', 1)[1]
+        date, region, service, terminator = scope.split('/')
+        signing_key = ('AWS4' + secret_key).encode('utf-8')
+        for part in (date, region, service, terminator):
+            signing_key = hmac.new(signing_key, part.encode('utf-8'), hashlib.sha256).digest()
+        self.signing_key = signing_key
+        self.string_prefix = f"AWS4-HMAC-SHA256\n{fields['X-Amz-Date']}\n{scope}\n"
+        if not hmac.compare_digest(self.signature(self.path_prefix + quoted), fields.get('X-Amz-Signature', '')):
+            raise ValueError('서명 불일치')
+
+    def signature(self, path):
+        canonical = f"GET\n{path}\n{self.query}\nhost:{self.host}\n\nhost\nUNSIGNED-PAYLOAD"
+        string_to_sign = self.string_prefix + hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+        return hmac.new(self.signing_key, string_to_sign.encode('utf-8'), hashlib.sha256).hexdigest()
+
+    def url(self, key):
+        path = self.path_prefix + quote(key, safe='/~')
+        return f"{self.base}{path}?{self.query}&X-Amz-Signature={self.signature(path)}"
+
+
+class S3Storage:
+    supports_direct_upload = True
+
+    def __init__(self, bucket, region=None, access_key=None, secret_key=None,
+                 max_pool_connections=50, max_attempts=5, connect_timeout=5, read_timeout=60):
+        self.bucket = bucket
+        self.region = region or 'ap-northeast-2'
+        self._client_kwargs = {
+            'aws_access_key_id': access_key,
+            'aws_secret_access_key': secret_key,
+            'region_name': region,
+        }
+        self._client_config = {
+            'max_pool_connections': max_pool_connections,
+            'retries': {'max_attempts': max_attempts, 'mode': 'standard'},
+            'connect_timeout': connect_timeout,
+            'read_timeout': read_timeout,
+        }
+        self._session = None
+        self._client = None
+        self._transfer_config = None
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        """처음 사용할 때 한 번만 만드는 공유 클라이언트 (boto3 클라이언트는 스레드 안전).
+
+        boto3 import(약 0.1초)도 이때 하므로 S3를 쓰지 않는 프로세스/요청은 비용을 내지 않는다.
+        """
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    import boto3
+                    from botocore.config import Config as BotoConfig
+                    self._session = boto3.session.Session()
+                    self._client = self._session.client(
+                        's3', config=BotoConfig(**self._client_config), **self._client_kwargs
+                    )
+        return self._client
+
+    def _secret_key(self):
+        """클라이언트가 서명에 쓰는 시크릿 키 (설정값, 없으면 세션의 기본 자격 증명 체인)"""
+        if self._client_kwargs['aws_secret_access_key']:
+            return self._client_kwargs['aws_secret_access_key']
+        self.client  # 세션을 만든다
+        credentials = self._session.get_credentials()
+        return credentials.get_frozen_credentials().secret_key if credentials else None
+
+    @property
+    def transfer_config(self):
+        """큰 파일만 multipart, 파일 간 병렬은 호출자(스레드 풀)가 담당"""
+        if self._transfer_config is None:
+            from boto3.s3.transfer import TransferConfig
+            self._transfer_config = TransferConfig(
+                multipart_threshold=16 * 1024 * 1024,
+                multipart_chunksize=8 * 1024 * 1024,
+                max_concurrency=4,
+                use_threads=True
+            )
+        return self._transfer_config
+
+    def _error(self, e):
+        from botocore.exceptions import ClientError
+        if isinstance(e, ClientError):
+            code = e.response.get('Error', {}).get('Code')
+            if code in ('NoSuchKey', '404', 'NotFound'):
+                return ObjectNotFound(str(e))
+        return StorageError(str(e))
+
+    def open(self, key):
+        try:
+            response = self.client.get_object(Bucket=self.bucket, Key=key)
+        except Exception as e:
+            raise self._error(e) from e
+        return StoredObject(response['ContentLength'], response['Body'])
+
+    def read(self, key):
+        return self.open(key).read()
+
+    def head(self, key):
+        """객체 크기(bytes)"""
+        try:
+            return self.client.head_object(Bucket=self.bucket, Key=key)['ContentLength']
+        except Exception as e:
+            raise self._error(e) from e
+
+    def put(self, key, data, content_type=None, cache_control=None):
+        extra = {}
+        if content_type:
+            extra['ContentType'] = content_type
+        if cache_control:
+            extra['CacheControl'] = cache_control
+        try:
+            self.client.put_object(Bucket=self.bucket, Key=key, Body=data, **extra)
+        except Exception as e:
+            raise self._error(e) from e
+
+    def upload_fileobj(self, fileobj, key, content_type=None, metadata=None):
+        extra = {}
+        if content_type:
+            extra['ContentType'] = content_type
+        if metadata:
+            extra['Metadata'] = metadata
+        try:
+            self.client.upload_fileobj(fileobj, self.bucket, key, ExtraArgs=extra or None,
+                                       Config=self.transfer_config)
+        except Exception as e:
+            raise self._error(e) from e
+
+    def copy(self, source, key, content_type=None, metadata=None):
+        """서버 측 복사 (CopyObject). metadata를 주면 메타데이터/Content-Type을 새로 지정, 아니면 그대로 복사"""
+        extra = {}
+        if metadata is not None:
+            extra = {'MetadataDirective': 'REPLACE', 'Metadata': metadata}
+            if content_type:
+                extra['ContentType'] = content_type
+        try:
+            self.client.copy_object(Bucket=self.bucket, Key=key,
+                                    CopySource={'Bucket': self.bucket, 'Key': source}, **extra)
+        except Exception as e:
+            raise self._error(e) from e
+
+    def open_writer(self, key, content_type=None, part_size=16 * 1024 * 1024):
+        """크기를 미리 모르는 객체를 쓰기 위한 writer (multipart 업로드)"""
+        return S3MultipartWriter(self, key, content_type, part_size)
+
+    def delete_batch(self, keys):
+        """최대 1000개 키를 DeleteObjects 한 번으로 삭제하고 실패한 키 목록을 반환"""
+        try:
+            response = self.client.delete_objects(
+                Bucket=self.bucket,
+                Delete={'Objects': [{'Key': key} for key in keys], 'Quiet': True}
+            )
+        except Exception as e:
+            print(f"S3 일괄 삭제 오류 ({len(keys)}개): {e}")
+            return list(keys)
+        errors = response.get('Errors', [])
+        for error in errors[:5]:
+            print(f"S3 삭제 실패 {error.get('Key')}: {error.get('Code')} {error.get('Message')}")
+        return [error['Key'] for error in errors]
+
+    def list_prefixes(self, prefix=''):
+        """prefix 바로 아래 단계의 (하위 prefix 목록, 객체 목록). 객체는 (키, 크기, 수정 시각 epoch)"""
+        prefixes, objects = [], []
+        try:
+            paginator = self.client.get_paginator('list_objects_v2')
+            for page in paginator.paginate(Bucket=self.bucket, Prefix=prefix, Delimiter='/'):
+                prefixes.extend(item['Prefix'] for item in page.get('CommonPrefixes', []))
+                objects.extend((item['Key'], item['Size'], item['LastModified'].timestamp())
+                               for item in page.get('Contents', []))
+        except Exception as e:
+            raise self._error(e) from e
+        return prefixes, objects
+
+    def iter_objects(self, prefix):
+        """prefix 아래 모든 객체를 list_objects_v2 페이지(최대 1000개) 단위 목록으로 내보낸다"""
+        try:
+            paginator = self.client.get_paginator('list_objects_v2')
+            for page in paginator.paginate(Bucket=self.bucket, Prefix=prefix, PaginationConfig={'PageSize': 1000}):
+                yield [(item['Key'], item['Size'], item['LastModified'].timestamp())
+                       for item in page.get('Contents', [])]
+        except Exception as e:
+            raise self._error(e) from e
+
+    def url(self, key, expires=3600, download_name=None):
+        """presigned GET URL"""
+        params = {'Bucket': self.bucket, 'Key': key}
+        if download_name:
+            params['ResponseContentDisposition'] = f"attachment; filename*=UTF-8''{quote(download_name)}"
+        try:
+            return self.client.generate_presigned_url('get_object', Params=params, ExpiresIn=expires)
+        except Exception as e:
+            raise self._error(e) from e
+
+    def urls(self, keys, expires=3600):
+        """여러 키의 presigned GET URL. {키: URL} (내보내기 매니페스트처럼 수만 개를 한 번에 서명할 때)"""
+        keys = list(keys)
+        if not keys:
+            return {}
+        secret_key = self._secret_key()
+        reference = self.url(keys[0], expires=expires)
+        try:
+            presigner = S3BatchPresigner(reference, keys[0], secret_key) if secret_key else None
+        except ValueError as e:
+            print(f"일괄 서명을 쓸 수 없어 키마다 서명합니다: {e}")
+            presigner = None
+        if presigner is None:
+            return {key: self.url(key, expires=expires) for key in keys}
+        return {key: presigner.url(key) for key in keys}
+
+    def public_url(self, key):
+        return f"https://{self.bucket}.s3.{self.region}.amazonaws.com/{key}"
+
+    def send(self, key, download_name=None, as_attachment=True, chunk_size=1024 * 1024):
+        """객체 본문을 청크 단위로 중계한다. 단일 Range / If-Range 요청은 S3에 그대로 넘겨 206으로 응답"""
+        from botocore.exceptions import ClientError
+        params = {'Bucket': self.bucket, 'Key': key}
+        byte_range = request.range
+        if byte_range is not None and len(byte_range.ranges) == 1:
+            start, stop = byte_range.ranges[0]
+            params['Range'] = f"bytes={start}-{'' if stop is None else stop - 1}" if start >= 0 \
+                else f"bytes={start}"
+            # If-Range가 현재 객체와 다르면 S3가 412를 주므로 그때는 전체를 보낸다
+            if request.if_range.etag:
+                params['IfMatch'] = f'"{request.if_range.etag}"'
+            elif request.if_range.date:
+                params['IfUnmodifiedSince'] = request.if_range.date
+
+        try:
+            try:
+                response = self.client.get_object(**params)
+            except ClientError as e:
+                code = e.response.get('Error', {}).get('Code')
+                if code == 'InvalidRange':
+                    return Response(status=416, headers={'Content-Range': f"bytes */{self.head(key)}"})
+                if code not in ('PreconditionFailed', '412') or 'Range' not in params:
+                    raise
+                params = {'Bucket': self.bucket, 'Key': key}
+                response = self.client.get_object(**params)
+        except StorageError:
+            raise
+        except Exception as e:
+            raise self._error(e) from e
+
+        body = StoredObject(response['ContentLength'], response['Body'])
+        headers = {
+            'Accept-Ranges': 'bytes',
+            'Content-Length': str(response['ContentLength']),
+            'ETag': response.get('ETag', ''),
+        }
+        if response.get('LastModified'):
+            headers['Last-Modified'] = response['LastModified'].strftime('%a, %d %b %Y %H:%M:%S GMT')
+        if download_name:
+            disposition = 'attachment' if as_attachment else 'inline'
+            headers['Content-Disposition'] = f"{disposition}; filename*=UTF-8''{quote(download_name)}"
+        status = 200
+        if 'Range' in params:
+            status = 206
+            headers['Content-Range'] = response['ContentRange']
+        return Response(body.iter_chunks(chunk_size), status=status, headers=headers,
+                        mimetype=response.get('ContentType') or 'application/octet-stream',
+                        direct_passthrough=True)
+
+    # ---- 브라우저 → S3 직접 업로드 ----
+
+    def presigned_post(self, key, content_type, max_bytes, expires=3600, metadata=None):
+        fields = {'Content-Type': content_type}
+        fields.update((f"x-amz-meta-{name}", value) for name, value in (metadata or {}).items())
+        try:
+            return self.client.generate_presigned_post(
+                self.bucket, key,
+                Fields=fields,
+                Conditions=[{name: value} for name, value in fields.items()] +
+                           [['content-length-range', 1, max_bytes]],
+                ExpiresIn=expires
+            )
+        except Exception as e:
+            raise self._error(e) from e
+
+    def create_multipart(self, key, content_type, metadata=None):
+        try:
+            return self.client.create_multipart_upload(
+                Bucket=self.bucket, Key=key, ContentType=content_type, Metadata=metadata or {}
+            )['UploadId']
+        except Exception as e:
+            raise self._error(e) from e
+
+    def presigned_part_url(self, key, upload_id, part_number, expires=3600):
+        return self.client.generate_presigned_url(
+            'upload_part',
+            Params={'Bucket': self.bucket, 'Key': key, 'UploadId': upload_id, 'PartNumber': part_number},
+            ExpiresIn=expires
+        )
+
+    def complete_multipart(self, key, upload_id, parts):
+        """parts: [{'PartNumber': n, 'ETag': ...}]. 실패하면 업로드를 중단하고 StorageError"""
+        try:
+            self.client.complete_multipart_upload(
+                Bucket=self.bucket, Key=key, UploadId=upload_id,
+                MultipartUpload={'Parts': parts}
+            )
+        except Exception as e:
+            try:
+                self.client.abort_multipart_upload(Bucket=self.bucket, Key=key, UploadId=upload_id)
+            except Exception:
+                pass
+            raise self._error(e) from e
+
+
+class LocalWriter:
+    """임시 파일에 쓰고 close() 때 최종 경로로 옮기는 writer"""
+
+    def __init__(self, path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.tmp = f"{path}.{threading.get_ident()}.tmp"
+        self.size = 0
+        self._file = open(self.tmp, 'wb')
+
+    def write(self, data):
+        self.size += len(data)
+        return self._file.write(data)
+
+    def close(self):
+        self._file.close()
+        os.replace(self.tmp, self.path)
+
+    def abort(self):
+        self._file.close()
+        try:
+            os.remove(self.tmp)
+        except FileNotFoundError:
+            pass
+
+
+class LocalStorage:
+    """로컬 디렉터리 저장소. URL은 SECRET_KEY로 서명된 /storage/<key> 경로"""
+    supports_direct_upload = False
+
+    def __init__(self, root, secret_key, base_url='/storage'):
+        self.root = os.path.abspath(root)
+        self.secret_key = secret_key.encode('utf-8') if isinstance(secret_key, str) else secret_key
+        self.base_url = base_url.rstrip('/')
+        os.makedirs(self.root, exist_ok=True)
+
+    def path(self, key):
+        path = os.path.abspath(os.path.join(self.root, key))
+        if not path.startswith(self.root + os.sep):
+            raise ObjectNotFound(key)
+        return path
+
+    def open(self, key):
+        path = self.path(key)
+        try:
+            return StoredObject(os.path.getsize(path), open(path, 'rb'))
+        except FileNotFoundError as e:
+            raise ObjectNotFound(key) from e
+
+    def read(self, key):
+        return self.open(key).read()
+
+    def head(self, key):
+        try:
+            return os.path.getsize(self.path(key))
+        except FileNotFoundError as e:
+            raise ObjectNotFound(key) from e
+
+    def put(self, key, data, content_type=None, cache_control=None):
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+    def upload_fileobj(self, fileobj, key, content_type=None, metadata=None):
+        """metadata는 저장하지 않는다 (경로 자체가 로컬 파일이므로)"""
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp, 'wb') as f:
+            shutil.copyfileobj(fileobj, f, 1024 * 1024)
+        os.replace(tmp, path)
+
+    def copy(self, source, key, content_type=None, metadata=None):
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            shutil.copyfile(self.path(source), tmp)
+        except FileNotFoundError as e:
+            raise ObjectNotFound(source) from e
+        os.replace(tmp, path)
+
+    def open_writer(self, key, content_type=None, part_size=None):
+        return LocalWriter(self.path(key))
+
+    def delete_batch(self, keys):
+        failed = []
+        for key in keys:
+            try:
+                os.remove(self.path(key))
+            except FileNotFoundError:
+                pass
+            except (OSError, ObjectNotFound) as e:
+                print(f"로컬 삭제 실패 {key}: {e}")
+                failed.append(key)
+        return failed
+
+    def _key(self, path):
+        return os.path.relpath(path, self.root).replace(os.sep, '/')
+
+    def list_prefixes(self, prefix=''):
+        prefixes, objects = [], []
+        directory = os.path.join(self.root, prefix) if prefix else self.root
+        try:
+            entries = list(os.scandir(directory))
+        except FileNotFoundError:
+            return prefixes, objects
+        for entry in sorted(entries, key=lambda e: e.name):
+            if entry.is_dir():
+                prefixes.append(f"{prefix}{entry.name}/")
+            else:
+                stat = entry.stat()
+                objects.append((f"{prefix}{entry.name}", stat.st_size, stat.st_mtime))
+        return prefixes, objects
+
+    def iter_objects(self, prefix, page_size=1000):
+        page = []
+        for dirpath, dirnames, filenames in os.walk(os.path.join(self.root, prefix)):
+            dirnames.sort()
+            for name in sorted(filenames):
+                path = os.path.join(dirpath, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                page.append((self._key(path), stat.st_size, stat.st_mtime))
+                if len(page) >= page_size:
+                    yield page
+                    page = []
+        if page:
+            yield page
+
+    def _signature(self, key, expires, download_name):
+        message = f"{key}\n{expires}\n{download_name or ''}".encode('utf-8')
+        return hmac.new(self.secret_key, message, hashlib.sha256).hexdigest()[:32]
+
+    def url(self, key, expires=3600, download_name=None):
+        expires_at = int(time.time()) + expires
+        params = {'expires': expires_at, 'sig': self._signature(key, expires_at, download_name)}
+        if download_name:
+            params['name'] = download_name
+        return f"{self.base_url}/{quote(key)}?{urlencode(params)}"
+
+    def urls(self, keys, expires=3600):
+        return {key: self.url(key, expires=expires) for key in keys}
+
+    def public_url(self, key):
+        # 만료 시각을 시간 단위로 맞춰 같은 키의 URL이 한동안 같게 유지되도록 한다 (브라우저 캐시)
+        expires_at = (int(time.time()) // 3600 + 2) * 3600
+        params = {'expires': expires_at, 'sig': self._signature(key, expires_at, None)}
+        return f"{self.base_url}/{quote(key)}?{urlencode(params)}"
+
+    def verify(self, key, expires, signature, download_name=None):
+        try:
+            expires = int(expires)
+        except (TypeError, ValueError):
+            return False
+        if expires < time.time():
+            return False
+        return hmac.compare_digest(self._signature(key, expires, download_name), signature or '')
+
+    def send(self, key, download_name=None, as_attachment=True):
+        # 파일 경로를 넘기면 WSGI file_wrapper를 통해 sendfile로 전송된다
+        path = self.path(key)
+        if not os.path.isfile(path):
+            raise ObjectNotFound(key)
+        return send_file(path, download_name=download_name, as_attachment=as_attachment and bool(download_name),
+                         conditional=True)
+
+
+class SignedUrlCache:
+    """서명된 URL의 TTL 제한 LRU 캐시 (키: 저장소 키 + 다운로드 이름)
+
+    만료까지 ``refresh_margin``초 넘게 남은 URL은 그대로 재사용하므로, 같은 그리드를 다시
+    볼 때 서명 비용이 거의 없고 URL이 같아 브라우저 캐시도 맞는다.
+    """
+
+    def __init__(self, storage, ttl=3600, maxsize=20000, refresh_margin=None):
+        self.storage = storage
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.refresh_margin = ttl // 4 if refresh_margin is None else refresh_margin
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def url(self, key, download_name=None):
+        cache_key = (key, download_name)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(cache_key)
+            if entry and entry[1] - now > self.refresh_margin:
+                self._entries.move_to_end(cache_key)
+                self.hits += 1
+                return entry[0]
+
+        url = self.storage.url(key, expires=self.ttl, download_name=download_name)
+        with self._lock:
+            self.misses += 1
+            self._entries[cache_key] = (url, now + self.ttl)
+            self._entries.move_to_end(cache_key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return url
+
+    def many(self, keys):
+        return {key: self.url(key) for key in keys}
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+def create_storage(config):
+    """설정(STORAGE_BACKEND)에 맞는 저장소 생성"""
+    if config.get('STORAGE_BACKEND') == 'local':
+        return LocalStorage(config['LOCAL_STORAGE_ROOT'], config['SECRET_KEY'])
+    return S3Storage(
+        config.get('S3_BUCKET_NAME'),
+        region=config.get('AWS_REGION'),
+        access_key=config.get('AWS_ACCESS_KEY_ID'),
+        secret_key=config.get('AWS_SECRET_ACCESS_KEY'),
+        max_pool_connections=config.get('S3_MAX_POOL_CONNECTIONS', 50),
+        max_attempts=config.get('S3_MAX_ATTEMPTS', 5),
+        connect_timeout=config.get('S3_CONNECT_TIMEOUT', 5),
+        read_timeout=config.get('S3_READ_TIMEOUT', 60),
+    )
@@ -0,0 +1,49 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app, init_db  # noqa: E402
+from models import db, Project  # noqa: E402
+
+
+class InlineExecutor:
+    """post_upload_pool 대신 제출한 작업을 바로 실행해 테스트가 후처리 결과를 기다리지 않게 한다"""
+
+    def submit(self, fn, *args, **kwargs):
+        fn(*args, **kwargs)
+
+    def shutdown(self, wait=True):
+        pass
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = create_app({
+        'TESTING': True,
+        'SECRET_KEY': 'test',
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'test.db'}",
+        'STORAGE_BACKEND': 'local',
+        'LOCAL_STORAGE_ROOT': str(tmp_path / 'storage'),
+        'RENDER_CACHE_ENABLED': False,
+        'RENDER_CACHE_PATH': str(tmp_path / 'render_cache.sqlite3'),
+        'REVIEW_FLUSHER_ENABLED': False,
+    })
+    app.extensions['post_upload_pool'] = InlineExecutor()
+    with app.app_context():
+        init_db()
+    yield app
+    with app.app_context():
+        db.session.remove()
+        db.engine.dispose()
+
+
+@pytest.fixture
+def project(app):
+    with app.app_context():
+        project = Project(name='테스트', folder_name='test')
+        db.session.add(project)
+        db.session.commit()
+        return project.id
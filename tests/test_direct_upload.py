@@ -0,0 +1,108 @@
+import io
+
+from PIL import Image
+
+from keys import upload_token
+from models import Photo
+from reconcile import exists
+
+
+def jpeg_bytes(color):
+    buffer = io.BytesIO()
+    Image.new('RGB', (64, 48), color).save(buffer, 'JPEG')
+    return buffer.getvalue()
+
+
+def direct_upload(app, client, project_id, uploader_name, key, data):
+    """브라우저가 저장소에 직접 올린 것처럼 객체를 넣고 presign/complete를 호출한다"""
+    app.extensions['photo_storage'].put(key, data, 'image/jpeg')
+    token = upload_token(app.config['SECRET_KEY'], project_id, uploader_name, key, len(data))
+    return client.post(f'/upload/{project_id}/presign/complete', json={
+        'uploader_name': uploader_name,
+        'uploads': [{'key': key, 'size': len(data), 'token': token, 'original_filename': 'a.jpg'}],
+    })
+
+
+def stored(app, key):
+    return exists(app.extensions['photo_storage'], key)
+
+
+def test_same_uploader_reupload_drops_new_row_and_object(app, project):
+    client = app.test_client()
+    data = jpeg_bytes('red')
+    assert direct_upload(app, client, project, 'kim', 'test/kim/1.jpg', data).status_code == 200
+    assert direct_upload(app, client, project, 'kim', 'test/kim/2.jpg', data).status_code == 200
+
+    with app.app_context():
+        photos = Photo.query.filter_by(project_id=project).all()
+        assert [photo.filename for photo in photos] == ['test/kim/1.jpg']
+        assert photos[0].content_hash
+    assert stored(app, 'test/kim/1.jpg')
+    assert not stored(app, 'test/kim/2.jpg')
+
+
+def test_other_uploader_points_at_existing_object(app, project):
+    client = app.test_client()
+    data = jpeg_bytes('blue')
+    assert direct_upload(app, client, project, 'kim', 'test/kim/1.jpg', data).status_code == 200
+    assert direct_upload(app, client, project, 'lee', 'test/lee/1.jpg', data).status_code == 200
+
+    with app.app_context():
+        photos = Photo.query.filter_by(project_id=project).order_by(Photo.id).all()
+        assert [(photo.uploader_name, photo.filename) for photo in photos] == [
+            ('kim', 'test/kim/1.jpg'), ('lee', 'test/kim/1.jpg')]
+        assert photos[1].content_hash == photos[0].content_hash
+        assert photos[1].derivatives == photos[0].derivatives
+    assert not stored(app, 'test/lee/1.jpg')
+
+
+def test_different_content_is_kept(app, project):
+    client = app.test_client()
+    direct_upload(app, client, project, 'kim', 'test/kim/1.jpg', jpeg_bytes('red'))
+    direct_upload(app, client, project, 'kim', 'test/kim/2.jpg', jpeg_bytes('green'))
+
+    with app.app_context():
+        assert Photo.query.filter_by(project_id=project).count() == 2
+    assert stored(app, 'test/kim/2.jpg')
+
+
+def test_size_mismatch_is_rejected_and_deleted(app, project):
+    client = app.test_client()
+    data = jpeg_bytes('red')
+    key = 'test/kim/1.jpg'
+    app.extensions['photo_storage'].put(key, data + b'\0' * 100, 'image/jpeg')
+    token = upload_token(app.config['SECRET_KEY'], project, 'kim', key, len(data))
+    response = client.post(f'/upload/{project}/presign/complete', json={
+        'uploader_name': 'kim',
+        'uploads': [{'key': key, 'size': len(data), 'token': token}],
+    })
+
+    assert response.status_code == 400
+    assert not stored(app, key)
+
+
+def test_oversized_upload_is_rejected_and_deleted(app, project):
+    app.config['DIRECT_UPLOAD_MAX_BYTES'] = 1000
+    client = app.test_client()
+    data = jpeg_bytes('red') + b'\0' * 1000
+    response = direct_upload(app, client, project, 'kim', 'test/kim/1.jpg', data)
+
+    assert response.status_code == 400
+    assert not stored(app, 'test/kim/1.jpg')
+
+
+def test_presign_rejects_malformed_entries(app, project, monkeypatch):
+    storage = app.extensions['photo_storage']
+    monkeypatch.setattr(storage, 'supports_direct_upload', True, raising=False)
+    monkeypatch.setattr(storage, 'presigned_post', lambda key, *args, **kwargs: {'url': 'http://s3', 'fields': {}},
+                        raising=False)
+    response = app.test_client().post(f'/upload/{project}/presign', json={
+        'uploader_name': 'kim',
+        'files': ['a.jpg', {'name': 'b.jpg', 'size': 'big'}, {'name': 'c.jpg', 'size': [1]},
+                  {'name': 'd.jpg', 'size': 10}],
+    })
+
+    assert response.status_code == 200
+    body = response.get_json()
+    assert [item['index'] for item in body['rejected']] == [0, 1, 2]
+    assert [(item['index'], item['size']) for item in body['uploads']] == [(3, 10)]
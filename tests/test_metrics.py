@@ -0,0 +1,19 @@
+def test_metrics_requires_token_or_admin(app):
+    client = app.test_client()
+    assert client.get('/metrics').status_code == 401
+
+    with client.session_transaction() as session:
+        session['is_admin'] = True
+    assert client.get('/metrics').status_code == 200
+
+
+def test_metrics_bearer_token(app):
+    app.config['METRICS_TOKEN'] = 'secret'
+    client = app.test_client()
+    assert client.get('/metrics', headers={'Authorization': 'Bearer wrong'}).status_code == 401
+    assert client.get('/metrics', headers={'Authorization': 'Bearer secret'}).status_code == 200
+
+
+def test_metrics_public_opt_out(app):
+    app.config['METRICS_PUBLIC'] = True
+    assert app.test_client().get('/metrics').status_code == 200
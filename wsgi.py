@@ -0,0 +1,4 @@
+"""WSGI 진입점 (``gunicorn -c gunicorn.conf.py wsgi:app``)"""
+from app import create_app
+
+app = create_app()
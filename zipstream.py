@@ -0,0 +1,126 @@
+"""저장소 객체를 메모리에 모으지 않고 바로 ZIP으로 흘려보내는 스트리밍 생성기"""
+import zipfile
+from collections import deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from storage import StorageError
+
+CHUNK_SIZE = 1024 * 1024  # 1MB
+
+# arcname: ZIP 내부 경로, key: 저장소 키, date_time: 파일 수정시각, ref: 호출자가 돌려받을 객체
+ZipEntry = namedtuple('ZipEntry', ['arcname', 'key', 'date_time', 'ref'])
+
+
+class _ZipSink:
+    """zipfile이 기록한 바이트를 모아두는 쓰기 전용 버퍼 (seek 불가 → data descriptor 모드)"""
+
+    def __init__(self):
+        self._chunks = []
+        self._offset = 0
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._offset += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._offset
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def _zip_time(value):
+    if value is None or value.year < 1980:
+        return (1980, 1, 1, 0, 0, 0)
+    return value.timetuple()[:6]
+
+
+def _fetch(storage, entry, max_buffer):
+    """객체를 연다. 작은 객체는 본문까지 미리 읽어 네트워크를 계속 사용한다."""
+    try:
+        obj = storage.open(entry.key)
+    except StorageError as e:
+        print(f"ZIP 항목 조회 실패 ({entry.key}): {e}")
+        return entry, None, 0
+
+    if obj.size <= max_buffer:
+        return entry, obj.read(), obj.size
+    return entry, obj, obj.size
+
+
+def _iter_chunks(payload):
+    if isinstance(payload, bytes):
+        view = memoryview(payload)
+        for start in range(0, len(view), CHUNK_SIZE):
+            yield view[start:start + CHUNK_SIZE]
+        return
+    yield from payload.iter_chunks(CHUNK_SIZE)
+
+
+def stream_zip(storage, entries, prefetch=4, max_buffer=16 * 1024 * 1024, on_entry=None):
+    """entries(ZipEntry)를 무압축(STORED) ZIP 바이트 청크로 생성한다.
+
+    다음 ``prefetch``개 객체를 스레드 창에서 미리 가져오므로, 메모리 사용량은
+    프로젝트 크기와 무관하게 ``prefetch * max_buffer`` 수준으로 유지된다.
+    4GB를 넘는 항목이나 아카이브는 ZIP64로 기록된다. 가져오지 못한 객체는 건너뛰며,
+    기록이 끝난 항목마다 ``on_entry(entry)``를 호출한다.
+    """
+    sink = _ZipSink()
+    executor = ThreadPoolExecutor(max_workers=max(1, prefetch))
+    window = deque()
+    pending = iter(entries)
+
+    def fill():
+        while len(window) < max(1, prefetch):
+            entry = next(pending, None)
+            if entry is None:
+                return
+            window.append(executor.submit(_fetch, storage, entry, max_buffer))
+
+    try:
+        with zipfile.ZipFile(sink, 'w', zipfile.ZIP_STORED, allowZip64=True) as zf:
+            fill()
+            while window:
+                entry, payload, size = window.popleft().result()
+                fill()
+                if payload is None:
+                    continue
+
+                zinfo = zipfile.ZipInfo(entry.arcname, date_time=_zip_time(entry.date_time))
+                zinfo.compress_type = zipfile.ZIP_STORED
+                zinfo.file_size = size
+                with zf.open(zinfo, 'w') as dest:
+                    for chunk in _iter_chunks(payload):
+                        dest.write(chunk)
+                        data = sink.drain()
+                        if data:
+                            yield data
+                data = sink.drain()
+                if data:
+                    yield data
+
+                if on_entry:
+                    on_entry(entry)
+
+        # 중앙 디렉터리
+        data = sink.drain()
+        if data:
+            yield data
+    finally:
+        # 클라이언트가 중간에 끊긴 경우 남은 본문을 정리한다
+        for future in window:
+            if future.cancel():
+                continue
+            try:
+                _, payload, _ = future.result()
+                if payload is not None and not isinstance(payload, bytes):
+                    payload.close()
+            except Exception:
+                pass
+        executor.shutdown(wait=False, cancel_futures=True)